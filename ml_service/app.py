@@ -1,40 +1,76 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
-import joblib
 import pandas as pd
 import requests
 import numpy as np
 from datetime import datetime, timedelta
 import calendar
+import threading
+import hashlib
+import base64
 from auth import (
     init_database, create_user, authenticate_user, 
-    generate_jwt_token, require_auth, get_user_by_id
+    generate_jwt_token, require_auth, require_admin,
+    update_user, delete_user, user_cache, revoke_token, token_cache,
+    create_session, session_store, audit_writer
 )
 from crop_plans import get_crop_plan, CROP_GROWING_DATABASE
+from model_manager import ModelRegistry, FEATURE_COLUMNS, ENSEMBLE_MODELS, parse_weights
+from shadow import ShadowEvaluator
+from incremental import OutcomeStore, Retrainer
+from forecast_store import ForecastStore, ForecastNotFound, price_key, split_price_key
+from model_cache import model_cache
+from soil_classifier import SoilClassifier, SOIL_MAX_IMAGES, SOIL_MAX_IMAGE_MB
+from price_store import get_store, PriceSnapshot
+from price_engine import get_forecast as get_price_forecast
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend integration
 
-# Initialize authentication database
+# Initialize authentication database; load the token revocation filter and sweep expired sessions
 init_database()
+session_store.start()
 
 # --- Paths ---
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "recommender_bundle.joblib")
-RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "crop_data.csv")
+PROCESSED_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+MODEL_PATH = os.path.join(PROCESSED_DIR, "recommender_bundle.joblib")
 
-# --- Load trained model ---
+# --- Load trained models ---
+# Every *_bundle.joblib in data/processed is served lazily; the default is loaded up front.
+# Loaded bundles are hot-swapped when the file on disk changes (or on /admin/reload-model).
+model_registry = ModelRegistry(PROCESSED_DIR, default=os.environ.get('RECOMMENDER_MODEL', 'recommender'))
 try:
-    bundle = joblib.load(MODEL_PATH)
-    model = bundle['model']
-    scaler = bundle['scaler']
-    le_crop = bundle['le_crop']
+    model_registry.slot()
     print("✓ Model loaded successfully")
-except FileNotFoundError:
+except (ValueError, RuntimeError):
     print("⚠ Model not found, will train a new one")
-    model, scaler, le_crop = None, None, None
+model_registry.start_watcher()
+# Warm the ensemble members so the first ensemble request isn't spent loading them
+model_registry.preload(parse_weights(ENSEMBLE_MODELS))
 
-columns = ['N','P','K','temperature','humidity','ph','rainfall']
+# Candidate model scored on sampled live traffic (SHADOW_MODEL), off the request path
+shadow_evaluator = ShadowEvaluator(model_registry)
+
+# Labeled farm outcomes folded into the recommender by a background retrainer (RETRAIN_INTERVAL)
+outcome_store = OutcomeStore()
+retrainer = Retrainer(outcome_store, MODEL_PATH)
+retrainer.start()
+
+# Forecasts are served from the table the training jobs materialize; rebuilt in the
+# background when a forecast model changes (FORECAST_REFRESH_INTERVAL)
+forecast_store = ForecastStore()
+forecast_store.start_watcher()
+
+# Market prices are indexed in memory and summarized per crop for income estimates;
+# both load in the background and refresh every PRICE_SNAPSHOT_INTERVAL seconds
+price_snapshot = PriceSnapshot(get_store, forecast=get_price_forecast)
+price_snapshot.start()
+
+# Soil photos are decoded in a thread pool and classified in dynamic CPU batches (SOIL_BATCH_*)
+soil_classifier = SoilClassifier()
+
+columns = FEATURE_COLUMNS
 
 # --- Helper functions ---
 def get_weather(location):
@@ -590,7 +626,7 @@ def get_crop_details(crop_name):
 
 def calculate_expected_income(crop, farm_size, soil_type):
     """Calculate expected income based on crop, farm size, soil type and season"""
-    # Market prices per quintal (100kg) in Indian Rupees - updated with current market trends
+    # Fallback prices per quintal (100kg) in Indian Rupees, used for crops missing from the market data
     crop_prices = {
         'rice': 2800, 'wheat': 2400, 'maize': 2200, 'cotton': 6500,
         'jute': 4800, 'coconut': 12500, 'coffee': 8500, 'banana': 1800,
@@ -623,7 +659,12 @@ def calculate_expected_income(crop, farm_size, soil_type):
         # Default values for other crops will use the general soil_factors below
     }
     
-    base_price = crop_prices.get(crop.lower(), 3000)
+    # Forecast (else current) median mandi price when the market data covers this crop
+    market_price = price_snapshot.get(crop)
+    if market_price:
+        base_price = market_price.get('forecast_price', market_price['price'])
+    else:
+        base_price = crop_prices.get(crop.lower(), 3000)
     base_yield = crop_yields_base.get(crop.lower(), 20)
     farm_size_num = float(farm_size)
     
@@ -685,32 +726,15 @@ def calculate_expected_income(crop, farm_size, soil_type):
 
 def train_model_from_data():
     """Train model on-the-fly if not available"""
-    global model, scaler, le_crop
     try:
-        from sklearn.ensemble import RandomForestClassifier
-        from sklearn.preprocessing import LabelEncoder, StandardScaler
-        from sklearn.model_selection import train_test_split
-        
-        # Load raw data
-        df = pd.read_csv(RAW_DATA_PATH)
-        X = df[columns]
-        y = df['label']
-        
-        # Encode labels and scale features
-        le_crop = LabelEncoder()
-        y_encoded = le_crop.fit_transform(y)
-        
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # Same pipeline as `python train.py recommender`, including the bundle manifest
+        from train import run_pipeline
+        run_pipeline('recommender')
         
-        # Train model
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_scaled, y_encoded)
-        
-        # Save the bundle
-        bundle = {'model': model, 'scaler': scaler, 'le_crop': le_crop}
-        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-        joblib.dump(bundle, MODEL_PATH)
+        # Swap the freshly written bundle into the serving registry
+        model_registry.discover()
+        if not model_registry.reload('recommender', force=True)['success']:
+            return False
         
         print("✓ Model trained and saved successfully")
         return True
@@ -728,19 +752,34 @@ def recommend_crop():
         if token:
             if token.startswith('Bearer '):
                 token = token[7:]
-            from auth import verify_jwt_token, get_user_by_id
+            from auth import verify_jwt_token, user_from_token
             payload = verify_jwt_token(token)
             if payload:
-                current_user = get_user_by_id(payload['user_id'])
-        data = request.get_json()
+                current_user = user_from_token(payload)
+        # JSON body, or multipart form when a soil photo is uploaded
+        data = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+        data = data or {}
 
         # Validate inputs
         soil_type = data.get('soil_type')
         farm_size = float(data.get('farm_size', 1))
         location = data.get('location')
 
+        # Without a soil_type, classify it from a soil photo (file upload or base64 'soil_image')
+        soil_classification = None
+        if not soil_type:
+            try:
+                soil_image = read_soil_images(data, field='soil_image')
+                if soil_image:
+                    soil_classification = soil_classifier.classify(soil_image[:1])[0]
+                    soil_type = soil_classification['soil_type']
+            except ValueError as ve:
+                return jsonify({'error': f'Invalid soil_image: {str(ve)}'}), 400
+            except RuntimeError as err:
+                return jsonify({'error': f'{str(err)}; provide soil_type instead'}), 503
+
         if not soil_type or not location:
-            return jsonify({'error': 'soil_type and location are required'}), 400
+            return jsonify({'error': 'soil_type (or soil_image) and location are required'}), 400
 
         if soil_type.lower() not in ['loamy', 'sandy', 'clay', 'silty']:
             return jsonify({'error': 'Invalid soil type'}), 400
@@ -755,16 +794,30 @@ def recommend_crop():
         N, P, K, ph = comprehensive_soil_features(soil_type)
         input_df = pd.DataFrame([[N,P,K,temp,humidity,ph,rainfall]], columns=columns)
         
-        # Handle case where model isn't loaded
-        if model is None or scaler is None or le_crop is None:
+        # Pick the serving model: request parameter, else the RECOMMENDER_MODEL default
+        requested_model = data.get('model')
+        
+        # Handle case where model isn't available
+        if not requested_model and model_registry.default not in model_registry.names():
             # Train model on the fly if not available
             train_model_from_data()
             return jsonify({'error': 'Model training in progress, please try again'}), 503
-            
-        input_scaled = scaler.transform(input_df)
-
-        # 4️⃣ Predict crop with confidence scores
-        pred_proba = model.predict_proba(input_scaled)[0]
+        
+        # 4️⃣ Predict crop with confidence scores, pinned to the version active at request start
+        ensemble = None
+        if requested_model == 'ensemble':
+            ensemble = model_registry.predict_ensemble(input_df, budget_ms=data.get('latency_budget_ms'))
+            if not ensemble['contributors']:
+                return jsonify({'error': 'No ensemble model answered within the latency budget',
+                                'dropped': ensemble['dropped']}), 503
+            pred_proba, all_crops = ensemble['proba'][0], ensemble['classes']
+            model_name, model_version = 'ensemble', ensemble['version']
+        else:
+            with model_registry.use(requested_model) as active_model:
+                pred_proba = active_model.predict_proba(input_df)[0]
+            all_crops, model_version = active_model.classes, active_model.version
+            model_name = model_registry.resolve(requested_model)
+        shadow_evaluator.submit(input_df.values, all_crops, pred_proba)
         
         # Get top 5 indices instead of just 3, to ensure diversity
         top_indices = np.argsort(pred_proba)[-10:][::-1]
@@ -807,7 +860,6 @@ def recommend_crop():
         location_boost = 0.15
         
         # Get all crops and adjust scores
-        all_crops = [le_crop.inverse_transform([idx])[0] for idx in range(len(pred_proba))]
         adjusted_scores = pred_proba.copy()
         
         # Store planting suitability information for response
@@ -869,7 +921,7 @@ def recommend_crop():
         
         recommendations = []
         for i, idx in enumerate(top_3_indices):
-            crop = le_crop.inverse_transform([idx])[0]
+            crop = all_crops[idx]
             crop_lower = crop.lower()
             confidence = adjusted_scores[idx] * 100
             
@@ -886,6 +938,7 @@ def recommend_crop():
                 'crop': crop,
                 'confidence': round(confidence, 1),
                 'expected_income': expected_income,
+                'market_price': price_snapshot.get(crop),
                 'rank': i + 1,
                 'seasonal_match': crop.lower() in season_crops,
                 'season': season,
@@ -943,7 +996,8 @@ def recommend_crop():
                 'k_value': K, 
                 'ph_value': ph,
                 'soil_health': get_soil_health_status(N, P, K, ph),
-                'soil_improvement_tips': get_soil_improvement_tips(soil_type, N, P, K, ph)
+                'soil_improvement_tips': get_soil_improvement_tips(soil_type, N, P, K, ph),
+                'classification': soil_classification
             },
             'farm_size': farm_size,
             'farm_size_acres': farm_size,
@@ -968,6 +1022,13 @@ def recommend_crop():
                 'water_management': f'Ensure {recommendations[0]["water_requirements"].lower()} water availability for optimal growth',
                 'harvest_planning': f'Expect harvest around {harvest_date} (growing from {datetime.now().strftime("%B %Y")} to {(datetime.now() + timedelta(days=days_to_harvest)).strftime("%B %Y")}, approximately {days_to_harvest//30} months)'
             },
+            'model': model_name,
+            'model_version': model_version,
+            'ensemble': {
+                'contributors': ensemble['contributors'],
+                'dropped': ensemble['dropped'],
+                'latency_ms': ensemble['latency_ms']
+            } if ensemble else None,
             'success': True,
             'message': 'Crop recommendations generated successfully with optimal planting and harvest timeline'
         })
@@ -994,6 +1055,122 @@ def weather_info():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Market prices ---
+PRICE_HISTORY_MAX_WINDOW = 365
+
+def _json_column(values, digits=2):
+    """Rounded floats with NaN and +/-inf as None (neither is valid JSON), converted in one pass"""
+    values = np.round(values, digits)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+@app.route('/prices/history', methods=['GET'])
+def price_history():
+    """Price history for a market and crop with rolling aggregates
+
+    Query: market, crop, optional start/end (YYYY-MM-DD) and window (number of
+    observations for the rolling mean/min/max, default 7).
+    """
+    try:
+        market = request.args.get('market')
+        crop = request.args.get('crop')
+        if not market or not crop:
+            return jsonify({'error': 'market and crop are required'}), 400
+        window = int(request.args.get('window', 7))
+        if not 1 <= window <= PRICE_HISTORY_MAX_WINDOW:
+            return jsonify({'error': f'window must be between 1 and {PRICE_HISTORY_MAX_WINDOW}'}), 400
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = pd.Timestamp(start).date() if start else None
+        end = pd.Timestamp(end).date() if end else None
+
+        result = get_store().history(market, crop, window, start, end)
+        if result is None:
+            return jsonify({'error': f'No prices for {crop} at {market}'}), 404
+        series, lo, hi, agg = result
+
+        prices = series.prices[lo:hi]
+        dates = np.datetime_as_string(series.dates[lo:hi], unit='D').tolist()
+        columns = [_json_column(agg[name][lo:hi]) for name in ('mean', 'min', 'max', 'pct_change')]
+        history = [
+            {'date': d, 'price': p, 'rolling_mean': mean, 'rolling_min': low, 'rolling_max': high, 'pct_change': pct}
+            for d, p, mean, low, high, pct in zip(dates, np.round(prices, 2).tolist(), *columns)
+        ]
+
+        summary = None
+        if hi > lo:
+            summary = {
+                'first': round(float(prices[0]), 2),
+                'last': round(float(prices[-1]), 2),
+                'min': round(float(prices.min()), 2),
+                'max': round(float(prices.max()), 2),
+                'mean': round(float(prices.mean()), 2),
+                'change_pct': round(float((prices[-1] / prices[0] - 1) * 100), 2)
+            }
+
+        return jsonify({
+            'success': True,
+            'market': series.market,
+            'crop': series.crop,
+            'window': window,
+            'unit': 'INR per quintal',
+            'count': hi - lo,
+            'summary': summary,
+            'history': history
+        })
+
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/prices/forecast', methods=['GET'])
+def price_forecast():
+    """Weekly price forecast for a market and crop (?market=&crop=&horizon=), from the forecast table"""
+    try:
+        market = request.args.get('market')
+        crop = request.args.get('crop')
+        if not market or not crop:
+            return jsonify({'error': 'market and crop are required'}), 400
+        horizon = request.args.get('horizon')
+        horizon = int(horizon) if horizon else None
+
+        location = price_key(' '.join(market.split()), ' '.join(crop.split()))
+        name, rows, version = forecast_store.lookup('price', location, horizon)
+        market_name, crop_name = split_price_key(name)
+        response = jsonify({
+            'success': True,
+            'market': market_name,
+            'crop': crop_name,
+            'unit': 'INR per quintal',
+            'period': 'week',
+            'model_version': version,
+            'horizon': len(rows),
+            'forecast': rows
+        })
+        response.set_etag(f"{version}-{hashlib.sha1(f'price|{name}:{len(rows)}'.encode()).hexdigest()[:12]}")
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    except ForecastNotFound as nf:
+        return jsonify({'error': str(nf)}), 404
+    except LookupError as le:
+        return jsonify({'error': str(le)}), 503
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/prices/snapshot', methods=['GET'])
+def price_snapshot_info():
+    """Per-crop median of latest market prices used for income estimates"""
+    crop = request.args.get('crop')
+    if crop:
+        price = price_snapshot.get(crop)
+        if price is None:
+            return jsonify({'error': f'No current market price for {crop}'}), 404
+        return jsonify({'success': True, 'crop': crop, **price})
+    return jsonify({'success': True, **price_snapshot.status(), 'prices': price_snapshot.prices()})
+
 # --- Authentication endpoints ---
 @app.route('/auth/signup', methods=['POST'])
 def signup():
@@ -1057,8 +1234,9 @@ def signin():
         if not result['success']:
             return jsonify({'error': result['error']}), 401
         
-        # Generate JWT token
+        # Generate JWT token and record the session so it can be signed out
         token = generate_jwt_token(result['user'])
+        create_session(result['user']['id'], token)
         
         return jsonify({
             'success': True,
@@ -1079,6 +1257,59 @@ def get_profile():
         'user': request.current_user
     }), 200
 
+@app.route('/auth/profile', methods=['PUT'])
+@require_auth
+def update_profile():
+    """Update the current user's phone, gmail, username or name (protected route)"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        fields = {k: data[k] for k in ('phone', 'gmail', 'username', 'name') if k in data}
+        for field, value in fields.items():
+            if not isinstance(value, str) or not value.strip():
+                return jsonify({'error': f'{field} must be a non-empty string'}), 400
+            fields[field] = value.strip()
+        if 'phone' in fields and (len(str(fields['phone'])) != 10 or not str(fields['phone']).isdigit()):
+            return jsonify({'error': 'Phone number must be exactly 10 digits'}), 400
+        if 'gmail' in fields and not str(fields['gmail']).endswith('@gmail.com'):
+            return jsonify({'error': 'Email must be a valid Gmail address'}), 400
+
+        result = update_user(request.current_user['id'], **fields)
+        if not result['success']:
+            return jsonify({'error': result['error']}), 400
+        return jsonify({'success': True, 'user': result['user']}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/auth/profile', methods=['DELETE'])
+@require_auth
+def delete_profile():
+    """Delete the current user's account (protected route)"""
+    try:
+        result = delete_user(request.current_user['id'])
+        if not result['success']:
+            return jsonify({'error': result['error']}), 404
+        return jsonify({'success': True, 'message': 'Account deleted'}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/auth/signout', methods=['POST'])
+@require_auth
+def signout():
+    """Revoke the token used for this request (protected route)"""
+    revoke_token(request.auth_token)
+    return jsonify({'success': True, 'message': 'Signed out'}), 200
+
+@app.route('/auth/cache/stats', methods=['GET'])
+@require_admin
+def auth_cache_stats():
+    """Hit/miss counters of the in-process user and verified-token caches, session and audit-write stats"""
+    return jsonify({'success': True, **user_cache.stats(), 'tokens': token_cache.stats(),
+                    'sessions': session_store.stats(), 'audit_writes': audit_writer.stats()})
+
 @app.route('/auth/verify', methods=['GET'])
 @require_auth
 def verify_token():
@@ -1089,17 +1320,242 @@ def verify_token():
         'user': request.current_user
     }), 200
 
+def read_soil_images(data, field='image'):
+    """Image bytes from multipart uploads under `field`, else base64 strings in the JSON body
+
+    Raises ValueError past SOIL_MAX_IMAGES images or SOIL_MAX_IMAGE_MB per image,
+    before reading (or decoding) more than the limit.
+    """
+    max_bytes = int(SOIL_MAX_IMAGE_MB * 1024 * 1024)
+    too_large = f'Each image must be at most {SOIL_MAX_IMAGE_MB:g} MB'
+    files = request.files.getlist(field)
+    if len(files) > SOIL_MAX_IMAGES:
+        raise ValueError(f'At most {SOIL_MAX_IMAGES} images per request')
+    if files:
+        images = [f.read(max_bytes + 1) for f in files]
+        if any(len(image) > max_bytes for image in images):
+            raise ValueError(too_large)
+        return images
+    encoded = data.get(field) or []
+    if isinstance(encoded, str):
+        encoded = [encoded]
+    if not isinstance(encoded, list) or not all(isinstance(item, str) for item in encoded):
+        raise ValueError('image must be base64 encoded')
+    if len(encoded) > SOIL_MAX_IMAGES:
+        raise ValueError(f'At most {SOIL_MAX_IMAGES} images per request')
+    # Accept data URLs as sent by browsers
+    encoded = [item.split(',', 1)[-1] for item in encoded]
+    if any(len(item) * 3 // 4 > max_bytes for item in encoded):
+        raise ValueError(too_large)
+    try:
+        return [base64.b64decode(item) for item in encoded]
+    except ValueError:
+        raise ValueError('image must be base64 encoded')
+
+@app.route('/soil/classify', methods=['POST'])
+def classify_soil():
+    """Soil type from one or more photos (multipart 'image' files or base64 'image' in JSON)"""
+    try:
+        data = request.get_json(silent=True) if request.is_json else request.form.to_dict()
+        try:
+            images = read_soil_images(data or {})
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
+        if not images:
+            return jsonify({'error': 'image is required'}), 400
+
+        predictions = soil_classifier.classify(images)
+        return jsonify({'success': True, 'predictions': predictions,
+                        'soil_type': predictions[0]['soil_type'] if len(predictions) == 1 else None})
+
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except RuntimeError as err:
+        return jsonify({'error': str(err)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/soil/stats', methods=['GET'])
+def soil_stats():
+    """Latency and batching stats of the soil image classifier"""
+    return jsonify({'success': True, 'available': soil_classifier.available(), **soil_classifier.stats()})
+
+@app.route('/forecast', methods=['GET', 'POST'])
+def get_forecast():
+    """Precomputed rainfall forecast for a location (?location=&horizon=&kind=)
+
+    POST takes the same fields as JSON, with `locations` for several at once.
+    Responses carry an ETag derived from the table version, so clients can
+    revalidate with If-None-Match and get a 304 until the table is rebuilt.
+    """
+    try:
+        params = request.args.to_dict() if request.method == 'GET' else (request.get_json(silent=True) or {})
+        kind = str(params.get('kind', 'rainfall')).lower()
+        horizon = params.get('horizon')
+        if horizon is not None:
+            try:
+                horizon = int(horizon)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'horizon must be an integer'}), 400
+
+        locations = params.get('locations') or [params.get('location')]
+        if not isinstance(locations, list):
+            return jsonify({'error': 'locations must be a list'}), 400
+
+        forecasts, version = [], None
+        for location in locations:
+            name, rows, version = forecast_store.lookup(kind, location, horizon)
+            forecasts.append({'location': name, 'horizon': len(rows), 'forecast': rows})
+
+        body = {
+            'success': True,
+            'kind': kind,
+            'model_version': version,
+            'generated_at': forecast_store.status()['generated_at'],
+            **(forecasts[0] if 'locations' not in params else {'forecasts': forecasts})
+        }
+        response = jsonify(body)
+        key = ','.join(f"{f['location']}:{f['horizon']}" for f in forecasts)
+        response.set_etag(f"{version}-{hashlib.sha1(f'{kind}|{key}'.encode()).hexdigest()[:12]}")
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    except ForecastNotFound as nf:
+        return jsonify({'error': str(nf), 'available_locations': forecast_store.locations(kind)[:50]}), 400
+    except LookupError as le:
+        return jsonify({'error': str(le)}), 503
+    except ValueError as ve:
+        return jsonify({'error': str(ve), 'available_locations': forecast_store.locations(kind)[:50]}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/forecast/status', methods=['GET'])
+def forecast_status():
+    """Version, horizon and location counts of the loaded forecast table"""
+    return jsonify({'success': True, 'kinds': forecast_store.kinds(), **forecast_store.status()})
+
 # --- Health check endpoint ---
 @app.route('/health', methods=['GET'])
 def health_check():
     """Check if the service is running and model is loaded"""
-    model_status = "loaded" if model is not None else "not_loaded"
+    default_model = model_registry.stats()['models'].get(model_registry.default, {})
+    model_status = "loaded" if default_model.get('loaded') else "not_loaded"
     return jsonify({
         'status': 'healthy',
         'model_status': model_status,
-        'available_endpoints': ['/recommend', '/weather', '/health', '/auth/signup', '/auth/signin', '/auth/profile', '/auth/verify']
+        'model_version': default_model.get('version'),
+        'available_models': model_registry.names(),
+        'available_endpoints': ['/recommend', '/weather', '/health', '/auth/signup', '/auth/signin', '/auth/profile', '/auth/verify', '/auth/signout',
+                                '/models', '/shadow/stats', '/outcomes', '/admin/reload-model', '/admin/shadow',
+                                '/admin/retrain', '/forecast', '/forecast/status',
+                                '/soil/classify', '/soil/stats', '/prices/history',
+                                '/prices/snapshot', '/prices/forecast', '/auth/cache/stats']
     })
 
+@app.route('/models', methods=['GET'])
+def list_models():
+    """Registered model bundles with per-model load time, memory and latency stats"""
+    try:
+        model_registry.discover()
+        return jsonify({'success': True, 'default': model_registry.default, **model_registry.stats(),
+                        'model_cache': model_cache.stats()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/shadow/stats', methods=['GET'])
+def shadow_stats():
+    """Agreement and latency of the shadow candidate model against live predictions"""
+    return jsonify({'success': True, 'shadow': shadow_evaluator.stats()})
+
+# --- Model administration ---
+@app.route('/admin/reload-model', methods=['POST'])
+@require_admin
+def reload_model():
+    """Load, validate and hot-swap a model bundle from disk"""
+    try:
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force', False))
+        model_registry.discover()
+        name = model_registry.resolve(data.get('model'))
+        
+        # Background mode returns immediately; the watcher/log reports the outcome
+        if data.get('background'):
+            threading.Thread(target=model_registry.reload, args=(name, force), daemon=True).start()
+            return jsonify({'success': True, 'message': f'Reload of {name} started'}), 202
+        
+        result = model_registry.reload(name, force=force)
+        return jsonify({'model': name, **result}), 200 if result['success'] else 422
+        
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/outcomes', methods=['POST'])
+@require_auth
+def record_outcomes():
+    """Record labeled farm outcomes (soil/weather features plus the crop that did well)"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        rows = data['outcomes'] if 'outcomes' in data else [data]
+        if not isinstance(rows, list) or not rows:
+            return jsonify({'error': 'outcomes must be a non-empty list'}), 400
+        if not all(isinstance(row, dict) for row in rows):
+            return jsonify({'error': 'Each outcome must be a JSON object'}), 400
+        
+        for row in rows:
+            missing = [c for c in columns + ['label'] if row.get(c) in (None, '')]
+            if missing:
+                return jsonify({'error': f"Missing fields: {', '.join(missing)}"}), 400
+        
+        watermark = outcome_store.append(rows, user_id=request.current_user['id'])
+        return jsonify({'success': True, 'recorded': len(rows), 'watermark': watermark}), 201
+        
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/retrain', methods=['POST'])
+@require_admin
+def retrain_model():
+    """Fold new outcomes into the recommender now (or refit from scratch with refit=true)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        refit = bool(data.get('refit', False))
+        
+        if data.get('background'):
+            retrainer.run_async(force_refit=refit)
+            return jsonify({'success': True, 'message': 'Retraining started'}), 202
+        
+        result = retrainer.run_once(force_refit=refit)
+        if result['success'] and result.get('mode') != 'noop':
+            model_registry.reload('recommender')
+        return jsonify(result), 200 if result['success'] else 500
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/shadow', methods=['POST'])
+@require_admin
+def configure_shadow():
+    """Set the shadow candidate model and sample rate; resets the aggregated stats"""
+    try:
+        data = request.get_json(silent=True) or {}
+        candidate = data.get('model')
+        if candidate:
+            model_registry.discover()
+            candidate = model_registry.resolve(candidate)
+        shadow_evaluator.configure(candidate, data.get('sample_rate'))
+        return jsonify({'success': True, 'shadow': shadow_evaluator.stats()})
+        
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # --- Crop Growing Plan Endpoints ---
 
 @app.route('/crop-plan/<crop_name>', methods=['GET'])
@@ -1189,7 +1645,7 @@ def get_crop_category(crop_name):
 
 if __name__ == "__main__":
     # Train model if not available
-    if model is None:
+    if model_registry.default not in model_registry.names():
         print("Training model on startup...")
         train_model_from_data()
     
@@ -1197,8 +1653,16 @@ if __name__ == "__main__":
     print("📡 Available endpoints:")
     print("  - POST /recommend - Get crop recommendations")
     print("  - GET /weather?location=<city> - Get weather data") 
+    print("  - GET /prices/snapshot - Current median market price per crop")
+    print("  - GET /prices/history?market=<mandi>&crop=<crop> - Price trend with rolling stats")
+    print("  - GET /prices/forecast?market=<mandi>&crop=<crop> - Weekly price forecast")
+    print("  - POST /soil/classify - Soil type from a photo")
+    print("  - GET|POST /forecast?location=<district>&horizon=<months> - Precomputed rainfall forecast")
     print("  - GET /crop-plan/<crop_name> - Get detailed growing plan")
     print("  - GET /available-crops - List all available crops")
     print("  - GET /health - Service health check")
+    print("  - GET /models - Registered models and their stats")
+    print("  - GET /shadow/stats - Shadow candidate agreement and latency")
+    print("  - POST /admin/reload-model - Hot-swap a model bundle")
     
     app.run(debug=True, port=5002, host='0.0.0.0')
@@ -1,22 +1,558 @@
+import atexit
 import sqlite3
 import hashlib
+import hmac
 import jwt
 import datetime
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, current_app
+
+from db_pool import ConnectionPool
 import os
 
 # Database setup
 DB_PATH = os.path.join(os.path.dirname(__file__), 'users.db')
 JWT_SECRET = 'your-secret-key-change-in-production'
+ADMIN_TOKEN = os.environ.get('ML_ADMIN_TOKEN')
+
+# Connection pool: idle connections kept per database file, and how long (ms) a
+# statement waits on another writer's lock before failing with 'database is locked'
+AUTH_DB_POOL_SIZE = int(os.environ.get('AUTH_DB_POOL_SIZE', 16))
+AUTH_DB_BUSY_TIMEOUT_MS = int(os.environ.get('AUTH_DB_BUSY_TIMEOUT_MS', 5000))
+
+# User records cached in-process by user_id: at most AUTH_USER_CACHE_SIZE entries,
+# each trusted for AUTH_USER_CACHE_TTL seconds (0 disables the cache)
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+AUTH_USER_CACHE_TTL = float(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+
+# Put the profile fields in issued tokens so protected routes can skip the user
+# lookup. Such tokens keep working until they expire even if the user is
+# deleted or edited, so this is off by default.
+AUTH_TOKEN_PROFILE_CLAIMS = os.environ.get('AUTH_TOKEN_PROFILE_CLAIMS', '0') == '1'
+
+# Verified tokens remembered by digest, so a repeat request skips the HMAC check
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 4096))
+
+# Sessions: expired rows are deleted every SESSION_SWEEP_INTERVAL seconds in
+# batches of SESSION_SWEEP_BATCH; the revocation filter is sized for
+# REVOCATION_FILTER_CAPACITY revoked tokens at REVOCATION_FILTER_ERROR false positives
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', 300))
+SESSION_SWEEP_BATCH = int(os.environ.get('SESSION_SWEEP_BATCH', 1000))
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 100000))
+REVOCATION_FILTER_ERROR = float(os.environ.get('REVOCATION_FILTER_ERROR', 0.01))
+
+# Write-behind audit updates (last_login): flushed every AUTH_AUDIT_FLUSH_INTERVAL
+# seconds, or sooner once AUTH_AUDIT_MAX_PENDING updates are queued
+AUTH_AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUTH_AUDIT_FLUSH_INTERVAL', 1.0))
+AUTH_AUDIT_MAX_PENDING = int(os.environ.get('AUTH_AUDIT_MAX_PENDING', 5000))
+
+# Statements are module constants so each pooled connection prepares them once
+# and reuses them from sqlite3's per-connection statement cache
+SQL_FIND_DUPLICATE = 'SELECT id FROM users WHERE phone = ? OR gmail = ? OR username = ?'
+SQL_INSERT_USER = '''
+    INSERT INTO users (phone, gmail, username, password_hash, name)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SQL_FIND_LOGIN = '''
+    SELECT id, phone, gmail, username, password_hash, name
+    FROM users
+    WHERE phone = ? OR gmail = ? OR username = ?
+'''
+SQL_UPDATE_LAST_LOGIN = 'UPDATE users SET last_login = ? WHERE id = ?'
+# user_sessions.token holds the SHA-256 hex digest of the JWT, never the token itself
+SQL_INSERT_SESSION = '''
+    INSERT INTO user_sessions (user_id, token, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (token) DO NOTHING
+'''
+SQL_REVOKE_SESSION = '''
+    INSERT INTO user_sessions (user_id, token, expires_at, is_active) VALUES (?, ?, ?, 0)
+    ON CONFLICT (token) DO UPDATE SET is_active = 0
+'''
+SQL_SESSION_REVOKED = 'SELECT 1 FROM user_sessions WHERE token = ? AND is_active = 0'
+SQL_REVOKED_SESSIONS = 'SELECT token FROM user_sessions WHERE is_active = 0 AND expires_at > ?'
+SQL_SWEEP_SESSIONS = '''
+    DELETE FROM user_sessions WHERE id IN (
+        SELECT id FROM user_sessions WHERE expires_at <= ? LIMIT ?
+    )
+'''
+SQL_USER_ACTIVE_SESSIONS = 'SELECT token FROM user_sessions WHERE user_id = ? AND is_active = 1'
+SQL_REVOKE_USER_SESSIONS = 'UPDATE user_sessions SET is_active = 0 WHERE user_id = ? AND is_active = 1'
+SQL_DELETE_USER = 'DELETE FROM users WHERE id = ?'
+SQL_USER_BY_ID = '''
+    SELECT id, phone, gmail, username, name, created_at, last_login
+    FROM users
+    WHERE id = ?
+'''
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    """Shared pool for a database file (default: DB_PATH, read at call time)"""
+    path = os.path.abspath(path or DB_PATH)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path, size=AUTH_DB_POOL_SIZE, busy_timeout_ms=AUTH_DB_BUSY_TIMEOUT_MS)
+        return _pools[path]
+
+class UserCache:
+    """Bounded TTL cache of user records keyed by user_id
+
+    Entries expire `ttl` seconds after they were loaded, and the least
+    recently used entry is evicted past `max_size`. Writers to the users table
+    call invalidate() so a profile change or deletion is visible on the next
+    request in this process; the TTL bounds staleness from writes made by
+    other processes. Lookups of missing users are not cached.
+
+    Loads run outside the lock. Each key with a load in flight carries a
+    generation that invalidate() bumps, and a load whose generation changed
+    meanwhile returns its row without caching it, so a write that lands
+    during the load is never overwritten by the older row.
+    """
+
+    def __init__(self, max_size=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at, user)
+        self._loading = {}  # user_id -> [loads in flight, generation]
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+        self.claim_hits = 0
+
+    def get(self, user_id, loader):
+        """Cached copy of the user, calling loader(user_id) on a miss"""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return loader(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[user_id]
+                self.expired += 1
+            self.misses += 1
+            loading = self._loading.setdefault(user_id, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+
+        user = None
+        try:
+            user = loader(user_id)
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if loading[0] == 0:
+                    del self._loading[user_id]
+                if user is not None and loading[1] == generation:
+                    self._entries[user_id] = (now + self.ttl, user)
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+        return dict(user) if user is not None else None
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if user_id in self._loading:
+                self._loading[user_id][1] += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_s': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'token_claim_hits': self.claim_hits,
+            'token_profile_claims': AUTH_TOKEN_PROFILE_CLAIMS
+        }
+
+
+user_cache = UserCache()
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).digest()
+
+class TokenCache:
+    """LRU of verified token digests -> decoded payloads
+
+    A cached payload is returned only while its `exp` is in the future, so
+    caching never extends a token's life. Revocation is checked against the
+    session store before the cache, so a revoked token is rejected on the very
+    next request.
+    """
+
+    def __init__(self, max_size=AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (exp, payload)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, digest, now=None):
+        """Payload for a verified, unexpired digest; None means verify it"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[digest]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, digest, payload):
+        exp = payload.get('exp')
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[digest] = (exp, dict(payload))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+token_cache = TokenCache()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over token digests
+
+    Positions come from double hashing the (already uniform) SHA-256 digest,
+    so adding or testing a key costs no extra hashing.
+    """
+
+    def __init__(self, capacity=REVOCATION_FILTER_CAPACITY, error_rate=REVOCATION_FILTER_ERROR):
+        capacity = max(int(capacity), 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class SessionStore:
+    """Issued tokens in user_sessions, with revocation checked in memory
+
+    Every sign-in records the token digest and its expiry. Signing out marks
+    the row inactive and adds the digest to a Bloom filter of revoked tokens,
+    so the usual case -- a token that was never revoked -- is answered from
+    memory; only a filter hit is confirmed against the table (an indexed
+    lookup on the token digest). A background sweeper deletes expired rows in
+    small batches and rebuilds the filter from the table, which also picks up
+    revocations made by other processes.
+    """
+
+    def __init__(self, sweep_interval=SESSION_SWEEP_INTERVAL, batch=SESSION_SWEEP_BATCH):
+        self.sweep_interval = sweep_interval
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._filter = BloomFilter()
+        self._recent = []  # digests revoked while the filter is being rebuilt
+        self._rebuilding = False
+        self._stop = threading.Event()
+        self._worker = None
+        self.created = 0
+        self.revoked = 0
+        self.filter_passes = 0
+        self.confirmed = 0
+        self.false_positives = 0
+        self.swept = 0
+        self.last_sweep = None
+        self.last_error = None
+
+    def create(self, user_id, digest, exp):
+        with get_pool().transaction() as conn:
+            conn.execute(SQL_INSERT_SESSION, (user_id, digest.hex(), int(exp)))
+        self.created += 1
+
+    def revoke(self, user_id, digest, exp):
+        with get_pool().transaction() as conn:
+            conn.execute(SQL_REVOKE_SESSION, (user_id, digest.hex(), int(exp)))
+        self._remember([digest])
+
+    def revoke_user(self, conn, user_id):
+        """Revoke every live session of a user inside the caller's transaction; returns how many
+
+        The rows are kept (inactive) until the sweeper removes them at expiry,
+        so tokens answered from their claims alone stay rejected.
+        """
+        digests = [bytes.fromhex(row[0]) for row in conn.execute(SQL_USER_ACTIVE_SESSIONS, (user_id,))]
+        conn.execute(SQL_REVOKE_USER_SESSIONS, (user_id,))
+        # A rollback only leaves extra filter entries, which the table lookup rejects
+        self._remember(digests)
+        return len(digests)
+
+    def _remember(self, digests):
+        with self._lock:
+            for digest in digests:
+                self._filter.add(digest)
+            if self._rebuilding:
+                self._recent.extend(digests)
+        self.revoked += len(digests)
+
+    def is_revoked(self, digest):
+        if digest not in self._filter:
+            self.filter_passes += 1
+            return False
+        with get_pool().connection() as conn:
+            revoked = conn.execute(SQL_SESSION_REVOKED, (digest.hex(),)).fetchone() is not None
+        if revoked:
+            self.confirmed += 1
+        else:
+            self.false_positives += 1
+        return revoked
+
+    def reload(self):
+        """Rebuild the revocation filter from unexpired revoked rows"""
+        with self._lock:
+            self._rebuilding = True
+            self._recent = []
+        try:
+            with get_pool().connection() as conn:
+                digests = [bytes.fromhex(row[0]) for row in conn.execute(SQL_REVOKED_SESSIONS, (int(time.time()),))]
+            bloom = BloomFilter(max(REVOCATION_FILTER_CAPACITY, 2 * len(digests)))
+            for digest in digests:
+                bloom.add(digest)
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+            raise
+        with self._lock:
+            # Revocations committed after the query started must survive the swap
+            for digest in self._recent:
+                bloom.add(digest)
+            self._filter = bloom
+            self._rebuilding = False
+            self._recent = []
+
+    def sweep(self):
+        """Delete expired sessions, one short transaction per batch; returns rows deleted"""
+        now, deleted = int(time.time()), 0
+        while True:
+            with get_pool().transaction() as conn:
+                count = conn.execute(SQL_SWEEP_SESSIONS, (now, self.batch)).rowcount
+            deleted += count
+            if count < self.batch:
+                break
+        self.swept += deleted
+        self.last_sweep = time.time()
+        return deleted
+
+    def maintain(self):
+        try:
+            self.sweep()
+            self.reload()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠ Session sweep failed: {str(e)}")
+
+    def start(self):
+        """Load the filter now, then sweep and reload every sweep_interval seconds"""
+        if self._worker is not None:
+            return
+        self.maintain()
+
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                self.maintain()
+
+        self._worker = threading.Thread(target=run, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'created': self.created,
+            'revoked': self.revoked,
+            'filter_entries': self._filter.count,
+            'filter_bytes': len(self._filter._bits),
+            'filter_passes': self.filter_passes,
+            'confirmed_revoked': self.confirmed,
+            'false_positives': self.false_positives,
+            'swept': self.swept,
+            'last_sweep': self.last_sweep,
+            'last_error': self.last_error
+        }
+
+
+session_store = SessionStore()
+
+class AuditWriter:
+    """Write-behind queue for audit updates such as last_login
+
+    record() only stores the update in memory, so sign-in never waits on
+    SQLite's writer lock. Updates to the same row coalesce (the newest wins),
+    and a background thread applies everything queued in one transaction per
+    flush, with one executemany per statement. Updated users are evicted from
+    the user cache once their row is written. Pending updates are flushed at
+    interpreter exit; a failed flush keeps them queued for the next attempt.
+    """
+
+    def __init__(self, interval=AUTH_AUDIT_FLUSH_INTERVAL, max_pending=AUTH_AUDIT_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # (sql, row key) -> (params, user_id)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    def record(self, sql, key, params, user_id=None):
+        """Queue `sql` with `params`; a later update with the same key replaces it"""
+        with self._lock:
+            self._pending[(sql, key)] = (params, user_id)
+            self.queued += 1
+            full = len(self._pending) >= self.max_pending
+        if self._worker is None:
+            self.start()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued in one transaction; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            start = time.perf_counter()
+            by_sql = {}
+            for (sql, _), (params, _) in pending.items():
+                by_sql.setdefault(sql, []).append(params)
+            try:
+                with get_pool().transaction() as conn:
+                    for sql, rows in by_sql.items():
+                        conn.executemany(sql, rows)
+            except Exception as e:
+                with self._lock:
+                    # Requeue, without overwriting anything recorded since
+                    for key, value in pending.items():
+                        self._pending.setdefault(key, value)
+                self.last_error = str(e)
+                print(f"⚠ Audit flush failed, {len(pending)} updates kept: {str(e)}")
+                return 0
+            for _, user_id in pending.values():
+                if user_id is not None:
+                    user_cache.invalidate(user_id)
+            self.written += len(pending)
+            self.batches += 1
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_error = None
+            return len(pending)
+
+    def start(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+
+            def run():
+                while not self._stop.is_set():
+                    self._wake.wait(self.interval)
+                    self._wake.clear()
+                    self.flush()
+
+            self._worker = threading.Thread(target=run, daemon=True)
+            self._worker.start()
+
+    def close(self):
+        """Stop the writer and flush what is left"""
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'queued': self.queued,
+            'written': self.written,
+            'batches': self.batches,
+            'interval_s': self.interval,
+            'last_flush_ms': self.last_flush_ms,
+            'last_error': self.last_error
+        }
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.close)
 
 def init_database():
     """Initialize the user database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    with get_pool().transaction() as conn:
+        _create_tables(conn)
+    print("✓ User database initialized")
+
+def _create_tables(conn):
     # Create users table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             phone TEXT UNIQUE NOT NULL,
@@ -30,7 +566,7 @@ def init_database():
     ''')
     
     # Create user_sessions table for session management
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS user_sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
@@ -42,9 +578,8 @@ def init_database():
         )
     ''')
     
-    conn.commit()
-    conn.close()
-    print("✓ User database initialized")
+    # Expiry sweeps range-scan expires_at; token (the digest) is indexed by its UNIQUE constraint
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions (expires_at)')
 
 def hash_password(password):
     """Hash password using SHA-256"""
@@ -54,49 +589,68 @@ def verify_password(password, password_hash):
     """Verify password against hash"""
     return hash_password(password) == password_hash
 
-def generate_jwt_token(user_data):
-    """Generate JWT token for user"""
+def generate_jwt_token(user_data, profile_claims=None):
+    """Generate JWT token for user
+
+    With profile_claims (default AUTH_TOKEN_PROFILE_CLAIMS) the token also
+    carries gmail and name, enough for user_from_token() to skip the lookup.
+    """
     payload = {
         'user_id': user_data['id'],
         'phone': user_data['phone'],
         'username': user_data['username'],
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)  # Token expires in 7 days
+        'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=7),  # Token expires in 7 days
+        # Unique per issue, so two sign-ins in the same second get distinct tokens and sessions
+        'jti': uuid.uuid4().hex
     }
+    if AUTH_TOKEN_PROFILE_CLAIMS if profile_claims is None else profile_claims:
+        payload['profile'] = {'gmail': user_data.get('gmail'), 'name': user_data.get('name')}
     return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
 
 def verify_jwt_token(token):
-    """Verify and decode JWT token"""
+    """Verify and decode JWT token (None if invalid, expired or revoked)"""
+    digest = token_digest(token)
+    if session_store.is_revoked(digest):
+        return None
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    token_cache.put(digest, payload)
+    return payload
+
+def create_session(user_id, token):
+    """Record a newly issued token in user_sessions so it can be revoked"""
+    payload = verify_jwt_token(token)
+    if payload is not None:
+        session_store.create(user_id, token_digest(token), payload['exp'])
+
+def revoke_token(token):
+    """Reject `token` from now on; returns False if it was not a valid token"""
+    payload = verify_jwt_token(token)
+    if payload is None:
+        return False
+    digest = token_digest(token)
+    session_store.revoke(payload['user_id'], digest, payload['exp'])
+    token_cache.discard(digest)
+    return True
 
 def create_user(phone, gmail, username, password, name=None):
     """Create a new user in the database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     try:
-        # Check if user already exists
-        cursor.execute('SELECT id FROM users WHERE phone = ? OR gmail = ? OR username = ?', 
-                      (phone, gmail, username))
-        if cursor.fetchone():
-            conn.close()
-            return {'success': False, 'error': 'User with this phone, email, or username already exists'}
-        
-        # Create new user
-        password_hash = hash_password(password)
-        cursor.execute('''
-            INSERT INTO users (phone, gmail, username, password_hash, name)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (phone, gmail, username, password_hash, name))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with get_pool().transaction() as conn:
+            # Check if user already exists
+            if conn.execute(SQL_FIND_DUPLICATE, (phone, gmail, username)).fetchone():
+                return {'success': False, 'error': 'User with this phone, email, or username already exists'}
+            
+            # Create new user
+            password_hash = hash_password(password)
+            user_id = conn.execute(SQL_INSERT_USER, (phone, gmail, username, password_hash, name)).lastrowid
         
         return {
             'success': True, 
@@ -109,25 +663,16 @@ def create_user(phone, gmail, username, password, name=None):
             }
         }
     except Exception as e:
-        conn.close()
         return {'success': False, 'error': str(e)}
 
 def authenticate_user(identifier, password):
     """Authenticate user by phone/gmail/username and password"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Try to find user by phone, gmail, or username
-    cursor.execute('''
-        SELECT id, phone, gmail, username, password_hash, name 
-        FROM users 
-        WHERE phone = ? OR gmail = ? OR username = ?
-    ''', (identifier, identifier, identifier))
-    
-    user = cursor.fetchone()
+    pool = get_pool()
+    with pool.connection() as conn:
+        # Try to find user by phone, gmail, or username
+        user = conn.execute(SQL_FIND_LOGIN, (identifier, identifier, identifier)).fetchone()
     
     if not user:
-        conn.close()
         return {'success': False, 'error': 'User not found'}
     
     user_data = {
@@ -140,13 +685,11 @@ def authenticate_user(identifier, password):
     }
     
     if not verify_password(password, user_data['password_hash']):
-        conn.close()
         return {'success': False, 'error': 'Invalid password'}
     
-    # Update last login
-    cursor.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user_data['id'],))
-    conn.commit()
-    conn.close()
+    # Update last login (written behind, in batches)
+    now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    audit_writer.record(SQL_UPDATE_LAST_LOGIN, user_data['id'], (now, user_data['id']), user_id=user_data['id'])
     
     # Remove password hash from returned data
     del user_data['password_hash']
@@ -154,18 +697,13 @@ def authenticate_user(identifier, password):
     return {'success': True, 'user': user_data}
 
 def get_user_by_id(user_id):
-    """Get user data by user ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, phone, gmail, username, name, created_at, last_login
-        FROM users 
-        WHERE id = ?
-    ''', (user_id,))
-    
-    user = cursor.fetchone()
-    conn.close()
+    """Get user data by user ID, from the user cache when fresh"""
+    return user_cache.get(user_id, load_user)
+
+def load_user(user_id):
+    """Read a user record from the database, bypassing the cache"""
+    with get_pool().connection() as conn:
+        user = conn.execute(SQL_USER_BY_ID, (user_id,)).fetchone()
     
     if not user:
         return None
@@ -180,6 +718,54 @@ def get_user_by_id(user_id):
         'last_login': user[6]
     }
 
+def update_user(user_id, **fields):
+    """Update profile fields (phone, gmail, username, name); returns the updated user"""
+    allowed = {'phone', 'gmail', 'username', 'name'}
+    unknown = set(fields) - allowed
+    if unknown:
+        return {'success': False, 'error': f"Cannot update {', '.join(sorted(unknown))}"}
+    if not fields:
+        return {'success': False, 'error': 'Nothing to update'}
+    columns = sorted(fields)
+    try:
+        with get_pool().transaction() as conn:
+            cursor = conn.execute(f"UPDATE users SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                                  [fields[c] for c in columns] + [user_id])
+            if cursor.rowcount == 0:
+                return {'success': False, 'error': 'User not found'}
+    except sqlite3.IntegrityError as e:
+        if 'UNIQUE' not in str(e):
+            return {'success': False, 'error': f'Invalid profile update: {str(e)}'}
+        return {'success': False, 'error': 'User with this phone, email, or username already exists'}
+    finally:
+        user_cache.invalidate(user_id)
+    return {'success': True, 'user': get_user_by_id(user_id)}
+
+def delete_user(user_id):
+    """Delete a user and revoke their sessions"""
+    try:
+        with get_pool().transaction() as conn:
+            session_store.revoke_user(conn, user_id)
+            deleted = conn.execute(SQL_DELETE_USER, (user_id,)).rowcount
+    finally:
+        user_cache.invalidate(user_id)
+    if not deleted:
+        return {'success': False, 'error': 'User not found'}
+    return {'success': True}
+
+def user_from_token(payload):
+    """Current user for a verified token payload
+
+    Tokens issued with profile claims are answered from the claims alone;
+    others go through the user cache.
+    """
+    profile = payload.get('profile')
+    if isinstance(profile, dict):
+        user_cache.claim_hits += 1
+        return {'id': payload['user_id'], 'phone': payload.get('phone'), 'username': payload.get('username'),
+                'gmail': profile.get('gmail'), 'name': profile.get('name')}
+    return get_user_by_id(payload['user_id'])
+
 def require_auth(f):
     """Decorator to require authentication for protected routes"""
     @wraps(f)
@@ -198,7 +784,8 @@ def require_auth(f):
             return jsonify({'error': 'Invalid or expired token'}), 401
         
         # Add user data to request
-        request.current_user = get_user_by_id(payload['user_id'])
+        request.auth_token = token
+        request.current_user = user_from_token(payload)
         if not request.current_user:
             return jsonify({'error': 'User not found'}), 401
         
@@ -206,6 +793,24 @@ def require_auth(f):
     
     return decorated_function
 
+def require_admin(f):
+    """Decorator for operational endpoints; requires X-Admin-Token to match ML_ADMIN_TOKEN
+
+    Fails closed: without ML_ADMIN_TOKEN configured every call is refused.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled; set ML_ADMIN_TOKEN to enable them'}), 403
+        
+        supplied = request.headers.get('X-Admin-Token') or ''
+        if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Admin token required'}), 403
+        
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
 # Initialize database when module is imported
 if not os.path.exists(DB_PATH):
     init_database()
\ No newline at end of file
@@ -0,0 +1,126 @@
+# benchmarks/bench_auth.py
+#
+# Sign-in throughput under concurrency, adding auth.py's features one at a
+# time to the old connect-per-call pattern on a rollback-journal database. Each
+# operation is one sign-in (lookup + last_login update) followed by one profile
+# read, as /auth/signin and a protected route would do. Columns:
+#
+#   legacy        fresh connection per query, default journal, synchronous update
+#   pool          pooled WAL connections, still a synchronous update, uncached read
+#   +user cache   as pool, with the profile read through the user cache
+#   +write-behind as +user cache, with last_login queued to the audit writer
+#                 (auth.authenticate_user + get_user_by_id, i.e. what serves requests)
+#
+# Each column's gain is relative to the one before it.
+#   python benchmarks/bench_auth.py [--threads 1 4 16] [--users 1000] [--ops 2000]
+
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import auth
+
+
+def legacy_signin(db_path, identifier, password):
+    """The previous implementation: a fresh connection per query, default journal"""
+    conn = sqlite3.connect(db_path)
+    user = conn.execute(auth.SQL_FIND_LOGIN, (identifier, identifier, identifier)).fetchone()
+    if user and auth.verify_password(password, user[4]):
+        conn.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user[0],))
+        conn.commit()
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    conn.execute(auth.SQL_USER_BY_ID, (user[0],)).fetchone()
+    conn.close()
+
+
+def pool_signin(identifier, password, read_user=auth.load_user):
+    """Pooled connections only: the same queries as legacy_signin, last_login written in the request"""
+    pool = auth.get_pool()
+    with pool.connection() as conn:
+        user = conn.execute(auth.SQL_FIND_LOGIN, (identifier, identifier, identifier)).fetchone()
+    if user and auth.verify_password(password, user[4]):
+        now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with pool.transaction() as conn:
+            conn.execute(auth.SQL_UPDATE_LAST_LOGIN, (now, user[0]))
+    read_user(user[0])
+
+
+def cached_signin(identifier, password):
+    pool_signin(identifier, password, read_user=auth.get_user_by_id)
+
+
+def full_signin(identifier, password):
+    result = auth.authenticate_user(identifier, password)
+    auth.get_user_by_id(result['user']['id'])
+
+
+def seed(n_users):
+    for i in range(n_users):
+        auth.create_user(f'9{i:09d}', f'user{i}@example.com', f'user{i}', 'secret', f'User {i}')
+
+
+def run(fn, threads, ops, n_users):
+    errors = 0
+
+    def one(i):
+        nonlocal errors
+        try:
+            fn(f'user{i % n_users}', 'secret')
+        except sqlite3.OperationalError:
+            errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(ops)))
+    return ops / (time.perf_counter() - start), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sign-in throughput as each auth.py feature is added')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        auth.DB_PATH = os.path.join(work_dir, 'pooled.db')
+        auth.init_database()
+        seed(args.users)
+        pooled = auth.get_pool()
+
+        legacy_path = os.path.join(work_dir, 'legacy.db')
+        conn = sqlite3.connect(legacy_path)
+        auth._create_tables(conn)
+        conn.executemany(auth.SQL_INSERT_USER, sqlite3.connect(auth.DB_PATH).execute(
+            'SELECT phone, gmail, username, password_hash, name FROM users').fetchall())
+        conn.commit()
+        conn.close()
+
+        variants = [('legacy', lambda i, p: legacy_signin(legacy_path, i, p)), ('pool', pool_signin),
+                    ('+user cache', cached_signin), ('+write-behind', full_signin)]
+        print(f"{'threads':>7}" + ''.join(f"  {name + ' ops/s':>19}" for name, _ in variants) + f"  {'errors':>11}")
+        for threads in args.threads:
+            cells, errors, previous = [], [], None
+            for name, fn in variants:
+                auth.user_cache.clear()  # every cached column starts cold
+                ops, failed = run(fn, threads, args.ops, args.users)
+                gain = f"({ops / previous:.1f}x)" if previous else ''
+                cells.append(f"{ops:>11,.0f} {gain:>7}")
+                errors.append(str(failed))
+                previous = ops
+            print(f"{threads:>7}" + ''.join(f"  {cell:>19}" for cell in cells) + f"  {'/'.join(errors):>11}")
+        auth.audit_writer.close()
+        print(f"pool: {pooled.stats()}")
+        print(f"audit writes: {auth.audit_writer.stats()}")
+        pooled.close()
+
+
+if __name__ == '__main__':
+    main()
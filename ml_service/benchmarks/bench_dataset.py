@@ -0,0 +1,72 @@
+# benchmarks/bench_dataset.py
+#
+# Compares pandas CSV parsing against the columnar dataset cache at 1x, 10x
+# and 100x the size of data/raw/crop_data.csv (synthetic rows are resampled
+# from the real data with small numeric jitter).
+#
+#   python benchmarks/bench_dataset.py [--scales 1 10 100] [--repeat 3]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset import load_dataset
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "raw", "crop_data.csv")
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+
+def synthesize(df, scale, seed=42):
+    rng = np.random.default_rng(seed)
+    out = df.sample(n=len(df) * scale, replace=True, random_state=seed).reset_index(drop=True)
+    for col in ['temperature', 'humidity', 'ph', 'rainfall']:
+        out[col] = out[col] * rng.normal(1.0, 0.02, len(out))
+    return out
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def bench(scales, repeat):
+    base = pd.read_csv(RAW_DATA_PATH)
+    print(f"{'scale':>6} {'rows':>9} {'read_csv':>10} {'cold cache':>11} {'warm cache':>11} {'speedup':>8} {'MB csv':>7} {'MB typed':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            csv_path = os.path.join(tmp, f'crop_data_x{scale}.csv')
+            synthesize(base, scale).to_csv(csv_path, index=False)
+            cache_dir = os.path.join(tmp, f'cache_x{scale}')
+
+            def pandas_path():
+                df = pd.read_csv(csv_path)
+                return df[FEATURES].to_numpy(), df['label'].to_numpy()
+
+            def cached_path():
+                ds = load_dataset(csv_path, cache_dir=cache_dir)
+                return ds.matrix(FEATURES), ds.codes('label')
+
+            read_s, (X, _) = best_of(pandas_path, repeat)
+            cold_s, _ = best_of(cached_path, 1)
+            warm_s, (X_typed, _) = best_of(cached_path, repeat)
+
+            print(f"{scale:>5}x {len(X):>9} {read_s*1000:>8.1f}ms {cold_s*1000:>9.1f}ms {warm_s*1000:>9.1f}ms "
+                  f"{read_s / warm_s:>7.1f}x {X.nbytes / 1e6:>7.1f} {X_typed.nbytes / 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the columnar dataset cache')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    bench(args.scales, args.repeat)
@@ -0,0 +1,243 @@
+# benchmarks/bench_inference.py
+#
+# Inference benchmark for every *_bundle.joblib in data/processed: load time
+# and RSS growth, p50/p95/p99 predict latency across batch sizes, and
+# single-row throughput under 1..N threads, for each evaluator path. Results go
+# to JSON; --compare flags regressions against an earlier run.
+#
+#   python benchmarks/bench_inference.py --output bench.json
+#   python benchmarks/bench_inference.py --output new.json --compare bench.json
+
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from model_manager import BUNDLE_SUFFIX, FEATURE_COLUMNS, CANARY_INPUTS, ModelVersion
+
+PROCESSED_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "processed")
+BATCH_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
+REGRESSION_THRESHOLD = 0.10
+
+
+def rss_mb():
+    """Current resident set size, from /proc where available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (FileNotFoundError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_inputs(n, seed=0):
+    """Synthetic rows jittered around the canary inputs, which span the served soil/weather range"""
+    rng = np.random.default_rng(seed)
+    base = np.array(CANARY_INPUTS, dtype=float)
+    rows = base[rng.integers(0, len(base), n)]
+    return rows * rng.normal(1.0, 0.05, rows.shape)
+
+
+def serving_evaluator(version):
+    """The /recommend path: DataFrame construction, scaler, predict_proba"""
+    def run(rows):
+        return version.predict_proba(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+    return (lambda rows: rows), run
+
+
+def sklearn_evaluator(version):
+    """Model call only, on rows scaled outside the timed region"""
+    def prepare(rows):
+        return version.scaler.transform(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+
+    def run(scaled):
+        if hasattr(version.model, 'predict_proba'):
+            return version.model.predict_proba(scaled)
+        return version.model.predict(scaled, verbose=0)
+    return prepare, run
+
+
+EVALUATORS = {'serving': serving_evaluator, 'sklearn': sklearn_evaluator}
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {'p50': round(float(np.percentile(ms, 50)), 4),
+            'p95': round(float(np.percentile(ms, 95)), 4),
+            'p99': round(float(np.percentile(ms, 99)), 4),
+            'mean': round(float(ms.mean()), 4)}
+
+
+def bench_latency(prepare, run, batch_sizes, min_repeats, time_budget):
+    results = {}
+    for size in batch_sizes:
+        rows = prepare(make_inputs(size, seed=size))
+        run(rows)  # warm up
+        samples = []
+        deadline = time.perf_counter() + time_budget
+        while len(samples) < min_repeats or (time.perf_counter() < deadline and len(samples) < 1000):
+            start = time.perf_counter()
+            run(rows)
+            samples.append(time.perf_counter() - start)
+        results[str(size)] = {**percentiles(samples), 'rows_per_sec': round(size / np.median(samples), 1),
+                              'samples': len(samples)}
+    return results
+
+
+def bench_throughput(prepare, run, thread_counts, duration):
+    """Single-row requests per second with N threads issuing calls back to back"""
+    results = {}
+    rows = [prepare(make_inputs(1, seed=i)) for i in range(64)]
+    for n_threads in thread_counts:
+        counts = [0] * n_threads
+        stop = threading.Event()
+
+        def worker(i):
+            j = 0
+            while not stop.is_set():
+                run(rows[j % len(rows)])
+                counts[i] += 1
+                j += 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        results[str(n_threads)] = round(sum(counts) / elapsed, 1)
+    return results
+
+
+def bench_bundle(path, args):
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    bundle = joblib.load(path)
+    load_seconds = time.perf_counter() - start
+    version = ModelVersion(bundle, checksum='', mtime=0)
+    version.predict_proba(CANARY_INPUTS)
+    rss_after = rss_mb()
+
+    report = {
+        'file_mb': round(os.path.getsize(path) / (1024 * 1024), 3),
+        'load_seconds': round(load_seconds, 4),
+        'rss_delta_mb': round(rss_after - rss_before, 2),
+        'model_type': type(version.model).__name__,
+        'evaluators': {}
+    }
+    for name in args.evaluators:
+        prepare, run = EVALUATORS[name](version)
+        print(f"  {name}: latency", flush=True)
+        latency = bench_latency(prepare, run, args.batch_sizes, args.min_repeats, args.time_budget)
+        print(f"  {name}: throughput", flush=True)
+        throughput = bench_throughput(prepare, run, args.threads, args.duration)
+        report['evaluators'][name] = {'latency_ms': latency, 'throughput_rps': throughput}
+    return report
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Regressions: latency up, throughput down or load time up by more than `threshold`"""
+    regressions = []
+
+    def check(label, new, old, higher_is_worse=True):
+        if old in (None, 0) or new is None:
+            return
+        change = (new - old) / old if higher_is_worse else (old - new) / old
+        if change > threshold:
+            regressions.append({'metric': label, 'baseline': old, 'current': new, 'change_pct': round(change * 100, 1)})
+
+    for model, cur in current['models'].items():
+        base = baseline.get('models', {}).get(model)
+        if not base or 'error' in cur or 'error' in base:
+            continue
+        check(f'{model}.load_seconds', cur['load_seconds'], base['load_seconds'])
+        for ev, cur_ev in cur['evaluators'].items():
+            base_ev = base['evaluators'].get(ev)
+            if not base_ev:
+                continue
+            for size, stats in cur_ev['latency_ms'].items():
+                old = base_ev['latency_ms'].get(size)
+                if old:
+                    for p in ('p50', 'p95', 'p99'):
+                        check(f'{model}.{ev}.batch{size}.{p}', stats[p], old[p])
+            for n, rps in cur_ev['throughput_rps'].items():
+                check(f'{model}.{ev}.threads{n}.rps', rps, base_ev['throughput_rps'].get(n), higher_is_worse=False)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark inference for every model bundle')
+    parser.add_argument('--bundles', nargs='*', help='bundle names (default: all in data/processed)')
+    parser.add_argument('--evaluators', nargs='+', default=list(EVALUATORS), choices=list(EVALUATORS))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--min-repeats', type=int, default=20)
+    parser.add_argument('--time-budget', type=float, default=1.0, help='seconds per batch size')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per thread count')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(PROCESSED_PATH, '*' + BUNDLE_SUFFIX)))
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'models': {}
+    }
+    for path in paths:
+        name = os.path.basename(path)[:-len(BUNDLE_SUFFIX)]
+        if args.bundles and name not in args.bundles:
+            continue
+        print(f"▶ {name}", flush=True)
+        try:
+            results['models'][name] = bench_bundle(path, args)
+        except Exception as e:
+            print(f"  ✗ skipped: {str(e)}")
+            results['models'][name] = {'error': str(e)}
+
+    for name, r in results['models'].items():
+        if 'error' in r:
+            continue
+        print(f"\n{name} ({r['model_type']}): load {r['load_seconds'] * 1000:.0f}ms, RSS +{r['rss_delta_mb']:.1f}MB")
+        for ev, data in r['evaluators'].items():
+            lat = ', '.join(f"b{s}: {v['p50']:.2f}/{v['p95']:.2f}/{v['p99']:.2f}" for s, v in data['latency_ms'].items())
+            thr = ', '.join(f"{n}t: {v:.0f}" for n, v in data['throughput_rps'].items())
+            print(f"  {ev:<8} p50/p95/p99 ms  {lat}")
+            print(f"  {ev:<8} rows/s          {thr}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r['metric']}: {r['baseline']} -> {r['current']} ({r['change_pct']:+.1f}%)")
+            return 1
+        print(f"\n✓ No regressions over {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# benchmarks/bench_price_forecast.py
+#
+# Price forecast fitting time: all series at once (PriceForecastModel) vs a
+# per-series Python loop doing the same alignment, holdout selection and
+# exponential smoothing. Synthetic series report on ~3 of every 7 days for three
+# years with a yearly cycle; the loop is timed on a sample and extrapolated.
+#
+#   python benchmarks/bench_price_forecast.py [--series 1000 10000] [--loop-sample 200]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from price_engine import PriceForecastModel, align, METHODS, ALPHAS, DEFAULT_HORIZON, HISTORY_PERIODS
+from price_store import PriceSeries
+
+
+def synthesize(n_series, days=3 * 365, report_rate=3 / 7, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2022-01-03', 'D')
+    day = np.arange(days)
+    series = []
+    for i in range(n_series):
+        observed = day[rng.random(days) < report_rate]
+        base = rng.uniform(1500, 6000)
+        prices = base * (1 + 0.15 * np.sin(2 * np.pi * observed / 365.25 + rng.uniform(0, 6.3)))
+        prices += rng.normal(0, base * 0.05, len(observed))
+        series.append(PriceSeries(f'Mandi {i // 10:05d}', f'Crop {i % 10}', start + observed, prices))
+    return series
+
+
+def loop_fit(series, horizon=DEFAULT_HORIZON):
+    """The same models fitted one series (and one alpha) at a time"""
+    forecasts = []
+    for s in series:
+        row, _ = align([(s.dates, s.prices)])
+        values = row[0]
+        best = None
+        for alpha in ALPHAS:
+            level, sse = None, 0.0
+            for y in values:
+                if np.isnan(y):
+                    continue
+                if level is None:
+                    level = y
+                    continue
+                sse += (y - level) ** 2
+                level += alpha * (y - level)
+            if best is None or sse < best[0]:
+                best = (sse, level)
+        forecasts.append([best[1]] * horizon)
+    return forecasts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized vs per-series price forecast fitting')
+    parser.add_argument('--series', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--loop-sample', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'series':>8}  {'align s':>8}  {'fit s':>7}  {'series/s':>10}  {'loop s (est.)':>14}  {'speedup':>8}")
+    for n_series in args.series:
+        series = synthesize(n_series)
+
+        start = time.perf_counter()
+        align([(s.dates, s.prices) for s in series], history=HISTORY_PERIODS)
+        align_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model = PriceForecastModel().fit(series)
+        fit_s = time.perf_counter() - start
+
+        sample = series[:args.loop_sample]
+        start = time.perf_counter()
+        loop_fit(sample)
+        loop_s = (time.perf_counter() - start) * n_series / len(sample)
+
+        print(f"{n_series:>8,}  {align_s:>8.2f}  {fit_s:>7.2f}  {n_series / fit_s:>10,.0f}  "
+              f"{loop_s:>14.1f}  {loop_s / fit_s:>7.0f}x")
+
+    chosen = np.bincount(model.method, minlength=len(METHODS))
+    print('methods chosen: ' + ', '.join(f'{name} {count:,}' for name, count in zip(METHODS, chosen)))
+
+
+if __name__ == '__main__':
+    main()
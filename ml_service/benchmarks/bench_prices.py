@@ -0,0 +1,79 @@
+# benchmarks/bench_prices.py
+#
+# Latest-price lookup latency: indexed PriceStore vs the old read_csv + filter +
+# sort per call, on synthetic market_prices.csv files of increasing size.
+#
+#   python benchmarks/bench_prices.py [--rows 10000 100000 1000000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from price_store import PriceStore
+
+CROPS = ['Rice', 'Wheat', 'Maize', 'Cotton', 'Chickpea', 'Lentil', 'Banana', 'Mango', 'Onion', 'Potato']
+
+
+def synthesize(n_rows, days=1000, seed=0):
+    """Daily prices for as many (market, crop) series as fit in n_rows"""
+    rng = np.random.default_rng(seed)
+    n_series = max(1, n_rows // days)
+    n_markets = max(1, n_series // len(CROPS))
+    series = np.arange(n_rows) % n_series
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(np.arange(n_rows) // n_series, unit='D')
+    return pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d'),
+        'Market': [f'Mandi {i:05d}' for i in series // len(CROPS) % n_markets],
+        'Crop': np.array(CROPS)[series % len(CROPS)],
+        'Price_per_qtl': rng.normal(2500, 400, n_rows).round(2)
+    })
+
+
+def legacy_latest_price(path, market, crop):
+    df = pd.read_csv(path, parse_dates=['Date'])
+    tok = df[(df.Market.str.lower() == market.lower()) & (df.Crop.str.lower() == crop.lower())]
+    if tok.empty:
+        return None
+    return float(tok.sort_values('Date').iloc[-1]['Price_per_qtl'])
+
+
+def time_calls(fn, keys, repeats):
+    samples = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(*keys[i % len(keys)])
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latest price lookup latency by file size')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeats', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'series':>7}  {'load s':>7}  {'store µs':>9}  {'read_csv µs':>12}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_rows in args.rows:
+            df = synthesize(n_rows)
+            path = os.path.join(work_dir, f'prices_{n_rows}.csv')
+            df.to_csv(path, index=False)
+            keys = list(df[['Market', 'Crop']].drop_duplicates().itertuples(index=False, name=None))[:100]
+
+            store = PriceStore(path)
+            start = time.perf_counter()
+            store.refresh(force=True)
+            load_s = time.perf_counter() - start
+            store_us = time_calls(store.latest_price, keys, args.repeats)
+            legacy_us = time_calls(lambda m, c: legacy_latest_price(path, m, c), keys, 5)
+            print(f"{n_rows:>10,}  {len(store.all_series()):>7,}  {load_s:>7.2f}  {store_us:>9.2f}  {legacy_us:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
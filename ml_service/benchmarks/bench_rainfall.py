@@ -0,0 +1,111 @@
+# benchmarks/bench_rainfall.py
+#
+# Validates the harmonic rainfall engine against Prophet on synthetic monthly
+# series (monsoon-shaped seasonality + trend + noise): holdout MAE on the last
+# 12 months and fit/forecast time. Prophet is fitted on a subset of series (it
+# is ~seconds per series) and its total time is extrapolated.
+#
+#   python benchmarks/bench_rainfall.py [--series 1000] [--years 10] [--prophet-series 20]
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rainfall_engine import HarmonicRainfallModel
+
+HOLDOUT = 12
+
+
+def synthesize(n_series, years, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2010-01-01', periods=years * 12, freq='MS')
+    month = dates.month.to_numpy()
+    t = np.arange(len(dates)) / 12
+
+    annual = rng.uniform(400, 3000, n_series)           # mm per year
+    peak = rng.integers(6, 9, n_series)                 # monsoon peak month
+    width = rng.uniform(1.0, 2.0, n_series)
+    trend = rng.normal(0, 0.01, n_series)               # relative change per year
+
+    dist = np.minimum(np.abs(month[:, None] - peak), 12 - np.abs(month[:, None] - peak))
+    shape = np.exp(-(dist / width) ** 2)
+    shape = shape / shape.sum(axis=0) * 12
+    signal = annual / 12 * shape * (1 + trend * t[:, None])
+    noise = rng.normal(0, 0.15, signal.shape) * signal + rng.normal(0, 5, signal.shape)
+    values = np.clip(signal + noise, 0, None)
+    return dates, values, [f'district_{i:05d}' for i in range(n_series)]
+
+
+def bench_engine(dates, values, names):
+    train_dates, test_dates = dates[:-HOLDOUT], dates[-HOLDOUT:]
+    start = time.perf_counter()
+    model = HarmonicRainfallModel().fit(train_dates, values[:-HOLDOUT], names)
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    pred = model.forecast(test_dates)
+    predict_s = time.perf_counter() - start
+    return pred.T, fit_s, predict_s
+
+
+def bench_prophet(dates, values, n_series):
+    try:
+        from prophet import Prophet
+    except ImportError:
+        return None
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+
+    preds = np.zeros((HOLDOUT, n_series))
+    fit_s = predict_s = 0.0
+    for i in range(n_series):
+        df = pd.DataFrame({'ds': dates[:-HOLDOUT], 'y': values[:-HOLDOUT, i]})
+        start = time.perf_counter()
+        m = Prophet(yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
+        m.fit(df)
+        fit_s += time.perf_counter() - start
+        start = time.perf_counter()
+        fc = m.predict(pd.DataFrame({'ds': dates[-HOLDOUT:]}))
+        predict_s += time.perf_counter() - start
+        preds[:, i] = np.clip(fc['yhat'].to_numpy(), 0, None)
+    return preds, fit_s, predict_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Harmonic rainfall engine vs Prophet')
+    parser.add_argument('--series', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--prophet-series', type=int, default=20)
+    args = parser.parse_args()
+
+    dates, values, names = synthesize(args.series, args.years)
+    actual = values[-HOLDOUT:]
+
+    pred, fit_s, predict_s = bench_engine(dates, values, names)
+    mae = np.abs(pred - actual).mean(axis=0)
+    print(f"Harmonic engine, {args.series} series x {len(dates)} months:")
+    print(f"  fit {fit_s * 1000:.1f}ms, forecast {predict_s * 1000:.2f}ms "
+          f"({args.series / fit_s:,.0f} series/s)")
+    print(f"  holdout MAE {mae.mean():.1f} mm (all series)")
+
+    n = min(args.prophet_series, args.series)
+    prophet = bench_prophet(dates, values, n)
+    if prophet is None:
+        print("Prophet not installed; skipping the comparison")
+        return
+
+    p_pred, p_fit_s, p_predict_s = prophet
+    p_mae = np.abs(p_pred - actual[:, :n]).mean(axis=0)
+    print(f"Prophet, {n} series:")
+    print(f"  fit {p_fit_s:.1f}s, forecast {p_predict_s:.1f}s "
+          f"(~{(p_fit_s + p_predict_s) / n * args.series:.0f}s extrapolated to {args.series} series)")
+    print(f"  holdout MAE {p_mae.mean():.1f} mm vs harmonic {mae[:n].mean():.1f} mm on the same series")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/bench_soil.py
+#
+# CPU benchmark for the soil photo classifier:
+#   1. forward pass latency and images/s per batch size (network only)
+#   2. decode + resize throughput of the thread pool
+#   3. end-to-end /soil/classify path with N concurrent single-image clients,
+#      showing how dynamic batching trades a few ms of queueing for throughput
+# Uses models/soil_classifier.pth when trained, else a randomly initialized
+# network with the same architecture (timings do not depend on the weights).
+#
+#   python benchmarks/bench_soil.py [--batch-sizes 1 4 16 64] [--clients 1 4 16 64]
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from soil_classifier import (build_network, decode_image, SoilClassifier, SOIL_CLASSES, SOIL_MODEL_PATH,
+                             IMAGE_SIZE, SOIL_BATCH_MAX, SOIL_BATCH_WAIT_MS)
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+CLIENTS = [1, 4, 16, 64]
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {p: float(np.percentile(ms, int(p[1:]))) for p in ('p50', 'p95', 'p99')}
+
+
+def synthetic_jpegs(n, source_size=640, seed=0):
+    """Camera-like JPEGs: smooth noise at phone-photo resolution"""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        small = rng.integers(60, 200, (source_size // 16, source_size // 16, 3), dtype=np.uint8)
+        image = Image.fromarray(small).resize((source_size, source_size), Image.BICUBIC)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def checkpoint_path(work_dir):
+    if os.path.exists(SOIL_MODEL_PATH) and os.path.getsize(SOIL_MODEL_PATH) > 0:
+        return SOIL_MODEL_PATH
+    import torch
+    path = os.path.join(work_dir, 'soil_classifier.pth')
+    torch.save({'state_dict': build_network().state_dict(), 'classes': SOIL_CLASSES,
+                'image_size': IMAGE_SIZE}, path)
+    print("(no trained checkpoint; timing a randomly initialized network)")
+    return path
+
+
+def bench_forward(batch_sizes, repeats, threads):
+    import torch
+    torch.set_num_threads(threads)
+    network = build_network().eval()
+    print(f"\nForward pass, {threads} torch threads, {IMAGE_SIZE}x{IMAGE_SIZE}")
+    print(f"  {'batch':>5}  {'p50 ms':>8}  {'p95 ms':>8}  {'ms/image':>9}  {'images/s':>9}")
+    for size in batch_sizes:
+        batch = torch.randn(size, 3, IMAGE_SIZE, IMAGE_SIZE)
+        samples = []
+        with torch.inference_mode():
+            network(batch)  # warm up
+            for _ in range(repeats):
+                start = time.perf_counter()
+                network(batch)
+                samples.append(time.perf_counter() - start)
+        p = percentiles(samples)
+        print(f"  {size:>5}  {p['p50']:>8.2f}  {p['p95']:>8.2f}  {p['p50'] / size:>9.3f}  "
+              f"{size / np.median(samples):>9.0f}")
+
+
+def bench_decode(images, workers_list):
+    from concurrent.futures import ThreadPoolExecutor
+    print(f"\nDecode + resize, {len(images)} JPEGs")
+    for workers in workers_list:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            list(pool.map(decode_image, images))
+            elapsed = time.perf_counter() - start
+        print(f"  {workers:>3} threads: {len(images) / elapsed:>8.0f} images/s")
+
+
+def bench_end_to_end(path, images, clients_list, duration, max_batch, max_wait_ms):
+    print(f"\nEnd to end, single-image requests, dynamic batching (max {max_batch}, wait {max_wait_ms}ms)")
+    print(f"  {'clients':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'mean batch':>10}")
+    for clients in clients_list:
+        classifier = SoilClassifier(path, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        classifier.classify(images[:1])  # load the checkpoint
+        latencies = [[] for _ in range(clients)]
+        stop = threading.Event()
+
+        def client(i):
+            j = i
+            while not stop.is_set():
+                start = time.perf_counter()
+                classifier.classify([images[j % len(images)]])
+                latencies[i].append(time.perf_counter() - start)
+                j += clients
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        samples = [s for per_client in latencies for s in per_client]
+        p = percentiles(samples)
+        batching = classifier.stats()['batching']
+        print(f"  {clients:>7}  {len(samples) / elapsed:>8.0f}  {p['p50']:>8.2f}  {p['p95']:>8.2f}  "
+              f"{p['p99']:>8.2f}  {batching.get('mean_batch_size', 0):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soil classifier CPU throughput and latency')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--clients', type=int, nargs='+', default=CLIENTS)
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per client count')
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help='torch threads')
+    parser.add_argument('--max-batch', type=int, default=SOIL_BATCH_MAX)
+    parser.add_argument('--max-wait-ms', type=float, default=SOIL_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    try:
+        import torch  # noqa: F401
+        import PIL  # noqa: F401
+    except ImportError as e:
+        print(f"✗ {str(e)}; install torch and Pillow to run this benchmark")
+        return 1
+
+    images = synthetic_jpegs(64)
+    bench_forward(args.batch_sizes, args.repeats, args.threads)
+    bench_decode(images, sorted({1, 2, 4, os.cpu_count() or 1}))
+    with tempfile.TemporaryDirectory() as work_dir:
+        bench_end_to_end(checkpoint_path(work_dir), images, args.clients, args.duration,
+                         args.max_batch, args.max_wait_ms)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# benchmarks/bench_tokens.py
+#
+# Authenticated-request overhead with and without the verified-token cache.
+# Measures verify_jwt_token alone, then a minimal Flask route behind
+# require_auth (user cache on), against the same route without auth.
+#
+#   python benchmarks/bench_tokens.py [--tokens 100] [--requests 5000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import auth
+
+
+def median_us(fn, args, repeats):
+    samples = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(args[i % len(args)])
+        samples[i] = time.perf_counter() - start
+    return float(np.median(samples) * 1e6)
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/open')
+    def open_route():
+        return jsonify({'success': True})
+
+    @app.route('/protected')
+    @auth.require_auth
+    def protected_route():
+        return jsonify({'success': True, 'user': auth.request.current_user['id']})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JWT verification overhead with and without the token cache')
+    parser.add_argument('--tokens', type=int, default=100, help='distinct tokens in rotation')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        auth.DB_PATH = os.path.join(work_dir, 'users.db')
+        auth.init_database()
+        tokens = []
+        for i in range(args.tokens):
+            user = auth.create_user(f'9{i:09d}', f'user{i}@gmail.com', f'user{i}', 'secret', f'User {i}')['user']
+            tokens.append(auth.generate_jwt_token(user))
+
+        print(f"{'':<28}  {'no cache µs':>12}  {'cache µs':>9}  {'saved':>6}")
+        cache_size = auth.token_cache.max_size
+
+        auth.token_cache.max_size = 0
+        uncached = median_us(auth.verify_jwt_token, tokens, args.requests)
+        auth.token_cache.max_size = cache_size
+        for token in tokens:
+            auth.verify_jwt_token(token)
+        cached = median_us(auth.verify_jwt_token, tokens, args.requests)
+        print(f"{'verify_jwt_token':<28}  {uncached:>12.1f}  {cached:>9.1f}  {1 - cached / uncached:>5.0%}")
+
+        client = make_app().test_client()
+        headers = [{'Authorization': f'Bearer {t}'} for t in tokens]
+        base = median_us(lambda h: client.get('/open'), headers, args.requests)
+
+        def protected(h):
+            assert client.get('/protected', headers=h).status_code == 200
+
+        auth.token_cache.max_size = 0
+        auth.token_cache.clear()
+        slow = median_us(protected, headers, args.requests) - base
+        auth.token_cache.max_size = cache_size
+        fast = median_us(protected, headers, args.requests) - base
+        print(f"{'require_auth overhead':<28}  {slow:>12.1f}  {fast:>9.1f}  {1 - fast / slow:>5.0%}")
+        print(f"(unauthenticated request: {base:.1f} µs)")
+        print(f"token cache: {auth.token_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import hashlib
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks so large bundles don't sit in memory twice
+
+    Shared by the dataset cache, the model registry and the training scripts;
+    kept free of other project imports so any of them can use it.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
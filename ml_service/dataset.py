@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from checksums import file_checksum
+
+# Columnar caches live next to the data they were built from
+CACHE_DIR = os.environ.get('DATASET_CACHE_DIR',
+                           os.path.join(os.path.dirname(__file__), "..", "data", "cache"))
+INDEX_FILE = 'index.json'
+CATEGORIES_SUFFIX = '__categories'
+
+_index_lock = threading.Lock()
+
+
+class Dataset:
+    """Typed, column-oriented view of a CSV: downcast numerics and category-coded strings
+
+    Columns are memory-mapped .npy arrays, so loading is O(columns) rather than
+    O(rows) and processes sharing a cache share its pages.
+    """
+
+    def __init__(self, columns, categories, source, checksum, n_rows):
+        self.columns = columns
+        self.categories = categories
+        self.source = source
+        self.checksum = checksum
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return self.n_rows
+
+    def matrix(self, names, dtype=np.float32):
+        """Stack columns into a C-contiguous 2-D array"""
+        return np.column_stack([np.asarray(self.columns[n], dtype=dtype) for n in names])
+
+    def frame(self, names):
+        """DataFrame of the given columns, with categorical columns decoded back to labels"""
+        return pd.DataFrame({n: self.decode(n) if n in self.categories else self.columns[n] for n in names})
+
+    def codes(self, name):
+        return np.asarray(self.columns[name])
+
+    def decode(self, name):
+        return self.categories[name][self.columns[name]]
+
+    def label_encoder(self, name='label'):
+        """LabelEncoder matching the cached codes (categories are stored sorted, like LabelEncoder)"""
+        from sklearn.preprocessing import LabelEncoder
+        encoder = LabelEncoder()
+        encoder.classes_ = self.categories[name]
+        return encoder
+
+
+def _source_checksum(path, index):
+    # Rehash only when size or mtime moved; the content hash is what keys the cache
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['checksum'], False
+    checksum = file_checksum(path)
+    index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'checksum': checksum}
+    return checksum, True
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    tmp = os.path.join(cache_dir, INDEX_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, os.path.join(cache_dir, INDEX_FILE))
+
+
+def _downcast(series):
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer').to_numpy()
+    if pd.api.types.is_float_dtype(series):
+        return pd.to_numeric(series, downcast='float').to_numpy()
+    return None
+
+
+def _build_cache(csv_path, target_dir):
+    """Parse the CSV once and write one .npy per column plus metadata"""
+    df = pd.read_csv(csv_path)
+    tmp_dir = target_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    meta = {'n_rows': len(df), 'columns': [], 'categorical': []}
+    for name in df.columns:
+        values = _downcast(df[name])
+        if values is None:
+            # Sorted categories keep codes identical to sklearn's LabelEncoder
+            categorical = pd.Categorical(df[name].astype(str))
+            categorical = categorical.reorder_categories(sorted(categorical.categories))
+            values = categorical.codes.astype(np.min_scalar_type(max(len(categorical.categories) - 1, 0)))
+            np.save(os.path.join(tmp_dir, name + CATEGORIES_SUFFIX + '.npy'),
+                    np.asarray(categorical.categories, dtype=str))
+            meta['categorical'].append(name)
+        np.save(os.path.join(tmp_dir, name + '.npy'), np.ascontiguousarray(values))
+        meta['columns'].append(name)
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    # Publish atomically so concurrent readers never see a half-written cache
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(tmp_dir, target_dir)
+
+
+def load_dataset(csv_path, cache_dir=CACHE_DIR, mmap=True):
+    """Load a CSV through the columnar cache, rebuilding it when the file's content changes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with _index_lock:
+        index = _read_index(cache_dir)
+        checksum, rehashed = _source_checksum(csv_path, index)
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        target_dir = os.path.join(cache_dir, f'{stem}-{checksum[:16]}')
+
+        if not os.path.exists(os.path.join(target_dir, 'meta.json')):
+            start = time.perf_counter()
+            _build_cache(csv_path, target_dir)
+            # Drop caches built from earlier versions of the same file
+            for entry in os.listdir(cache_dir):
+                path = os.path.join(cache_dir, entry)
+                if entry.startswith(stem + '-') and path != target_dir and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+            print(f"✓ Built columnar cache for {os.path.basename(csv_path)} in {time.perf_counter() - start:.2f}s")
+        if rehashed:
+            _write_index(cache_dir, index)
+
+    with open(os.path.join(target_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    mode = 'r' if mmap else None
+    columns = {n: np.load(os.path.join(target_dir, n + '.npy'), mmap_mode=mode) for n in meta['columns']}
+    categories = {n: np.load(os.path.join(target_dir, n + CATEGORIES_SUFFIX + '.npy'))
+                  for n in meta['categorical']}
+    return Dataset(columns, categories, csv_path, checksum, meta['n_rows'])
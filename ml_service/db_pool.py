@@ -0,0 +1,78 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Reusable SQLite connections to one database file
+
+    Flask's threaded server runs each request on a fresh thread, so connections
+    are pooled rather than thread-local: a request borrows an idle connection
+    (opening one only when none is free) and returns it afterwards. Every
+    connection runs in WAL mode, so readers do not block on a concurrent
+    writer, and waits on the single writer are absorbed by busy_timeout
+    instead of failing immediately.
+    """
+
+    def __init__(self, path, size=16, busy_timeout_ms=5000, cache_kb=8192):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_kb = cache_kb
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.opened = 0
+
+    def _open(self):
+        # Autocommit mode: transactions are opened explicitly by transaction()
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None,
+                               check_same_thread=False, cached_statements=64)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_kb)}')  # negative = KiB
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        self.opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Connection inside BEGIN IMMEDIATE ... COMMIT (rolled back on error)
+
+        Taking the write lock up front means a read-then-write sequence never
+        has to upgrade its lock mid-transaction, which is where SQLite gives up
+        with SQLITE_BUSY instead of waiting.
+        """
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {'path': os.path.basename(self.path), 'opened': self.opened, 'idle': self._idle.qsize()}
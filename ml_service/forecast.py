@@ -1,17 +1,19 @@
-from prophet import Prophet
-import pandas as pd
-import joblib, os
+import os
 
-MODEL_PATH = "models/rainfall_prophet.pkl"
+from rainfall_engine import get_model
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "rainfall_harmonic.npz")
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "rainfall.csv")
 
 def train_rainfall():
-    df = pd.read_csv("data/rainfall.csv")   # columns: ds,y (date,rainfall mm)
-    m = Prophet(yearly_seasonality=True)
-    m.fit(df)
-    joblib.dump(m, MODEL_PATH)
+    # Same trainer as src/train_rainfall.py (monthly totals), so the artifact means one thing;
+    # it also refreshes the table /forecast serves from
+    from src.train_rainfall import parse_args, train
+    return train(parse_args(['--data', DATA_PATH, '--output', MODEL_PATH]))
 
 def forecast_rainfall(periods=12):
-    m = joblib.load(MODEL_PATH)
-    future = m.make_future_dataframe(periods=periods, freq='M')
-    fc = m.predict(future)
-    return fc[["ds","yhat"]].tail(periods).to_dict(orient="records")
+    # Coefficients stay in memory between calls; the forecast is one matrix product
+    m = get_model(MODEL_PATH)
+    future = m.future_dates(periods, freq='MS')
+    yhat = m.forecast(future)[0]
+    return [{"ds": ds, "yhat": float(y)} for ds, y in zip(future, yhat)]
@@ -0,0 +1,233 @@
+import os
+import json
+import hashlib
+import datetime
+import threading
+from urllib.parse import unquote
+
+import numpy as np
+
+from rainfall_engine import HarmonicRainfallModel
+from price_engine import PriceForecastModel, PRICE_FORECAST_PATH
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
+FORECAST_TABLE_PATH = os.environ.get('FORECAST_TABLE_PATH', os.path.join(MODELS_DIR, "forecast_table.json"))
+RAINFALL_MODEL_PATH = os.path.join(MODELS_DIR, "rainfall_harmonic.npz")
+
+# Longest horizon materialized per location; requests slice a prefix of it
+FORECAST_HORIZON = int(os.environ.get('FORECAST_HORIZON', 24))
+FORECAST_REFRESH_INTERVAL = float(os.environ.get('FORECAST_REFRESH_INTERVAL', 60))
+
+# z for the 80% band around yhat, from each series' residual spread
+INTERVAL_Z = 1.2816
+
+
+class ForecastNotFound(LookupError):
+    """The table is loaded but has no forecast for the requested location"""
+
+
+def materialize_rainfall(model_path=RAINFALL_MODEL_PATH, horizon=FORECAST_HORIZON):
+    """{location: rows} for every series in a fitted rainfall model, `horizon` months ahead"""
+    model = HarmonicRainfallModel.load(model_path)
+    dates = model.future_dates(horizon)
+    yhat = model.forecast(dates)
+    band = INTERVAL_Z * np.asarray(model.residual_std)[:, None]
+    lower = np.clip(yhat - band, 0.0, None)
+    upper = yhat + band
+    ds = [d.strftime('%Y-%m-%d') for d in dates]
+    return {
+        name: [{'ds': ds[j], 'yhat': round(float(yhat[i, j]), 2),
+                'lower': round(float(lower[i, j]), 2), 'upper': round(float(upper[i, j]), 2)}
+               for j in range(len(ds))]
+        for i, name in enumerate(model.names)
+    }
+
+
+def price_key(market, crop):
+    """Table location of a price series: "market/crop", with '%' and '/' in either name escaped"""
+    def escape(name):
+        return str(name).replace('%', '%25').replace('/', '%2F')
+    return f'{escape(market)}/{escape(crop)}'
+
+
+def split_price_key(key):
+    """(market, crop) from a price_key"""
+    market, crop = key.split('/', 1)
+    return unquote(market), unquote(crop)
+
+
+def materialize_prices(model_path=PRICE_FORECAST_PATH, horizon=FORECAST_HORIZON):
+    """{price_key(market, crop): rows} for every series in a fitted price model, up to `horizon` periods ahead"""
+    model = PriceForecastModel.load(model_path)
+    steps = min(horizon, model.horizon)
+    lower, upper = model.bands(INTERVAL_Z)
+    ds = [str(d) for d in model.dates[:steps]]
+    yhat, lower, upper = (np.round(a[:, :steps], 2).tolist() for a in (model.yhat, lower, upper))
+    return {
+        price_key(market, crop): [{'ds': ds[j], 'yhat': yhat[i][j], 'lower': lower[i][j], 'upper': upper[i][j]}
+                             for j in range(steps)]
+        for i, (market, crop) in enumerate(zip(model.markets, model.crops))
+    }
+
+
+# Forecast kinds and the function that materializes each from its fitted model file
+SOURCES = {
+    'rainfall': (RAINFALL_MODEL_PATH, materialize_rainfall),
+    'price': (PRICE_FORECAST_PATH, materialize_prices),
+}
+
+
+def write_table(path=FORECAST_TABLE_PATH, sources=None, horizon=FORECAST_HORIZON):
+    """Materialize every available source into the forecast table; returns the table
+
+    Called by the training jobs after they save a model, and by the store's
+    refresher when a model file is newer than the table.
+    """
+    sources = sources or SOURCES
+    table = {
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'horizon': horizon,
+        'sources': {},
+        'series': {}
+    }
+    for kind, (model_path, materialize) in sources.items():
+        if not os.path.exists(model_path):
+            continue
+        table['sources'][kind] = {'path': os.path.basename(model_path), 'mtime': os.path.getmtime(model_path)}
+        table['series'][kind] = materialize(model_path, horizon)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(table, f)
+    os.replace(tmp, path)
+    return table
+
+
+class ForecastStore:
+    """Serves precomputed forecasts from the materialized table
+
+    The table is held in memory as {kind: {location: rows}}, so a lookup is a
+    dict access plus a slice to the requested horizon; nothing is fitted or
+    forecast on the request path. A background thread reloads the table when
+    the file changes and rebuilds it when a source model is newer than the
+    table it was materialized from.
+    """
+
+    def __init__(self, path=FORECAST_TABLE_PATH, sources=None):
+        self.path = path
+        self.sources = sources or SOURCES
+        self._lock = threading.Lock()
+        self._table = None
+        self._index = {}
+        self._mtime = None
+        self.version = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._watcher = None
+        self.reload()
+
+    def reload(self):
+        """Load the table file if it changed; returns True when a new table was swapped in"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        table = json.loads(raw)
+        # Locations are matched case-insensitively
+        index = {kind: {loc.lower(): loc for loc in series} for kind, series in table['series'].items()}
+        with self._lock:
+            self._table, self._index, self._mtime = table, index, mtime
+            self.version = hashlib.sha256(raw).hexdigest()[:12]
+        return True
+
+    def stale_sources(self):
+        """Kinds whose model file is newer than (or missing from) the loaded table"""
+        recorded = (self._table or {}).get('sources', {})
+        stale = []
+        for kind, (model_path, _) in self.sources.items():
+            if not os.path.exists(model_path):
+                continue
+            if kind not in recorded or os.path.getmtime(model_path) > recorded[kind]['mtime']:
+                stale.append(kind)
+        return stale
+
+    def refresh(self):
+        """Rebuild the table if any source model changed, then pick up the file"""
+        try:
+            if self.stale_sources():
+                horizon = (self._table or {}).get('horizon', FORECAST_HORIZON)
+                write_table(self.path, self.sources, horizon)
+            self.reload()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠ Forecast table refresh failed: {str(e)}")
+
+    def start_watcher(self, interval=FORECAST_REFRESH_INTERVAL):
+        """Refresh in the background now and every `interval` seconds"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            self.refresh()
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def kinds(self):
+        return sorted(self._index)
+
+    def locations(self, kind):
+        return sorted(self._index.get(kind, {}).values())
+
+    def lookup(self, kind, location=None, horizon=None):
+        """(location, rows, table version) for a kind and location, truncated to `horizon` steps
+
+        Raises ForecastNotFound for a location the table has no series for,
+        LookupError when no table is loaded and ValueError for an unknown kind,
+        a missing location or an out-of-range horizon.
+        """
+        with self._lock:
+            table, index, version = self._table, self._index, self.version
+        if table is None:
+            raise LookupError('Forecast table not available yet')
+        if kind not in index:
+            raise ValueError(f"Unknown forecast kind '{kind}'. Available: {', '.join(sorted(index))}")
+
+        names = index[kind]
+        if location is None:
+            # A table fitted on a single series needs no location
+            if len(names) != 1:
+                raise ValueError('location is required')
+            name = next(iter(names.values()))
+        else:
+            name = names.get(str(location).strip().lower())
+            if name is None:
+                raise ForecastNotFound(f"No {kind} forecast for location '{location}'")
+
+        max_horizon = table['horizon']
+        horizon = max_horizon if horizon is None else int(horizon)
+        if not 1 <= horizon <= max_horizon:
+            raise ValueError(f'horizon must be between 1 and {max_horizon}')
+        return name, table['series'][kind][name][:horizon], version
+
+    def status(self):
+        table = self._table or {}
+        return {
+            'loaded': self._table is not None,
+            'version': self.version,
+            'generated_at': table.get('generated_at'),
+            'horizon': table.get('horizon'),
+            'locations': {kind: len(names) for kind, names in self._index.items()},
+            'last_error': self.last_error
+        }
@@ -0,0 +1,299 @@
+# incremental.py
+#
+# Incremental retraining of the serving RandomForest from newly labeled farm
+# outcomes. Outcomes are appended to a SQLite store whose row ids act as the
+# data watermark. An update grows the forest with warm_start, fitting only the
+# new trees on the new rows plus a small per-class replay sample (so every tree
+# sees every crop class), which keeps the cost proportional to the new data.
+# A background retrainer applies updates on an interval and periodically
+# compacts the forest with a full refit. Every version is checkpointed with its
+# watermark and published to the serving bundle path for hot reload.
+#
+#   python incremental.py update   # fold new outcomes into the serving model
+#   python incremental.py refit    # full refit on base data + all outcomes
+
+import json
+import os
+import shutil
+import sys
+import sqlite3
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from dataset import load_dataset
+from model_manager import FEATURE_COLUMNS
+from train import write_manifest, manifest_path
+
+PROCESSED_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "crop_data.csv")
+MODEL_PATH = os.path.join(PROCESSED_PATH, "recommender_bundle.joblib")
+OUTCOMES_DB = os.path.join(PROCESSED_PATH, "outcomes.db")
+CHECKPOINT_DIR = os.path.join(PROCESSED_PATH, "checkpoints")
+
+TREES_PER_UPDATE = int(os.environ.get('RETRAIN_TREES_PER_UPDATE', 10))
+REPLAY_PER_CLASS = int(os.environ.get('RETRAIN_REPLAY_PER_CLASS', 20))
+MIN_NEW_OUTCOMES = int(os.environ.get('RETRAIN_MIN_OUTCOMES', 50))
+RETRAIN_INTERVAL = float(os.environ.get('RETRAIN_INTERVAL', 3600))
+# Compact (full refit) once the forest has grown by this factor or after this many updates
+COMPACT_GROWTH = float(os.environ.get('RETRAIN_COMPACT_GROWTH', 2.0))
+COMPACT_EVERY = int(os.environ.get('RETRAIN_COMPACT_EVERY', 24))
+KEEP_CHECKPOINTS = int(os.environ.get('RETRAIN_KEEP_CHECKPOINTS', 10))
+
+
+class OutcomeStore:
+    """Append-only store of labeled farm outcomes; the row id is the data watermark"""
+
+    def __init__(self, db_path=OUTCOMES_DB):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS farm_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                N REAL NOT NULL, P REAL NOT NULL, K REAL NOT NULL,
+                temperature REAL NOT NULL, humidity REAL NOT NULL,
+                ph REAL NOT NULL, rainfall REAL NOT NULL,
+                label TEXT NOT NULL,
+                user_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def append(self, rows, user_id=None):
+        """Insert outcome dicts (FEATURE_COLUMNS + label); returns the new watermark"""
+        values = []
+        for row in rows:
+            label = str(row['label']).strip().lower()
+            if not label:
+                raise ValueError('label is required')
+            try:
+                values.append([float(row[c]) for c in FEATURE_COLUMNS] + [label, user_id])
+            except (TypeError, ValueError):
+                raise ValueError(f"Outcome features must be numbers: {', '.join(FEATURE_COLUMNS)}")
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.executemany(f'''
+                INSERT INTO farm_outcomes ({', '.join(FEATURE_COLUMNS)}, label, user_id)
+                VALUES ({', '.join('?' * (len(FEATURE_COLUMNS) + 2))})
+            ''', values)
+            conn.commit()
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM farm_outcomes').fetchone()[0]
+        finally:
+            conn.close()
+
+    def since(self, watermark):
+        """Outcomes with id > watermark as (features DataFrame, labels array, new watermark)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            df = pd.read_sql_query(
+                f'SELECT id, {", ".join(FEATURE_COLUMNS)}, label FROM farm_outcomes WHERE id > ? ORDER BY id',
+                conn, params=(watermark,))
+        finally:
+            conn.close()
+        new_watermark = int(df['id'].iloc[-1]) if len(df) else watermark
+        return df[FEATURE_COLUMNS], df['label'].to_numpy(), new_watermark
+
+    def pending(self, watermark):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM farm_outcomes WHERE id > ?', (watermark,)).fetchone()[0]
+        finally:
+            conn.close()
+
+
+def replay_sample(ds, per_class, seed=0):
+    """Stratified sample of the base dataset so every new tree sees every class"""
+    rng = np.random.default_rng(seed)
+    codes = ds.codes('label')
+    picks = []
+    for code in np.unique(codes):
+        idx = np.flatnonzero(codes == code)
+        picks.append(rng.choice(idx, size=min(per_class, len(idx)), replace=False))
+    picks = np.sort(np.concatenate(picks))
+    frame = ds.frame(FEATURE_COLUMNS).iloc[picks]
+    return frame, ds.decode('label')[picks]
+
+
+def publish(bundle, model_path=MODEL_PATH):
+    """Checkpoint the bundle under its watermark and atomically replace the serving bundle
+
+    The bundle is serialized once, as the checkpoint; the serving file is a
+    hard link to it (a copy where links aren't supported), swapped in after
+    its manifest like train.save_bundle does.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    name = f"recommender-v{bundle['updates']:04d}-wm{bundle['watermark']}-{int(time.time())}.joblib"
+    checkpoint = os.path.join(CHECKPOINT_DIR, name)
+    joblib.dump(bundle, checkpoint)
+
+    tmp = model_path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(checkpoint, tmp)
+    except OSError:
+        shutil.copyfile(checkpoint, tmp)
+    write_manifest(model_path, 'incremental', RAW_DATA_PATH, load_dataset(RAW_DATA_PATH).checksum,
+                   FEATURE_COLUMNS, bundle['le_crop'].classes_, {}, 'random_forest',
+                   {'n_estimators': len(bundle['model'].estimators_)},
+                   extra={'watermark': bundle['watermark'], 'updates': bundle['updates'],
+                          'base_estimators': bundle['base_estimators']},
+                   bundle_file=tmp)
+    os.replace(tmp, model_path)
+
+    checkpoints = sorted((os.path.join(CHECKPOINT_DIR, f) for f in os.listdir(CHECKPOINT_DIR)
+                          if f.endswith('.joblib')), key=os.path.getmtime)
+    for old in checkpoints[:-KEEP_CHECKPOINTS]:
+        os.remove(old)
+    return checkpoint
+
+
+def full_refit(store, model_path=MODEL_PATH, n_estimators=None):
+    """Refit from scratch on the base dataset plus every stored outcome"""
+    start = time.perf_counter()
+    ds = load_dataset(RAW_DATA_PATH)
+    X_new, y_new, watermark = store.since(0)
+    X = pd.concat([ds.frame(FEATURE_COLUMNS), X_new], ignore_index=True)
+    labels = np.concatenate([ds.decode('label'), y_new])
+
+    if n_estimators is None:
+        n_estimators = published_base_estimators(model_path)
+    n_estimators = n_estimators or 100
+
+    le_crop = LabelEncoder()
+    y = le_crop.fit_transform(labels)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=-1)
+    model.fit(X_scaled, y)
+
+    bundle = {'model': model, 'scaler': scaler, 'le_crop': le_crop, 'watermark': watermark,
+              'base_estimators': n_estimators, 'updates': 0}
+    checkpoint = publish(bundle, model_path)
+    return {'success': True, 'mode': 'refit', 'rows': len(X), 'trees': n_estimators,
+            'watermark': watermark, 'seconds': round(time.perf_counter() - start, 3), 'checkpoint': checkpoint}
+
+
+def incremental_update(store, model_path=MODEL_PATH, trees=TREES_PER_UPDATE,
+                       replay_per_class=REPLAY_PER_CLASS, min_new=1):
+    """Grow the serving forest with trees fitted on outcomes newer than its watermark"""
+    start = time.perf_counter()
+    bundle = joblib.load(model_path)
+    model = bundle['model']
+    if not isinstance(model, RandomForestClassifier):
+        raise ValueError(f'Incremental updates need a RandomForest bundle, got {type(model).__name__}')
+
+    watermark = bundle.get('watermark', 0)
+    X_new, y_new, new_watermark = store.since(watermark)
+    if len(y_new) < min_new:
+        return {'success': True, 'mode': 'noop', 'new_rows': len(y_new), 'watermark': watermark}
+
+    # A crop the encoder has never seen changes the class set; only a full refit can add it
+    known = set(bundle['le_crop'].classes_)
+    if any(label not in known for label in y_new):
+        return full_refit(store, model_path, bundle.get('base_estimators'))
+
+    X_replay, y_replay = replay_sample(load_dataset(RAW_DATA_PATH), replay_per_class,
+                                       seed=new_watermark)
+    X_fit = pd.concat([X_new, X_replay], ignore_index=True)
+    labels = np.concatenate([y_new, y_replay])
+    # Classes that only exist in earlier outcomes aren't in the replay sample; refit instead
+    if known - set(labels):
+        return full_refit(store, model_path, bundle.get('base_estimators'))
+    y_fit = bundle['le_crop'].transform(labels)
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+    model.fit(bundle['scaler'].transform(X_fit), y_fit)
+    model.set_params(warm_start=False)
+
+    bundle.update({
+        'watermark': new_watermark,
+        'base_estimators': bundle.get('base_estimators', len(model.estimators_) - trees),
+        'updates': bundle.get('updates', 0) + 1,
+    })
+    checkpoint = publish(bundle, model_path)
+    return {'success': True, 'mode': 'incremental', 'new_rows': len(y_new), 'fit_rows': len(y_fit),
+            'trees': len(model.estimators_), 'base_estimators': bundle['base_estimators'],
+            'watermark': new_watermark, 'compact': needs_compaction(bundle),
+            'seconds': round(time.perf_counter() - start, 3), 'checkpoint': checkpoint}
+
+
+def needs_compaction(bundle):
+    """Whether an updated bundle has grown enough to be worth a full refit"""
+    base = bundle.get('base_estimators') or len(bundle['model'].estimators_)
+    return (len(bundle['model'].estimators_) >= base * COMPACT_GROWTH
+            or bundle.get('updates', 0) >= COMPACT_EVERY)
+
+
+def published_base_estimators(model_path=MODEL_PATH):
+    """Tree count of the last full refit, from the serving bundle's manifest (None if unknown)"""
+    try:
+        with open(manifest_path(model_path)) as f:
+            return json.load(f).get('base_estimators')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class Retrainer:
+    """Background loop: incremental update when enough outcomes arrived, full refit when the forest is bloated"""
+
+    def __init__(self, store, model_path=MODEL_PATH, interval=RETRAIN_INTERVAL):
+        self.store = store
+        self.model_path = model_path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_result = None
+
+    def run_once(self, force_refit=False):
+        with self._lock:
+            try:
+                if force_refit or not os.path.exists(self.model_path):
+                    result = full_refit(self.store, self.model_path)
+                else:
+                    result = incremental_update(self.store, self.model_path, min_new=MIN_NEW_OUTCOMES)
+                    if result['mode'] == 'incremental' and result['compact']:
+                        result = full_refit(self.store, self.model_path, result['base_estimators'])
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            self.last_result = result
+            if result.get('mode') not in (None, 'noop'):
+                print(f"✓ Retrained recommender ({result['mode']}) up to watermark {result['watermark']}")
+            return result
+
+    def run_async(self, force_refit=False):
+        thread = threading.Thread(target=self.run_once, kwargs={'force_refit': force_refit}, daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                self.run_once()
+
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'update'
+    outcome_store = OutcomeStore()
+    if command == 'refit':
+        print(full_refit(outcome_store))
+    elif command == 'update':
+        print(incremental_update(outcome_store))
+    else:
+        print("Usage: python incremental.py [update|refit]")
+        sys.exit(1)
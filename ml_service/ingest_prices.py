@@ -0,0 +1,155 @@
+# ingest_prices.py
+#
+# Streams a mandi price dump (CSV, any size) into the SQLite price store the
+# price APIs read from. The file is read in chunks and passed through a
+# generator pipeline: rename columns -> parse and validate -> normalize names
+# -> upsert, one transaction per batch. Memory is bounded by --chunksize
+# whatever the file size. Re-running on an overlapping dump updates prices in
+# place (keyed by market, crop and date).
+#
+# Accepts the market_prices.csv schema (Date, Market, Crop, Price_per_qtl) and
+# government exports (Arrival_Date, Market, Commodity, Modal_Price, ...).
+#
+#   python ingest_prices.py dump.csv [--db data/processed/market_prices.db] [--dayfirst]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from price_db import PRICES_DB_PATH, connect, init_schema, upsert_rows, bump_version
+from price_store import normalize
+
+CHUNKSIZE = 200_000
+
+# Accepted spellings of each column, matched case-insensitively
+COLUMN_ALIASES = {
+    'date': ['date', 'arrival_date', 'price_date', 'reported_date'],
+    'market': ['market', 'market_name', 'mandi'],
+    'crop': ['crop', 'commodity', 'commodity_name'],
+    'price': ['price_per_qtl', 'modal_price', 'modal_x0020_price', 'price', 'modal price (rs./quintal)'],
+}
+
+
+def resolve_columns(header):
+    """{field: source column} for the fields above, from a CSV header"""
+    lowered = {c.strip().lower(): c for c in header}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        match = next((lowered[a] for a in aliases if a in lowered), None)
+        if match is None:
+            raise ValueError(f"No {field} column; expected one of {aliases}, got {list(header)}")
+        columns[field] = match
+    return columns
+
+
+def read_chunks(path, columns, chunksize):
+    yield from pd.read_csv(path, usecols=list(columns.values()), chunksize=chunksize, dtype=str)
+
+
+def clean(chunks, columns, dayfirst, stats):
+    """Rename, parse and drop rows without a usable date, name or positive price"""
+    rename = {source: field for field, source in columns.items()}
+    for chunk in chunks:
+        chunk = chunk.rename(columns=rename)
+        stats['read'] += len(chunk)
+        # Dumps repeat a few hundred dates per chunk: parse each distinct string once
+        codes, spellings = pd.factorize(chunk['date'])
+        parsed = pd.to_datetime(pd.Series(spellings), errors='coerce', dayfirst=dayfirst, format='mixed')
+        iso = parsed.dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        chunk['date'] = np.where(codes >= 0, iso[codes], None)
+        price = pd.to_numeric(chunk['price'], errors='coerce')
+        missing = price.isna()
+        if missing.any():  # retry '1,850' style thousands separators
+            price[missing] = pd.to_numeric(chunk['price'][missing].str.replace(',', ''), errors='coerce')
+        chunk['price'] = price
+        valid = chunk['date'].notna() & (chunk['price'] > 0) & chunk['market'].notna() & chunk['crop'].notna()
+        stats['rejected'] += int((~valid).sum())
+        yield chunk[valid]
+
+
+def normalize_names(chunks):
+    """Add market_key/crop_key and tidy display names, normalizing each distinct spelling once"""
+    for chunk in chunks:
+        for field in ('market', 'crop'):
+            codes, spellings = pd.factorize(chunk[field])
+            tidy = np.array([' '.join(s.split()) for s in spellings], dtype=object)
+            keys = np.array([normalize(s) for s in spellings], dtype=object)
+            chunk[field] = tidy[codes]
+            chunk[f'{field}_key'] = keys[codes]
+        # Duplicate (market, crop, date) rows within a chunk: the last one wins, as in the table
+        yield chunk.drop_duplicates(['market_key', 'crop_key', 'date'], keep='last')
+
+
+def to_batches(chunks):
+    """(rows, newest row per series) ready for upsert_rows"""
+    fields = ['market_key', 'crop_key', 'date', 'market', 'crop', 'price']
+    for chunk in chunks:
+        # Primary-key order keeps B-tree inserts local instead of scattered across pages
+        chunk = chunk[fields].sort_values(['market_key', 'crop_key', 'date'])
+        latest = chunk.drop_duplicates(['market_key', 'crop_key'], keep='last')
+        yield _rows(chunk), _rows(latest)
+
+
+def _rows(frame):
+    return list(zip(*(frame[c].tolist() for c in frame.columns)))
+
+
+def ingest(path, db_path=PRICES_DB_PATH, chunksize=CHUNKSIZE, dayfirst=False):
+    """Stream `path` into the price database; returns counts and timings"""
+    header = pd.read_csv(path, nrows=0).columns
+    columns = resolve_columns(header)
+    stats = {'read': 0, 'rejected': 0, 'written': 0}
+
+    conn = connect(db_path)
+    init_schema(conn)
+    start = time.perf_counter()
+    try:
+        pipeline = to_batches(normalize_names(clean(read_chunks(path, columns, chunksize), columns, dayfirst, stats)))
+        for rows, latest in pipeline:
+            upsert_rows(conn, rows, latest)
+            stats['written'] += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f"  {stats['read']:>12,} rows read, {stats['written']:>12,} written "
+                  f"({stats['read'] / elapsed:,.0f} rows/s)", flush=True)
+        bump_version(conn, time.time())
+        series = conn.execute('SELECT COUNT(*) FROM latest_prices').fetchone()[0]
+        total = conn.execute('SELECT COUNT(*) FROM market_prices').fetchone()[0]
+    finally:
+        conn.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['series'] = series
+    stats['table_rows'] = total
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a mandi price CSV into the SQLite price store')
+    parser.add_argument('csv', help='price dump to ingest')
+    parser.add_argument('--db', default=PRICES_DB_PATH)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='rows per chunk and transaction')
+    parser.add_argument('--dayfirst', action='store_true', help='dates are DD/MM/YYYY (government exports)')
+    args = parser.parse_args(argv)
+
+    print(f"▶ Ingesting {args.csv} ({os.path.getsize(args.csv) / (1024 * 1024):,.1f} MB) into {args.db}")
+    try:
+        stats = ingest(args.csv, args.db, args.chunksize, args.dayfirst)
+    except ValueError as e:
+        print(f"✗ {str(e)}")
+        return 1
+
+    print("\nIngestion report")
+    print(f"  rows read:        {stats['read']:,}")
+    print(f"  rows rejected:    {stats['rejected']:,}")
+    print(f"  rows upserted:    {stats['written']:,}")
+    print(f"  table rows:       {stats['table_rows']:,} across {stats['series']:,} market/crop series")
+    print(f"  elapsed:          {stats['seconds']:.1f}s ({stats['read'] / stats['seconds']:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+
+# One memory budget for every model object in the process: cached files plus the
+# bundles the serving registry holds (see ModelCache.pin)
+MODEL_MEMORY_CAP_MB = float(os.environ.get('MODEL_MEMORY_CAP_MB', 512))
+
+
+class ModelCache:
+    """Process-wide cache of model objects loaded from disk
+
+    Entries are keyed by absolute path and validated against the file's
+    mtime, size and inode on every get, so a retrained file (written in place
+    or swapped in with os.replace) is picked up on the next call and the old
+    object is dropped before the new one loads. Concurrent callers for the same
+    path share a single load. Memory is approximated by file size, as the model
+    registry does; least recently used entries are evicted past the cap.
+
+    The cap is shared with the model registry: a loaded serving slot pins its
+    path with pin(), its size counts against the cap whether or not its entry
+    is still cached, and pinned entries are never evicted here. The registry
+    evicts its own least recently used models when total_bytes() exceeds
+    the cap.
+
+    Callers must treat the returned objects as read-only; code that mutates a
+    model (e.g. warm-start retraining) should load its own copy.
+    """
+
+    def __init__(self, cap_mb=MODEL_MEMORY_CAP_MB):
+        self.cap_bytes = int(cap_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> (stamp, size, obj), least recently used first
+        self._load_locks = {}  # path -> [lock, threads using it], only while a load is in flight
+        self._pins = {}  # path -> [pin count, size] for objects held outside the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino), st.st_size
+
+    def get(self, path, loader=joblib.load):
+        """Model at `path`, loading it with `loader(path)` only when missing or changed on disk"""
+        path = os.path.abspath(path)
+        stamp, size = self._stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            load_lock = self._load_locks.setdefault(path, [threading.Lock(), 0])
+            load_lock[1] += 1
+
+        try:
+            with load_lock[0]:
+                return self._load(path, loader)
+        finally:
+            with self._lock:
+                load_lock[1] -= 1
+                if load_lock[1] == 0:
+                    del self._load_locks[path]
+
+    def _load(self, path, loader):
+        stamp, size = self._stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                # Another thread loaded it while we waited
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            # Free the replaced object before loading its successor
+            self._entries.pop(path, None)
+
+        obj = loader(path)
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (stamp, size, obj)
+            self._evict(keep=path)
+        return obj
+
+    def _evict(self, keep):
+        while self._total_bytes() > self.cap_bytes:
+            victim = next((p for p in self._entries if p != keep and p not in self._pins), None)
+            if victim is None:
+                break
+            del self._entries[victim]
+            self.evictions += 1
+
+    def _total_bytes(self):
+        cached = sum(size for path, (_, size, _) in self._entries.items() if path not in self._pins)
+        return cached + sum(size for _, size in self._pins.values())
+
+    def total_bytes(self):
+        """Bytes counted against the shared cap: unpinned entries plus pinned objects"""
+        with self._lock:
+            return self._total_bytes()
+
+    def pin(self, path, size):
+        """Count an object loaded from `path` and held elsewhere (a serving slot) against the cap"""
+        path = os.path.abspath(path)
+        with self._lock:
+            pin = self._pins.setdefault(path, [0, size])
+            pin[0] += 1
+            pin[1] = size
+
+    def unpin(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            pin = self._pins.get(path)
+            if pin is not None:
+                pin[0] -= 1
+                if pin[0] <= 0:
+                    del self._pins[path]
+
+    def invalidate(self, path=None):
+        """Drop one entry, or everything when no path is given"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': [os.path.basename(p) for p in self._entries],
+                'cached_mb': round(self._total_bytes() / (1024 * 1024), 2),
+                'pinned': [os.path.basename(p) for p in self._pins],
+                'cap_mb': round(self.cap_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions
+            }
+
+
+model_cache = ModelCache()
+
+
+def load_model(path, loader=joblib.load):
+    """Shared, mtime-validated load of a model file; see ModelCache"""
+    return model_cache.get(path, loader)
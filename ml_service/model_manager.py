@@ -0,0 +1,583 @@
+import os
+import glob
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from checksums import file_checksum
+from model_cache import model_cache, load_model, MODEL_MEMORY_CAP_MB
+
+# Feature order every recommender bundle is trained on
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Representative soil/weather rows a new bundle must score sensibly before it is swapped in
+CANARY_INPUTS = [
+    [75, 40, 38, 28.0, 70.0, 6.7, 8.0],    # loamy, monsoon
+    [55, 25, 20, 35.0, 40.0, 6.0, 1.0],    # sandy, summer
+    [95, 45, 55, 22.0, 50.0, 7.3, 0.5],    # clay, winter
+    [82, 38, 35, 26.0, 60.0, 6.4, 2.0],    # silty, post-monsoon
+    [90, 42, 43, 20.9, 82.0, 6.5, 202.9],  # rice-like training row
+]
+
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+BUNDLE_SUFFIX = '_bundle.joblib'
+MANIFEST_SUFFIX = '.manifest.json'
+
+# Ensemble members as "name:weight,..."; members missing from the registry are skipped
+ENSEMBLE_MODELS = os.environ.get('ENSEMBLE_MODELS', 'recommender:1,random_forest:1,xgboost:1,neural_network:1')
+ENSEMBLE_BUDGET_MS = float(os.environ.get('ENSEMBLE_BUDGET_MS', 250))
+ENSEMBLE_WORKERS = int(os.environ.get('ENSEMBLE_WORKERS', 4))
+
+# A bundle that fails to load is not retried for MODEL_LOAD_BACKOFF_S seconds,
+# doubling per consecutive failure up to MODEL_LOAD_BACKOFF_MAX_S, unless the file changes
+MODEL_LOAD_BACKOFF_S = float(os.environ.get('MODEL_LOAD_BACKOFF_S', 30))
+MODEL_LOAD_BACKOFF_MAX_S = float(os.environ.get('MODEL_LOAD_BACKOFF_MAX_S', 600))
+
+
+def parse_weights(spec):
+    """Parse 'name:weight,name' into {name: weight}; bare names get weight 1"""
+    weights = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition(':')
+        weights[name.strip().lower()] = float(weight) if weight else 1.0
+    return weights
+
+
+class ReadWriteLock:
+    """Read-mostly lock: many concurrent readers, writers wait for readers to drain"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._writer = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class ModelVersion:
+    """An immutable, validated model bundle plus the identity of the file it came from"""
+
+    def __init__(self, bundle, checksum, mtime):
+        self.bundle = bundle
+        self.model = bundle['model']
+        self.scaler = bundle['scaler']
+        self.le_crop = bundle['le_crop']
+        self.classes = [str(c) for c in self.le_crop.classes_]
+        self.checksum = checksum
+        self.mtime = mtime
+        self.version = checksum[:12]
+        # Highest outcome id folded in by incremental retraining, if any
+        self.watermark = bundle.get('watermark')
+        self.manifest = None
+
+    def predict_proba(self, features):
+        """Class probabilities for a 2-D feature array or DataFrame in FEATURE_COLUMNS order"""
+        if not isinstance(features, pd.DataFrame):
+            features = pd.DataFrame(np.atleast_2d(features), columns=FEATURE_COLUMNS)
+        scaled = self.scaler.transform(features)
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(scaled)
+        # Keras bundles end in a softmax layer, so predict() already returns probabilities
+        return np.asarray(self.model.predict(scaled, verbose=0))
+
+
+def read_manifest(bundle_path):
+    """Manifest written by train.py next to a bundle, or None"""
+    try:
+        with open(bundle_path + MANIFEST_SUFFIX) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def check_manifest(version, manifest, feature_columns=FEATURE_COLUMNS):
+    """Raise ValueError if the manifest says the bundle can't serve this feature layout"""
+    if manifest.get('bundle_sha256') != version.checksum:
+        # Bundle was replaced without a fresh manifest; fall back to canary validation alone
+        print(f"⚠ Manifest for {manifest.get('bundle')} is stale, ignoring it")
+        return False
+    if manifest.get('feature_columns') != list(feature_columns):
+        raise ValueError(f"Bundle was trained on {manifest.get('feature_columns')}, serving expects {list(feature_columns)}")
+    if manifest.get('classes') != version.classes:
+        raise ValueError('Manifest class list does not match the bundle label encoder')
+    version.manifest = manifest
+    return True
+
+
+def validate_bundle(version, canary_inputs=CANARY_INPUTS):
+    """Raise ValueError unless the bundle produces a well-formed distribution for every canary row"""
+    for key in ('model', 'scaler', 'le_crop'):
+        if key not in version.bundle:
+            raise ValueError(f"Bundle is missing '{key}'")
+    if not version.classes:
+        raise ValueError('Bundle has no crop classes')
+
+    proba = np.asarray(version.predict_proba(canary_inputs))
+    if proba.shape != (len(canary_inputs), len(version.classes)):
+        raise ValueError(f'Unexpected probability shape {proba.shape}')
+    if not np.all(np.isfinite(proba)):
+        raise ValueError('Bundle produced non-finite probabilities')
+    if not np.allclose(proba.sum(axis=1), 1.0, atol=1e-3):
+        raise ValueError('Bundle probabilities do not sum to 1')
+
+
+class ModelSlot:
+    """Serves one bundle file and hot-swaps it when the file changes
+
+    New bundles are loaded and validated off the request path; the swap itself
+    only takes the write lock long enough to replace a reference, so requests
+    holding the read lock finish on the version they started with.
+    """
+
+    def __init__(self, path, canary_inputs=CANARY_INPUTS):
+        self.path = path
+        self.canary_inputs = canary_inputs
+        self._current = None
+        self._lock = ReadWriteLock()
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._stop = threading.Event()
+        self.last_error = None
+        self.load_seconds = None
+        self.size_bytes = 0
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version if self._current else None
+
+    def on_swap(self, callback):
+        """Register callback(old_version, new_version) to invalidate caches derived from the model"""
+        self._listeners.append(callback)
+
+    @contextmanager
+    def read(self):
+        """Pin the active version for the duration of a request"""
+        with self._lock.read():
+            yield self._current
+
+    def _load(self):
+        start = time.perf_counter()
+        mtime = os.path.getmtime(self.path)
+        checksum = file_checksum(self.path)
+        try:
+            version = ModelVersion(load_model(self.path), checksum, mtime)
+            manifest = read_manifest(self.path)
+            if manifest:
+                check_manifest(version, manifest)
+            validate_bundle(version, self.canary_inputs)
+        except Exception:
+            # Don't leave a bundle that failed validation in the shared cache
+            model_cache.invalidate(self.path)
+            raise
+        self.load_seconds = time.perf_counter() - start
+        self.size_bytes = os.path.getsize(self.path)
+        return version
+
+    def _swap(self, new):
+        with self._lock.write():
+            old, self._current = self._current, new
+        # The active version counts against the shared model memory budget until unloaded
+        model_cache.pin(self.path, self.size_bytes)
+        if old is not None:
+            model_cache.unpin(self.path)
+        for callback in self._listeners:
+            try:
+                callback(old, new)
+            except Exception as e:
+                print(f"⚠ Model swap listener failed: {str(e)}")
+        return old
+
+    def reload(self, force=False):
+        """Load, validate and swap in the bundle on disk; returns a status dict"""
+        with self._reload_lock:
+            try:
+                if not os.path.exists(self.path):
+                    return {'success': False, 'error': f'Model file not found: {self.path}'}
+
+                current = self._current
+                if not force and current is not None:
+                    if os.path.getmtime(self.path) == current.mtime:
+                        return {'success': True, 'reloaded': False, 'version': current.version}
+                    if file_checksum(self.path) == current.checksum:
+                        current.mtime = os.path.getmtime(self.path)
+                        return {'success': True, 'reloaded': False, 'version': current.version}
+
+                if force:
+                    model_cache.invalidate(self.path)
+                new = self._load()
+                old = self._swap(new)
+                self.last_error = None
+                print(f"✓ Model {os.path.basename(self.path)} swapped to version {new.version}")
+                return {
+                    'success': True,
+                    'reloaded': True,
+                    'version': new.version,
+                    'previous_version': old.version if old else None
+                }
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Model reload failed, keeping current version: {str(e)}")
+                return {'success': False, 'error': str(e), 'version': self.version}
+
+    def unload(self):
+        """Drop the active version once in-flight requests have released it"""
+        # Serialized with reload() so an eviction can't interleave with a concurrent swap
+        with self._reload_lock:
+            with self._lock.write():
+                old, self._current = self._current, None
+            if old is not None:
+                model_cache.unpin(self.path)
+            model_cache.invalidate(self.path)
+
+    def reload_async(self, force=False):
+        """Run reload() on a background thread"""
+        thread = threading.Thread(target=self.reload, kwargs={'force': force}, daemon=True)
+        thread.start()
+        return thread
+
+    def start_watcher(self, interval=MODEL_WATCH_INTERVAL):
+        """Poll the bundle file and reload in the background when it changes"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def status(self):
+        current = self._current
+        return {
+            'path': self.path,
+            'loaded': current is not None,
+            'version': current.version if current else None,
+            'classes': len(current.classes) if current else 0,
+            'watermark': current.watermark if current else None,
+            'manifest': {
+                'pipeline': current.manifest.get('pipeline'),
+                'created_at': current.manifest.get('created_at'),
+                'data_sha256': current.manifest.get('data', {}).get('sha256'),
+                'metrics': current.manifest.get('metrics')
+            } if current and current.manifest else None,
+            'last_error': self.last_error
+        }
+
+
+class ModelRegistry:
+    """Every *_bundle.joblib in a directory, loaded lazily and evicted LRU under a memory cap
+
+    Memory per model is approximated by the bundle's size on disk, which tracks
+    the in-memory footprint of pickled forests and boosters closely enough to
+    keep the working set bounded. The cap is the model cache's budget, shared
+    with every other model file the process loads: loaded slots are pinned in
+    the cache and models are evicted while the cache's total exceeds it.
+    """
+
+    def __init__(self, directory, default='recommender', memory_cap_mb=MODEL_MEMORY_CAP_MB,
+                 canary_inputs=CANARY_INPUTS):
+        self.directory = directory
+        self.default = default
+        self.memory_cap_bytes = int(memory_cap_mb * 1024 * 1024)
+        self.canary_inputs = canary_inputs
+        self._slots = {}
+        self._loaded = OrderedDict()  # name -> None, least recently used first
+        self._lock = threading.RLock()
+        self._stats = {}
+        self._failures = {}  # name -> {'until', 'delay', 'error', 'mtime'} for bundles that failed to load
+        self._watcher = None
+        self._stop = threading.Event()
+        self._executor = None
+        self.discover()
+
+    def discover(self):
+        """Register any bundle files that appeared since the last scan"""
+        with self._lock:
+            for path in sorted(glob.glob(os.path.join(self.directory, '*' + BUNDLE_SUFFIX))):
+                name = os.path.basename(path)[:-len(BUNDLE_SUFFIX)]
+                if name not in self._slots:
+                    self._slots[name] = ModelSlot(path, self.canary_inputs)
+                    self._stats[name] = {'requests': 0, 'errors': 0, 'latencies': deque(maxlen=1000)}
+            return self.names()
+
+    def names(self):
+        return sorted(self._slots)
+
+    def resolve(self, name=None):
+        """Map an optional model name to a registered one, raising ValueError if unknown"""
+        name = (name or self.default).strip().lower()
+        if name not in self._slots:
+            self.discover()
+        if name not in self._slots:
+            raise ValueError(f"Unknown model '{name}'. Available: {', '.join(self.names())}")
+        return name
+
+    def bundle_path(self, name=None):
+        """Bundle file of a registered model, without loading it"""
+        return self._slots[self.resolve(name)].path
+
+    def slot(self, name=None):
+        """Return the slot for a model, loading it on first use
+
+        The load runs under the slot's own lock, so a lazy load or reload of one
+        model never blocks requests for the others; the registry lock only
+        covers the LRU bookkeeping.
+        """
+        name = self.resolve(name)
+        slot = self._slots[name]
+        if slot.current is None:
+            failure = self._backing_off(name)
+            if failure:
+                raise RuntimeError(f"Model '{name}' failed to load: {failure['error']} (retrying later)")
+            result = slot.reload()
+            if not result['success']:
+                self._record_failure(name, result['error'])
+                raise RuntimeError(f"Model '{name}' failed to load: {result['error']}")
+            self._failures.pop(name, None)
+        with self._lock:
+            self._loaded.pop(name, None)
+            self._loaded[name] = None
+            victims = self._evict(keep=name)
+        for victim in victims:
+            self._slots[victim].unload()
+            print(f"✓ Evicted model {victim} to stay under the memory cap")
+        return slot
+
+    def _backing_off(self, name):
+        """The recorded failure while its backoff lasts and the file is unchanged, else None"""
+        failure = self._failures.get(name)
+        if failure is None or time.monotonic() >= failure['until']:
+            return None
+        try:
+            if os.path.getmtime(self._slots[name].path) != failure['mtime']:
+                return None
+        except OSError:
+            pass
+        return failure
+
+    def _record_failure(self, name, error):
+        previous = self._failures.get(name)
+        delay = min(previous['delay'] * 2, MODEL_LOAD_BACKOFF_MAX_S) if previous else MODEL_LOAD_BACKOFF_S
+        try:
+            mtime = os.path.getmtime(self._slots[name].path)
+        except OSError:
+            mtime = None
+        self._failures[name] = {'until': time.monotonic() + delay, 'delay': delay, 'error': error, 'mtime': mtime}
+
+    def preload(self, names):
+        """Load the given models on a background thread (e.g. ensemble members), skipping unknown ones"""
+        def run():
+            for name in names:
+                if name not in self._slots:
+                    continue
+                try:
+                    self.slot(name)
+                except RuntimeError as e:
+                    print(f"⚠ Preload of {name} failed: {str(e)}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _evict(self, keep):
+        """Drop least recently used names past the shared memory cap; the caller unloads them"""
+        victims = []
+        excess = model_cache.total_bytes() - self.memory_cap_bytes
+        while excess > 0 and len(self._loaded) > 1:
+            victim = next(n for n in self._loaded if n != keep)
+            del self._loaded[victim]
+            victims.append(victim)
+            excess -= self._slots[victim].size_bytes
+        return victims
+
+    def _loaded_bytes(self):
+        return sum(self._slots[n].size_bytes for n in self._loaded)
+
+    @contextmanager
+    def use(self, name=None):
+        """Pin a model version for one request and record its latency"""
+        name = self.resolve(name)
+        stats = self._stats[name]
+        start = time.perf_counter()
+        try:
+            with self._pinned(name) as version:
+                yield version
+        except Exception:
+            stats['errors'] += 1
+            raise
+        finally:
+            stats['requests'] += 1
+            stats['latencies'].append(time.perf_counter() - start)
+
+    @contextmanager
+    def _pinned(self, name):
+        # Another request may evict the model between loading and pinning it; load again if so
+        for _ in range(3):
+            with self.slot(name).read() as version:
+                if version is not None:
+                    yield version
+                    return
+        raise RuntimeError(f"Model '{name}' was evicted before it could be used")
+
+    def reload(self, name=None, force=False):
+        """Hot-swap a model from disk; models not yet loaded are loaded through the LRU"""
+        name = self.resolve(name)
+        if self._slots[name].current is None:
+            # An explicit reload retries immediately, whatever the backoff
+            self._failures.pop(name, None)
+            try:
+                return {'success': True, 'reloaded': True, 'version': self.slot(name).version}
+            except RuntimeError as e:
+                return {'success': False, 'error': str(e)}
+        return self._slots[name].reload(force=force)
+
+    def _score_member(self, name, features):
+        with self.use(name) as version:
+            return version.classes, np.asarray(version.predict_proba(features)), version.version
+
+    def predict_ensemble(self, features, weights=None, budget_ms=None):
+        """Weighted average of member probabilities, evaluated concurrently under a deadline
+
+        Members run on a shared thread pool (tree and booster inference releases
+        the GIL in native code). Members that miss the budget are dropped from
+        this request: queued ones are cancelled so they don't hold up later
+        requests, and ones already running finish in the background. Members
+        whose bundle failed to load are skipped until their load backoff ends.
+        """
+        weights = weights or parse_weights(ENSEMBLE_MODELS)
+        budget = (ENSEMBLE_BUDGET_MS if budget_ms is None else float(budget_ms)) / 1000
+        members = {n: w for n, w in weights.items() if n in self._slots and w > 0}
+        if not members:
+            raise ValueError('No ensemble members are available')
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=ENSEMBLE_WORKERS,
+                                                        thread_name_prefix='ensemble')
+
+        start = time.perf_counter()
+        futures = {self._executor.submit(self._score_member, n, features): n for n in members}
+        done, pending = wait(futures, timeout=budget)
+        for future in pending:
+            future.cancel()
+
+        results, dropped = {}, {}
+        for future, name in futures.items():
+            if future not in done:
+                dropped[name] = 'latency budget exceeded'
+            elif future.exception() is not None:
+                dropped[name] = str(future.exception())
+            else:
+                results[name] = future.result()
+
+        # Members may have been trained on different crop sets; average over the union
+        classes = sorted({c for member_classes, _, _ in results.values() for c in member_classes})
+        index = {c: i for i, c in enumerate(classes)}
+        n_rows = len(features)
+        proba = np.zeros((n_rows, len(classes)))
+        total_weight = 0.0
+        for name, (member_classes, member_proba, _) in results.items():
+            columns = [index[c] for c in member_classes]
+            proba[:, columns] += members[name] * member_proba
+            total_weight += members[name]
+        if total_weight:
+            proba /= total_weight
+
+        return {
+            'classes': classes,
+            'proba': proba,
+            'contributors': {n: {'weight': members[n], 'version': v} for n, (_, _, v) in results.items()},
+            'dropped': dropped,
+            'version': '+'.join(f'{n}@{v}' for n, (_, _, v) in sorted(results.items())),
+            'latency_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+
+    def start_watcher(self, interval=MODEL_WATCH_INTERVAL):
+        """Poll loaded bundles and hot-swap any that changed on disk"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while not self._stop.wait(interval):
+                self.discover()
+                for name in list(self._loaded):
+                    self._slots[name].reload()
+
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        """Per-model load/memory/latency figures for choosing the cheapest adequate model"""
+        report = {}
+        for name in self.names():
+            slot = self._slots[name]
+            stats = self._stats[name]
+            latencies = np.array(stats['latencies']) * 1000
+            report[name] = {
+                **slot.status(),
+                'default': name == self.default,
+                'file_size_mb': round(os.path.getsize(slot.path) / (1024 * 1024), 2) if os.path.exists(slot.path) else None,
+                'approx_memory_mb': round(slot.size_bytes / (1024 * 1024), 2) if slot.current else 0,
+                'load_seconds': round(slot.load_seconds, 4) if slot.load_seconds is not None else None,
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'load_backoff_s': round(self._failures[name]['until'] - time.monotonic(), 1)
+                if self._backing_off(name) else None,
+                'latency_ms': {
+                    'mean': round(float(latencies.mean()), 3),
+                    'p50': round(float(np.percentile(latencies, 50)), 3),
+                    'p95': round(float(np.percentile(latencies, 95)), 3)
+                } if len(latencies) else None
+            }
+        return {
+            'models': report,
+            'loaded': list(self._loaded),
+            'memory_cap_mb': round(self.memory_cap_bytes / (1024 * 1024), 2),
+            'loaded_mb': round(self._loaded_bytes() / (1024 * 1024), 2),
+            'shared_budget_used_mb': round(model_cache.total_bytes() / (1024 * 1024), 2)
+        }
@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from db_pool import ConnectionPool
+from price_store import PriceStore, PriceSeries, normalize
+
+PRICES_DB_PATH = os.environ.get(
+    'PRICES_DB_PATH', os.path.join(os.path.dirname(__file__), "..", "data", "processed", "market_prices.db"))
+
+# Series loaded from the database and kept in memory, least recently used evicted first
+PRICE_SERIES_CACHE = int(os.environ.get('PRICE_SERIES_CACHE', 4096))
+
+# Idle read connections kept by the store's pool
+PRICE_DB_POOL_SIZE = int(os.environ.get('PRICE_DB_POOL_SIZE', 8))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS market_prices (
+    market_key TEXT NOT NULL,
+    crop_key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    market TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (market_key, crop_key, date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS latest_prices (
+    market_key TEXT NOT NULL,
+    crop_key TEXT NOT NULL,
+    market TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    date TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (market_key, crop_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS price_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+UPSERT_PRICE = '''
+INSERT INTO market_prices (market_key, crop_key, date, market, crop, price)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (market_key, crop_key, date) DO UPDATE SET
+    market = excluded.market, crop = excluded.crop, price = excluded.price
+'''
+
+UPSERT_LATEST = '''
+INSERT INTO latest_prices (market_key, crop_key, market, crop, date, price)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (market_key, crop_key) DO UPDATE SET
+    market = excluded.market, crop = excluded.crop, date = excluded.date, price = excluded.price
+WHERE excluded.date >= latest_prices.date
+'''
+
+
+def connect(path=PRICES_DB_PATH, timeout=30.0):
+    """Connection with WAL so readers keep serving while an ingest writes"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+    return conn
+
+
+def init_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def upsert_rows(conn, rows, latest):
+    """Write one batch in a single transaction
+
+    rows: (market_key, crop_key, date, market, crop, price) tuples
+    latest: the newest row per (market_key, crop_key) in the batch, same shape
+    """
+    with conn:
+        conn.executemany(UPSERT_PRICE, rows)
+        conn.executemany(UPSERT_LATEST, [(m, c, market, crop, d, p) for m, c, d, market, crop, p in latest])
+
+
+def bump_version(conn, value):
+    """Mark the data as changed; stores reload cached series when this differs"""
+    with conn:
+        conn.execute("INSERT INTO price_meta (key, value) VALUES ('version', ?) "
+                     "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (str(value),))
+
+
+class SqlitePriceStore(PriceStore):
+    """PriceStore backed by the ingested SQLite table instead of an in-memory CSV
+
+    Latest prices are point lookups on latest_prices; a series is read with one
+    primary-key range scan on first use and kept in an LRU of PriceSeries, so
+    history and rolling aggregates work as with the CSV store while memory
+    stays bounded however large the ingested dumps are. Cached series are
+    dropped when an ingest bumps price_meta.version. Queries borrow
+    connections from a pool, so a request thread never opens its own.
+    """
+
+    def __init__(self, path=PRICES_DB_PATH, **kwargs):
+        # Schema once, up front, rather than per connection
+        conn = connect(path)
+        try:
+            init_schema(conn)
+        finally:
+            conn.close()
+        self._pool = ConnectionPool(path, size=PRICE_DB_POOL_SIZE, cache_kb=65536)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        super().__init__(path, **kwargs)
+
+    def _query(self, sql, params=()):
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _file_stamp(self):
+        if not os.path.exists(self.path):
+            return None
+        rows = self._query("SELECT value FROM price_meta WHERE key = 'version'")
+        return rows[0][0] if rows else None
+
+    def _load(self):
+        # Nothing is preloaded; drop cached series so they are re-read on demand
+        with self._cache_lock:
+            self._cache.clear()
+        return {}, self._query('SELECT COUNT(*) FROM latest_prices')[0][0]
+
+    def series(self, market, crop):
+        self.refresh()
+        key = (normalize(market), normalize(crop))
+        with self._cache_lock:
+            series = self._cache.get(key)
+            if series is not None:
+                self._cache.move_to_end(key)
+                return series
+
+        rows = self._query(
+            'SELECT date, price, market, crop FROM market_prices '
+            'WHERE market_key = ? AND crop_key = ? ORDER BY date', key)
+        if not rows:
+            return None
+        dates = np.array([r[0] for r in rows], dtype='datetime64[D]')
+        prices = np.array([r[1] for r in rows], dtype=float)
+        series = PriceSeries(rows[-1][2], rows[-1][3], dates, prices)
+        with self._cache_lock:
+            self._cache[key] = series
+            while len(self._cache) > PRICE_SERIES_CACHE:
+                self._cache.popitem(last=False)
+        return series
+
+    def latest_price(self, market, crop):
+        self.refresh()
+        rows = self._query('SELECT price FROM latest_prices WHERE market_key = ? AND crop_key = ?',
+                           (normalize(market), normalize(crop)))
+        return float(rows[0][0]) if rows else None
+
+    def latest_prices(self):
+        self.refresh()
+        rows = self._query('SELECT market, crop, date, price FROM latest_prices')
+        return [(market, crop, np.datetime64(date, 'D'), float(price)) for market, crop, date, price in rows]
+
+    def all_series(self):
+        """Every series from one scan of the table in primary-key order (not cached)"""
+        self.refresh()
+        with self._pool.connection() as conn:
+            # One read transaction, so the counts and the rows come from the same snapshot
+            conn.execute('BEGIN')
+            try:
+                names = {(m, c): (market, crop) for m, c, market, crop in
+                         conn.execute('SELECT market_key, crop_key, market, crop FROM latest_prices')}
+                counts = conn.execute('SELECT market_key, crop_key, COUNT(*) FROM market_prices '
+                                      'GROUP BY market_key, crop_key ORDER BY market_key, crop_key').fetchall()
+                # Dates as days since the epoch, so the result converts to arrays without string parsing
+                rows = conn.execute('SELECT CAST(julianday(date) - 2440587.5 AS INTEGER), price '
+                                    'FROM market_prices ORDER BY market_key, crop_key, date').fetchall()
+            finally:
+                conn.execute('COMMIT')
+        if not rows:
+            return []
+        values = np.array(rows, dtype=float)
+        del rows
+        dates = values[:, 0].astype(np.int64).astype('datetime64[D]')
+        prices = np.ascontiguousarray(values[:, 1])
+        ends = np.cumsum([n for _, _, n in counts])
+        series = []
+        for (market_key, crop_key, _), start, end in zip(counts, np.r_[0, ends[:-1]], ends):
+            market, crop = names.get((market_key, crop_key), (market_key, crop_key))
+            series.append(PriceSeries(market, crop, dates[start:end], prices[start:end]))
+        return series
+
+    def status(self):
+        return {
+            'path': os.path.basename(self.path),
+            'backend': 'sqlite',
+            'series': self.rows,
+            'cached_series': len(self._cache),
+            'version': self._stamp,
+            'loaded_at': self.loaded_at,
+            'connections': self._pool.stats()
+        }
@@ -0,0 +1,246 @@
+import os
+
+import numpy as np
+
+from model_cache import load_model
+from price_store import normalize
+
+PRICE_FORECAST_PATH = os.environ.get(
+    'PRICE_FORECAST_PATH', os.path.join(os.path.dirname(__file__), "models", "price_forecast.npz"))
+
+# Prices are averaged into weekly periods starting on Mondays
+PERIOD_DAYS = 7
+PERIOD_ANCHOR = np.datetime64('1970-01-05', 'D')  # a Monday
+SEASON_PERIODS = 52
+HISTORY_PERIODS = 156
+DEFAULT_HORIZON = 8
+MIN_OBSERVATIONS = 8
+
+# Smoothing constants tried for every series; the one with the lowest one-step error wins
+ALPHAS = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+METHODS = ('naive', 'seasonal_naive', 'ses')
+
+
+def align(series, period_days=PERIOD_DAYS, history=HISTORY_PERIODS):
+    """(n_series, history) matrix of mean price per period, NaN where nothing was reported
+
+    `series` is a list of (dates datetime64[D], prices) pairs. Every series is
+    placed on the same period axis, ending at the newest period in any of them.
+    Returns the matrix and the index of its last period.
+    """
+    lengths = np.array([len(dates) for dates, _ in series])
+    dates = np.concatenate([dates for dates, _ in series]).astype('datetime64[D]')
+    prices = np.concatenate([prices for _, prices in series]).astype(float)
+    periods = (dates - PERIOD_ANCHOR).astype(np.int64) // period_days
+    last = int(periods.max())
+    first = last - history + 1
+
+    rows = np.repeat(np.arange(len(series)), lengths)
+    keep = periods >= first
+    flat = rows[keep] * history + (periods[keep] - first)
+    size = len(series) * history
+    sums = np.bincount(flat, weights=prices[keep], minlength=size)
+    counts = np.bincount(flat, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix = np.where(counts > 0, sums / counts, np.nan)
+    return matrix.reshape(len(series), history), last
+
+
+def last_observed(matrix):
+    """Most recent non-NaN value of each row (NaN for empty rows)"""
+    observed = ~np.isnan(matrix)
+    idx = np.where(observed, np.arange(matrix.shape[1]), 0)
+    idx = np.maximum.accumulate(idx, axis=1)[:, -1]
+    return matrix[np.arange(len(matrix)), idx]
+
+
+def previous_observed(matrix):
+    """Value each period is forecast from by the last-value method: the latest earlier observation"""
+    n, periods = matrix.shape
+    observed = ~np.isnan(matrix)
+    idx = np.maximum.accumulate(np.where(observed, np.arange(periods), -1), axis=1)
+    prev = np.full((n, periods), -1)
+    prev[:, 1:] = idx[:, :-1]
+    return np.where(prev >= 0, matrix[np.arange(n)[:, None], np.maximum(prev, 0)], np.nan)
+
+
+def naive(matrix, horizon):
+    return np.repeat(last_observed(matrix)[:, None], horizon, axis=1)
+
+
+def seasonal_naive(matrix, horizon, season=SEASON_PERIODS):
+    """Value one season before each forecast period; last value where that is missing"""
+    fallback = naive(matrix, horizon)
+    if matrix.shape[1] < season:
+        return fallback
+    idx = matrix.shape[1] - season + (np.arange(horizon) % season)
+    values = matrix[:, idx]
+    return np.where(np.isnan(values), fallback, values)
+
+
+def ses(matrix, alphas=ALPHAS):
+    """Simple exponential smoothing of every row, each with its best alpha
+
+    All rows and all candidate alphas advance together, one vector step per
+    period; missing periods carry the level forward. Returns the final level,
+    the chosen alpha and the RMS one-step error per row.
+    """
+    n, periods = matrix.shape
+    alphas = np.asarray(alphas, dtype=float)[:, None]
+    level = np.full((len(alphas), n), np.nan)
+    sse = np.zeros((len(alphas), n))
+    steps = np.zeros(n)
+    for t in range(periods):
+        y = matrix[:, t]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level[0])
+        scored = observed & started
+        error = np.where(scored, y - level, 0.0)
+        sse += error ** 2
+        steps += scored
+        level = np.where(observed & ~started, y, level + alphas * error)
+
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(n)
+    rmse = np.sqrt(sse[best, cols] / np.maximum(steps, 1))
+    return level[best, cols], alphas[best, 0], rmse
+
+
+def one_step_rmse(matrix, method, season=SEASON_PERIODS):
+    """RMS one-step error of the last-value or seasonal naive method per row
+
+    Each observed period is predicted the way the method forecasts: from the
+    previous observation, or from the same period one season earlier (the
+    previous observation where that is missing). SES reports its own error.
+    """
+    predicted = previous_observed(matrix)
+    if method == 'seasonal_naive' and matrix.shape[1] > season:
+        lagged = np.full(matrix.shape, np.nan)
+        lagged[:, season:] = matrix[:, :-season]
+        predicted = np.where(np.isnan(lagged), predicted, lagged)
+    error = matrix - predicted
+    scored = ~np.isnan(error)
+    sse = np.where(scored, error, 0.0) ** 2
+    return np.sqrt(sse.sum(axis=1) / np.maximum(scored.sum(axis=1), 1))
+
+
+def _forecast(matrix, method, horizon, season, alphas):
+    if method == 'naive':
+        return naive(matrix, horizon)
+    if method == 'seasonal_naive':
+        return seasonal_naive(matrix, horizon, season)
+    level, _, _ = ses(matrix, alphas)
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+class PriceForecastModel:
+    """Short-horizon price forecasts for every (market, crop) series at once
+
+    Series are aligned into a (series x period) matrix and every candidate
+    method (last value, seasonal naive, exponential smoothing) is fitted to all
+    rows in a few vector operations. Each series keeps the method with the
+    lowest error on its last `horizon` periods, held out; the winner is then
+    refitted on the full history. The stored forecasts are the artifact the
+    forecast table and income estimates read.
+    """
+
+    def __init__(self, horizon=DEFAULT_HORIZON, period_days=PERIOD_DAYS, season=SEASON_PERIODS):
+        self.horizon = horizon
+        self.period_days = period_days
+        self.season = season
+        self.markets = []
+        self.crops = []
+        self.index = {}
+        self.dates = None       # (horizon,) datetime64[D] period starts
+        self.yhat = None        # (n_series, horizon)
+        self.rmse = None        # (n_series,) one-step error of the chosen method, for the intervals
+        self.method = None      # (n_series,) index into METHODS
+        self.alpha = None       # (n_series,)
+        self.last_date = None   # (n_series,) datetime64[D] latest observation
+
+    def fit(self, series, history=HISTORY_PERIODS, alphas=ALPHAS, min_observations=MIN_OBSERVATIONS):
+        """Fit every PriceSeries in `series`; those with too few recent periods are skipped"""
+        series = [s for s in series if s is not None and len(s)]
+        if not series:
+            raise ValueError('No price series to fit')
+        matrix, last = align([(s.dates, s.prices) for s in series], self.period_days, history)
+        keep = (~np.isnan(matrix)).sum(axis=1) >= min_observations
+        if not keep.any():
+            raise ValueError(f'No series has {min_observations} periods of prices in the last {history}')
+        series = [s for s, k in zip(series, keep) if k]
+        matrix = matrix[keep]
+
+        # Pick a method per series on a holdout of the last `horizon` periods
+        h = self.horizon
+        train, holdout = matrix[:, :-h], matrix[:, -h:]
+        scored = ~np.isnan(holdout)
+        errors = []
+        for method in METHODS:
+            predicted = _forecast(train, method, h, self.season, alphas)
+            abs_error = np.where(scored, np.abs(holdout - predicted), 0.0)
+            errors.append(abs_error.sum(axis=1) / np.maximum(scored.sum(axis=1), 1))
+        errors = np.nan_to_num(np.array(errors), nan=np.inf)
+        method = np.argmin(errors, axis=0)
+        method[~scored.any(axis=1)] = METHODS.index('ses')
+
+        level, alpha, rmse = ses(matrix, alphas)
+        yhat = np.repeat(level[:, None], h, axis=1)
+        for i, name in enumerate(METHODS):
+            rows = method == i
+            if name != 'ses' and rows.any():
+                yhat[rows] = _forecast(matrix[rows], name, h, self.season, alphas)
+                # Intervals reflect the error of the method actually forecasting the series
+                rmse[rows] = one_step_rmse(matrix[rows], name, self.season)
+
+        self.yhat = np.clip(yhat, 0.0, None)
+        self.rmse = rmse
+        self.method = method.astype(np.int8)
+        self.alpha = alpha
+        self.dates = PERIOD_ANCHOR + (np.arange(last + 1, last + 1 + h) * self.period_days).astype('timedelta64[D]')
+        self.last_date = np.array([s.latest_date for s in series], dtype='datetime64[D]')
+        self.markets = [s.market for s in series]
+        self.crops = [s.crop for s in series]
+        self._build_index()
+        return self
+
+    def _build_index(self):
+        self.index = {(normalize(m), normalize(c)): i for i, (m, c) in enumerate(zip(self.markets, self.crops))}
+
+    def __len__(self):
+        return len(self.markets)
+
+    def bands(self, z):
+        """(lower, upper) around yhat, widening with the square root of the steps ahead"""
+        width = z * self.rmse[:, None] * np.sqrt(np.arange(1, self.horizon + 1))
+        return np.clip(self.yhat - width, 0.0, None), self.yhat + width
+
+    def lookup(self, market, crop):
+        """Row index of a series, or None"""
+        return self.index.get((normalize(market), normalize(crop)))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, markets=np.asarray(self.markets, dtype=str), crops=np.asarray(self.crops, dtype=str),
+                 dates=self.dates, yhat=self.yhat, rmse=self.rmse, method=self.method, alpha=self.alpha,
+                 last_date=self.last_date, horizon=self.horizon, period_days=self.period_days,
+                 season=self.season)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        model = cls(int(data['horizon']), int(data['period_days']), int(data['season']))
+        model.markets = [str(m) for m in data['markets']]
+        model.crops = [str(c) for c in data['crops']]
+        for field in ('dates', 'yhat', 'rmse', 'method', 'alpha', 'last_date'):
+            setattr(model, field, data[field])
+        model._build_index()
+        return model
+
+
+def get_forecast(path=PRICE_FORECAST_PATH):
+    """Fitted price forecasts from `path`, cached until the file changes; None if not trained yet"""
+    if not os.path.exists(path):
+        return None
+    return load_model(path, PriceForecastModel.load)
@@ -0,0 +1,371 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PRICES_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "market_prices.csv")
+
+# Older exports call the price column 'Price'; both are per quintal
+PRICE_COLUMNS = ('Price_per_qtl', 'Price')
+
+# How often (seconds) lookups check whether the file changed
+PRICE_RELOAD_CHECK_S = float(os.environ.get('PRICE_RELOAD_CHECK_S', 2))
+
+# Rolling aggregates kept per (series, window), least recently used evicted first
+PRICE_ROLLING_CACHE = int(os.environ.get('PRICE_ROLLING_CACHE', 2048))
+
+# Crop price snapshot: rebuilt every PRICE_SNAPSHOT_INTERVAL seconds from markets
+# whose latest price is within PRICE_SNAPSHOT_MAX_AGE_DAYS of the newest one
+PRICE_SNAPSHOT_INTERVAL = float(os.environ.get('PRICE_SNAPSHOT_INTERVAL', 300))
+PRICE_SNAPSHOT_MAX_AGE_DAYS = int(os.environ.get('PRICE_SNAPSHOT_MAX_AGE_DAYS', 90))
+
+# Mandi commodity names -> the crop names the recommender uses
+CROP_ALIASES = {
+    'paddy': 'rice', 'paddy(dhan)': 'rice', 'arhar': 'pigeonpeas', 'tur': 'pigeonpeas',
+    'arhar(tur/red gram)': 'pigeonpeas', 'red gram': 'pigeonpeas', 'gram': 'chickpea',
+    'bengal gram': 'chickpea', 'bengal gram(gram)': 'chickpea', 'moong': 'mungbean',
+    'green gram': 'mungbean', 'green gram(moong)': 'mungbean', 'urad': 'blackgram',
+    'black gram': 'blackgram', 'black gram(urd beans)': 'blackgram', 'masoor': 'lentil',
+    'masur dal': 'lentil', 'rajma': 'kidneybeans', 'moath dal': 'mothbeans',
+    'cotton(lint)': 'cotton', 'kapas': 'cotton', 'jute(raw)': 'jute',
+}
+
+
+def normalize(name):
+    """Key form of a market or crop name: trimmed, lower case, single spaces"""
+    return ' '.join(str(name).split()).lower()
+
+
+def _factorize_names(column):
+    """Integer codes per normalized name, plus code -> (key, display name)
+
+    Normalization runs once per distinct spelling rather than once per row.
+    """
+    raw_codes, spellings = pd.factorize(column.astype(str))
+    keys = [normalize(s) for s in spellings]
+    codes, unique_keys = pd.factorize(pd.Series(keys))
+    display = {}
+    for key_code, spelling in zip(codes, spellings):
+        display.setdefault(key_code, ' '.join(spelling.split()))
+    names = [(key, display[i]) for i, key in enumerate(unique_keys)]
+    return codes[raw_codes], names
+
+
+class PriceSeries:
+    """Date-sorted prices of one (market, crop) pair
+
+    `dates` (datetime64[D]) and `prices` (float64) are contiguous slices of the
+    store's sorted arrays, so slicing by date is a binary search.
+    """
+
+    __slots__ = ('market', 'crop', 'dates', 'prices')
+
+    def __init__(self, market, crop, dates, prices):
+        self.market = market
+        self.crop = crop
+        self.dates = dates
+        self.prices = prices
+
+    @property
+    def latest_date(self):
+        return self.dates[-1]
+
+    @property
+    def latest_price(self):
+        return float(self.prices[-1])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def date_range(self, start=None, end=None):
+        """Index bounds [lo, hi) of the observations between start and end (inclusive)"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right'))
+        return lo, hi
+
+    def rolling(self, window):
+        """Rolling mean/min/max over `window` observations and change vs the previous one
+
+        Computed over the whole series at once: the mean from a cumulative sum,
+        min/max from a strided window view. The first window-1 entries are NaN.
+        """
+        prices = self.prices
+        n = len(prices)
+        mean = np.full(n, np.nan)
+        low = np.full(n, np.nan)
+        high = np.full(n, np.nan)
+        if n >= window:
+            csum = np.cumsum(np.r_[0.0, prices])
+            mean[window - 1:] = (csum[window:] - csum[:-window]) / window
+            windows = np.lib.stride_tricks.sliding_window_view(prices, window)
+            low[window - 1:] = windows.min(axis=1)
+            high[window - 1:] = windows.max(axis=1)
+        pct_change = np.full(n, np.nan)
+        if n > 1:
+            # A zero price has no percentage change; leave it NaN rather than inf
+            ratio = np.divide(prices[1:], prices[:-1], out=np.full(n - 1, np.nan), where=prices[:-1] != 0)
+            pct_change[1:] = (ratio - 1.0) * 100
+        return {'mean': mean, 'min': low, 'max': high, 'pct_change': pct_change}
+
+
+class PriceStore:
+    """Market prices indexed by (market, crop), loaded once and reloaded when the file changes
+
+    The CSV (Date, Market, Crop, Price_per_qtl) is read in one pass, sorted by
+    series and date, and split into PriceSeries views, so the latest price is
+    a dict lookup whatever the file size.
+    """
+
+    def __init__(self, path=PRICES_PATH, check_interval=PRICE_RELOAD_CHECK_S):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._series = {}
+        self._stamp = None
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.rows = 0
+        self._rolling = OrderedDict()  # (market, crop, window) -> (series, aggregates)
+        self._rolling_lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def refresh(self, force=False):
+        """Reload if the file changed since the last load; returns True when reloaded"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            stamp = self._file_stamp()
+            if not force and stamp == self._stamp:
+                self._checked_at = now
+                return False
+            try:
+                series, rows = self._load() if stamp else ({}, 0)
+            except Exception:
+                # Keep serving the last good series; a bad file is re-parsed once
+                # it changes again, not on every request
+                self._stamp = stamp
+                self._checked_at = now
+                raise
+            self._series, self.rows = series, rows
+            with self._rolling_lock:
+                self._rolling.clear()
+            self._stamp = stamp
+            self.loaded_at = time.time()
+            # Stamped after the load, so concurrent callers wait for it instead of reading an empty store
+            self._checked_at = now
+            return True
+
+    def _load(self):
+        try:
+            df = pd.read_csv(self.path)
+        except pd.errors.EmptyDataError:
+            return {}, 0
+        price_column = next((c for c in PRICE_COLUMNS if c in df.columns), None)
+        if price_column is None or not {'Date', 'Market', 'Crop'} <= set(df.columns):
+            raise ValueError(f'{self.path} needs Date, Market, Crop and one of {PRICE_COLUMNS}')
+
+        df = df.dropna(subset=['Date', 'Market', 'Crop', price_column])
+        prices = pd.to_numeric(df[price_column], errors='coerce').to_numpy(dtype=float)
+        keep = ~np.isnan(prices)
+        df, prices = df[keep], prices[keep]
+        if not len(df):
+            return {}, 0
+        markets, market_names = _factorize_names(df['Market'])
+        crops, crop_names = _factorize_names(df['Crop'])
+        dates = pd.to_datetime(df['Date']).to_numpy().astype('datetime64[D]')
+
+        # One sort puts every series in a contiguous, date-ordered block
+        order = np.lexsort((dates, crops, markets))
+        markets, crops = markets[order], crops[order]
+        dates, prices = np.ascontiguousarray(dates[order]), np.ascontiguousarray(prices[order])
+
+        starts = np.flatnonzero(np.r_[True, (markets[1:] != markets[:-1]) | (crops[1:] != crops[:-1])])
+        ends = np.r_[starts[1:], len(dates)]
+        series = {}
+        for start, end in zip(starts, ends):
+            (market_key, market), (crop_key, crop) = market_names[markets[start]], crop_names[crops[start]]
+            series[(market_key, crop_key)] = PriceSeries(market, crop, dates[start:end], prices[start:end])
+        return series, len(dates)
+
+    def series(self, market, crop):
+        """PriceSeries for a market/crop pair (names matched case-insensitively), or None"""
+        self.refresh()
+        return self._series.get((normalize(market), normalize(crop)))
+
+    def latest_price(self, market, crop):
+        series = self.series(market, crop)
+        return series.latest_price if series is not None else None
+
+    def history(self, market, crop, window=7, start=None, end=None):
+        """(series, lo, hi, aggregates) for a date slice; aggregates cover the whole series
+
+        Aggregates are cached per (series, window) until the file reloads, so
+        repeated range queries only pay for the slice.
+        """
+        series = self.series(market, crop)
+        if series is None:
+            return None
+        key = (normalize(market), normalize(crop), window)
+        with self._rolling_lock:
+            cached = self._rolling.get(key)
+            if cached is not None:
+                self._rolling.move_to_end(key)
+        # Entries computed on a series replaced by a reload are recomputed
+        if cached is None or cached[0] is not series:
+            cached = (series, series.rolling(window))
+            with self._rolling_lock:
+                self._rolling[key] = cached
+                while len(self._rolling) > PRICE_ROLLING_CACHE:
+                    self._rolling.popitem(last=False)
+        aggregates = cached[1]
+        lo, hi = series.date_range(start, end)
+        return series, lo, hi, aggregates
+
+    def all_series(self):
+        self.refresh()
+        return list(self._series.values())
+
+    def latest_prices(self):
+        """[(market, crop, latest date, latest price)] for every series"""
+        return [(s.market, s.crop, s.latest_date, s.latest_price) for s in self.all_series()]
+
+    def status(self):
+        return {
+            'path': os.path.basename(self.path),
+            'series': len(self._series),
+            'rows': self.rows,
+            'loaded_at': self.loaded_at
+        }
+
+
+def crop_key(crop):
+    """Recommender-style crop key for a mandi commodity name ('Kidney Beans' -> 'kidneybeans')"""
+    name = normalize(crop)
+    return CROP_ALIASES.get(name, name).replace(' ', '')
+
+
+class PriceSnapshot:
+    """Per-crop median of the latest market prices, rebuilt in the background
+
+    Readers get a dict lookup on an immutable snapshot that is replaced in one
+    assignment, so the request path never touches the file or the store lock.
+    Markets that have not reported within max_age_days of the newest date are
+    left out of the median.
+    """
+
+    def __init__(self, source=None, interval=PRICE_SNAPSHOT_INTERVAL, max_age_days=PRICE_SNAPSHOT_MAX_AGE_DAYS,
+                 forecast=None):
+        # Callable returning the store, so a price database created later is picked up
+        self.source = source or get_store
+        # Optional callable returning a fitted PriceForecastModel (or None)
+        self.forecast = forecast
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self._prices = {}
+        self.built_at = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._worker = None
+
+    def rebuild(self):
+        """Recompute the snapshot from the store and swap it in"""
+        try:
+            store = self.source()
+            store.refresh()
+            latest = store.latest_prices()
+            prices = {}
+            if latest:
+                newest = max(date for _, _, date, _ in latest)
+                cutoff = newest - np.timedelta64(self.max_age_days, 'D')
+                by_crop = {}
+                for _, crop, date, price in latest:
+                    if date >= cutoff:
+                        by_crop.setdefault(crop_key(crop), []).append(price)
+                prices = {
+                    crop: {'price': round(float(np.median(values)), 2), 'markets': len(values),
+                           'as_of': str(newest)}
+                    for crop, values in by_crop.items()
+                }
+                self._add_forecasts(prices)
+            self._prices = prices
+            self.built_at = time.time()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠ Price snapshot rebuild failed, keeping previous: {str(e)}")
+
+    def _add_forecasts(self, prices):
+        """Median forecast price at the end of the horizon, for crops in the snapshot"""
+        model = self.forecast() if self.forecast else None
+        if model is None or not len(model):
+            return
+        by_crop = {}
+        for crop, value in zip(model.crops, model.yhat[:, -1]):
+            by_crop.setdefault(crop_key(crop), []).append(value)
+        for crop, values in by_crop.items():
+            if crop in prices:
+                prices[crop]['forecast_price'] = round(float(np.median(values)), 2)
+                prices[crop]['forecast_date'] = str(model.dates[-1])
+
+    def start(self):
+        """Build now and every `interval` seconds on a daemon thread"""
+        if self._worker is not None:
+            return
+
+        def run():
+            self.rebuild()
+            while not self._stop.wait(self.interval):
+                self.rebuild()
+
+        self._worker = threading.Thread(target=run, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, crop):
+        """{'price', 'markets', 'as_of'} for a crop, or None when no market reports it
+
+        Includes 'forecast_price' and 'forecast_date' when price forecasts are fitted.
+        """
+        return self._prices.get(crop_key(crop))
+
+    def prices(self):
+        return dict(self._prices)
+
+    def status(self):
+        return {'crops': len(self._prices), 'built_at': self.built_at, 'last_error': self.last_error}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=None):
+    """Shared price store for a file
+
+    Without a path: the SQLite price database when ingest_prices.py has
+    created it, else the market_prices.csv file.
+    """
+    if path is None:
+        from price_db import PRICES_DB_PATH
+        path = PRICES_DB_PATH if os.path.exists(PRICES_DB_PATH) else PRICES_PATH
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            if path.endswith(('.db', '.sqlite')):
+                from price_db import SqlitePriceStore
+                _stores[path] = SqlitePriceStore(path)
+            else:
+                _stores[path] = PriceStore(path)
+        return _stores[path]
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from model_cache import load_model
+
+YEAR_DAYS = 365.25
+DEFAULT_HARMONICS = 3
+RIDGE = 1e-6
+
+
+def _days(dates):
+    """Dates as float days since the Unix epoch"""
+    delta = pd.to_datetime(pd.Index(dates)) - pd.Timestamp('1970-01-01')
+    return np.asarray(delta / pd.Timedelta(days=1), dtype=float)
+
+
+class HarmonicRainfallModel:
+    """Seasonal rainfall forecaster for many series at once
+
+    Each series is modelled as intercept + linear trend + K yearly harmonics,
+    fitted by least squares. All series are solved together as one batch of
+    masked normal equations, so missing observations are allowed and the cost
+    is a handful of NumPy calls regardless of how many series there are.
+    Forecasting is a single matrix product of the coefficient matrix with the
+    design matrix of the requested dates.
+    """
+
+    def __init__(self, harmonics=DEFAULT_HARMONICS):
+        self.harmonics = harmonics
+        self.coef = None          # (n_series, n_terms)
+        self.names = []
+        self.index = {}
+        self.origin = 0.0
+        self.last_date = None
+        self.residual_std = None  # (n_series,)
+
+    @property
+    def n_terms(self):
+        return 2 + 2 * self.harmonics
+
+    def design(self, dates):
+        """(len(dates), n_terms) design matrix"""
+        t = _days(dates) - self.origin
+        columns = [np.ones_like(t), t / YEAR_DAYS]
+        for k in range(1, self.harmonics + 1):
+            angle = 2 * np.pi * k * t / YEAR_DAYS
+            columns.extend([np.sin(angle), np.cos(angle)])
+        return np.column_stack(columns)
+
+    def fit(self, dates, values, names, origin=None):
+        """Fit every series in `values` (n_dates, n_series; NaN = missing) against shared `dates`
+
+        `origin` (days since epoch) anchors the trend and harmonic phases; pass the
+        same value when fitting batches that will be merged into one model.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+        self.origin = float(_days(dates).min()) if origin is None else float(origin)
+        self.last_date = pd.to_datetime(pd.Index(dates)).max()
+        X = self.design(dates)
+        mask = ~np.isnan(values)
+        Y = np.where(mask, values, 0.0)
+
+        # Per-series normal equations, restricted to each series' observed rows
+        A = np.einsum('ts,tp,tq->spq', mask, X, X) + RIDGE * np.eye(self.n_terms)
+        b = np.einsum('tp,ts->sp', X, Y)
+        self.coef = np.linalg.solve(A, b[..., None])[..., 0]
+
+        residuals = np.where(mask, Y - X @ self.coef.T, 0.0)
+        dof = np.maximum(mask.sum(axis=0) - self.n_terms, 1)
+        self.residual_std = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+
+        self.names = [str(n) for n in names]
+        self.index = {n: i for i, n in enumerate(self.names)}
+        return self
+
+    def fit_frame(self, df, date_col='ds', value_col='y', series_col=None):
+        """Fit from a long-format frame; without series_col the whole frame is one series"""
+        if series_col is None:
+            wide = df.groupby(date_col)[value_col].mean().to_frame('rainfall')
+        else:
+            wide = df.pivot_table(index=date_col, columns=series_col, values=value_col, aggfunc='mean')
+        wide.index = pd.to_datetime(wide.index)
+        wide = wide.sort_index()
+        return self.fit(wide.index, wide.to_numpy(), list(wide.columns))
+
+    @classmethod
+    def merge(cls, models):
+        """One model holding the series of several models fitted with the same origin"""
+        models = [m for m in models if m.coef is not None and len(m.names)]
+        if not models:
+            raise ValueError('No fitted series to merge')
+        if len({(m.harmonics, m.origin) for m in models}) > 1:
+            raise ValueError('Can only merge models fitted with the same harmonics and origin')
+        merged = cls(models[0].harmonics)
+        merged.origin = models[0].origin
+        merged.last_date = max(m.last_date for m in models)
+        merged.coef = np.concatenate([m.coef for m in models])
+        merged.residual_std = np.concatenate([m.residual_std for m in models])
+        merged.names = [n for m in models for n in m.names]
+        merged.index = {n: i for i, n in enumerate(merged.names)}
+        if len(merged.index) != len(merged.names):
+            raise ValueError('Merged models share series names')
+        return merged
+
+    def forecast(self, dates, names=None):
+        """(n_series, len(dates)) forecasts, clipped at zero, for `names` (default: all series)"""
+        rows = self.coef if names is None else self.coef[[self.index[n] for n in names]]
+        return np.clip(rows @ self.design(dates).T, 0.0, None)
+
+    def future_dates(self, periods, freq='MS'):
+        start = self.last_date + pd.tseries.frequencies.to_offset(freq)
+        return pd.date_range(start, periods=periods, freq=freq)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, coef=self.coef, names=np.asarray(self.names, dtype=str),
+                 harmonics=self.harmonics, origin=self.origin,
+                 last_date=np.datetime64(self.last_date, 'D'), residual_std=self.residual_std)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        model = cls(int(data['harmonics']))
+        model.coef = data['coef']
+        model.names = [str(n) for n in data['names']]
+        model.index = {n: i for i, n in enumerate(model.names)}
+        model.origin = float(data['origin'])
+        model.last_date = pd.Timestamp(data['last_date'].item())
+        model.residual_std = data['residual_std']
+        return model
+
+
+def get_model(path):
+    """Fitted model from `path`, kept in memory and reloaded only when the file changes"""
+    return load_model(path, HarmonicRainfallModel.load)
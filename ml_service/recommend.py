@@ -2,6 +2,8 @@ import pandas as pd
 from sklearn.tree import DecisionTreeClassifier
 import joblib, os
 
+from model_cache import load_model
+
 MODEL_PATH = "models/soil_crop.pkl"
 
 def train_recommendation():
@@ -13,6 +15,7 @@ def train_recommendation():
     joblib.dump(model, MODEL_PATH)
 
 def recommend_crop(features):
-    model = joblib.load(MODEL_PATH)
+    # Loaded once and reused until the file on disk changes
+    model = load_model(MODEL_PATH)
     pred = model.predict([features])
     return pred[0]
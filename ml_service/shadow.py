@@ -0,0 +1,158 @@
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from model_manager import ModelSlot
+
+SHADOW_MODEL = os.environ.get('SHADOW_MODEL', '')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1))
+SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', 1000))
+SHADOW_LATENCY_WINDOW = 5000
+
+
+def top_k(classes, proba, k):
+    return [classes[i] for i in np.argsort(proba)[::-1][:k]]
+
+
+class ShadowEvaluator:
+    """Scores a sample of live /recommend inputs with a candidate model off the request path
+
+    Sampled feature rows go onto a bounded queue; when the worker falls behind,
+    new samples are dropped rather than queued, so memory stays fixed and the
+    request path never waits.
+
+    The candidate is loaded into a slot of its own, watched for changes like
+    the served models, so it never takes a place in the registry's LRU or
+    shows up in its request stats.
+    """
+
+    def __init__(self, registry, candidate=SHADOW_MODEL, sample_rate=SHADOW_SAMPLE_RATE,
+                 queue_size=SHADOW_QUEUE_SIZE):
+        self.registry = registry
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._slot = None
+        self.candidate = None
+        self.sample_rate = 0.0
+        try:
+            self.configure(candidate, sample_rate)
+        except ValueError as e:
+            print(f"⚠ Shadow scoring disabled: {str(e)}")
+            self.configure(None, sample_rate)
+
+    def configure(self, candidate, sample_rate=None):
+        """Switch candidate model (empty disables shadowing) and reset the aggregates
+
+        Raises ValueError for a model the registry doesn't know.
+        """
+        candidate = (candidate or '').strip().lower() or None
+        slot = None
+        if candidate:
+            slot = ModelSlot(self.registry.bundle_path(candidate), self.registry.canary_inputs)
+        with self._lock:
+            old, self._slot = self._slot, slot
+            self.candidate = candidate
+            if sample_rate is not None:
+                self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+            self._reset()
+        if old is not None:
+            old.stop_watcher()
+            old.unload()
+        if slot is not None:
+            slot.reload_async()
+            slot.start_watcher()
+            self._start()
+
+    def _reset(self):
+        self.sampled = 0
+        self.dropped = 0
+        self.scored = 0
+        self.errors = 0
+        self.top1_agree = 0
+        self.top3_overlap = 0.0
+        self.latencies = deque(maxlen=SHADOW_LATENCY_WINDOW)
+        self.last_error = None
+
+    def _start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def submit(self, features, classes, proba):
+        """Offer one primary prediction for shadow scoring; never blocks"""
+        slot = self._slot
+        if slot is None or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((slot, np.array(features, dtype=float), list(classes), np.array(proba)))
+            queued = True
+        except queue.Full:
+            queued = False
+        with self._lock:
+            if slot is self._slot:
+                if queued:
+                    self.sampled += 1
+                else:
+                    self.dropped += 1
+        return queued
+
+    def _run(self):
+        while True:
+            slot, features, classes, proba = self._queue.get()
+            try:
+                start = time.perf_counter()
+                with slot.read() as version:
+                    if version is None:
+                        raise RuntimeError(slot.last_error or 'Candidate model is still loading')
+                    candidate_proba = np.asarray(version.predict_proba(features))[0]
+                elapsed = time.perf_counter() - start
+                self._record(slot, classes, proba, version.classes, candidate_proba, elapsed)
+            except Exception as e:
+                with self._lock:
+                    if slot is self._slot:
+                        self.errors += 1
+                        self.last_error = str(e)
+            finally:
+                self._queue.task_done()
+
+    def _record(self, slot, classes, proba, candidate_classes, candidate_proba, elapsed):
+        primary_top3 = top_k(classes, proba, 3)
+        candidate_top3 = top_k(candidate_classes, candidate_proba, 3)
+        with self._lock:
+            # Samples queued before a reconfigure belong to the previous candidate
+            if slot is not self._slot:
+                return
+            self.scored += 1
+            self.top1_agree += primary_top3[0] == candidate_top3[0]
+            self.top3_overlap += len(set(primary_top3) & set(candidate_top3)) / 3
+            self.latencies.append(elapsed)
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            return {
+                'candidate': self.candidate,
+                'version': self._slot.version if self._slot else None,
+                'sample_rate': self.sample_rate,
+                'sampled': self.sampled,
+                'scored': self.scored,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'top1_agreement': round(self.top1_agree / self.scored, 4) if self.scored else None,
+                'top3_overlap': round(self.top3_overlap / self.scored, 4) if self.scored else None,
+                'latency_ms': {
+                    'mean': round(float(latencies.mean()), 3),
+                    'p50': round(float(np.percentile(latencies, 50)), 3),
+                    'p95': round(float(np.percentile(latencies, 95)), 3),
+                    'p99': round(float(np.percentile(latencies, 99)), 3)
+                } if len(latencies) else None,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,236 @@
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+from model_cache import load_model
+
+SOIL_MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "soil_classifier.pth")
+
+# Soil types /recommend understands; checkpoints record their own class order
+SOIL_CLASSES = ['clay', 'loamy', 'sandy', 'silty']
+IMAGE_SIZE = int(os.environ.get('SOIL_IMAGE_SIZE', 128))
+IMAGE_MEAN = [0.485, 0.456, 0.406]
+IMAGE_STD = [0.229, 0.224, 0.225]
+
+# Dynamic batching: a batch closes at SOIL_BATCH_MAX images or SOIL_BATCH_WAIT_MS after its first
+SOIL_BATCH_MAX = int(os.environ.get('SOIL_BATCH_MAX', 32))
+SOIL_BATCH_WAIT_MS = float(os.environ.get('SOIL_BATCH_WAIT_MS', 10))
+SOIL_DECODE_WORKERS = int(os.environ.get('SOIL_DECODE_WORKERS', 4))
+SOIL_TORCH_THREADS = int(os.environ.get('SOIL_TORCH_THREADS', os.cpu_count() or 1))
+SOIL_TIMEOUT_S = float(os.environ.get('SOIL_TIMEOUT_S', 10))
+# Per-request upload limits, checked before anything is decoded
+SOIL_MAX_IMAGES = int(os.environ.get('SOIL_MAX_IMAGES', 8))
+SOIL_MAX_IMAGE_MB = float(os.environ.get('SOIL_MAX_IMAGE_MB', 5))
+SOIL_LATENCY_WINDOW = 5000
+
+
+def build_network(num_classes=len(SOIL_CLASSES)):
+    """Small CNN for soil texture photos; shared by training and serving"""
+    from torch import nn
+    return nn.Sequential(
+        nn.Conv2d(3, 16, 3, padding=1), nn.BatchNorm2d(16), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(16, 32, 3, padding=1), nn.BatchNorm2d(32), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(32, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(64, 128, 3, padding=1), nn.BatchNorm2d(128), nn.ReLU(),
+        nn.AdaptiveAvgPool2d(1), nn.Flatten(),
+        nn.Dropout(0.2), nn.Linear(128, num_classes)
+    )
+
+
+def decode_image(data, size=IMAGE_SIZE, mean=IMAGE_MEAN, std=IMAGE_STD):
+    """Image bytes -> normalized float32 (3, size, size) array"""
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (size, size))  # JPEG: decode at reduced scale when the source is large
+        image = image.convert('RGB').resize((size, size), Image.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+    pixels = (pixels - np.asarray(mean, dtype=np.float32)) / np.asarray(std, dtype=np.float32)
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+
+def load_checkpoint(path):
+    """Network in eval mode plus the preprocessing it was trained with"""
+    import torch
+    checkpoint = torch.load(path, map_location='cpu')
+    classes = list(checkpoint.get('classes', SOIL_CLASSES))
+    network = build_network(len(classes))
+    network.load_state_dict(checkpoint['state_dict'])
+    network.eval()
+    return {
+        'network': network,
+        'classes': classes,
+        'image_size': int(checkpoint.get('image_size', IMAGE_SIZE)),
+        'mean': checkpoint.get('mean', IMAGE_MEAN),
+        'std': checkpoint.get('std', IMAGE_STD),
+    }
+
+
+class DynamicBatcher:
+    """Coalesces single-image requests from concurrent callers into batched forward passes
+
+    Callers submit one preprocessed image and get a Future. A worker thread
+    takes the first queued image, keeps collecting until max_batch images or
+    max_wait_ms have passed, and runs them as one batch, so per-call overhead
+    is paid once per batch while a lone request waits at most max_wait_ms.
+    """
+
+    def __init__(self, predict_batch, max_batch=SOIL_BATCH_MAX, max_wait_ms=SOIL_BATCH_WAIT_MS):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=SOIL_LATENCY_WINDOW)
+        self._batch_ms = deque(maxlen=SOIL_LATENCY_WINDOW)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, array):
+        future = Future()
+        self._queue.put((array, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                proba = self.predict_batch(np.stack([array for array, _ in batch]))
+                for (_, future), row in zip(batch, proba):
+                    future.set_result(row)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            with self._lock:
+                self._batch_sizes.append(len(batch))
+                self._batch_ms.append((time.perf_counter() - start) * 1000)
+
+    def stats(self):
+        with self._lock:
+            sizes, ms = list(self._batch_sizes), list(self._batch_ms)
+        if not sizes:
+            return {'batches': 0}
+        return {
+            'batches': len(sizes),
+            'mean_batch_size': round(float(np.mean(sizes)), 2),
+            'max_batch_size': int(max(sizes)),
+            'batch_ms_p50': round(float(np.percentile(ms, 50)), 3),
+            'batch_ms_p95': round(float(np.percentile(ms, 95)), 3),
+            'queued': self._queue.qsize()
+        }
+
+
+class SoilClassifier:
+    """Soil type from photos: thread-pool decoding feeding a dynamic CPU batcher
+
+    The checkpoint is loaded through the shared model cache on first use and
+    whenever the file changes. torch and Pillow are optional; without them (or
+    without a trained checkpoint) `available()` is False and classify() raises
+    RuntimeError.
+    """
+
+    def __init__(self, path=SOIL_MODEL_PATH, max_batch=SOIL_BATCH_MAX, max_wait_ms=SOIL_BATCH_WAIT_MS,
+                 decode_workers=SOIL_DECODE_WORKERS, torch_threads=SOIL_TORCH_THREADS):
+        self.path = path
+        self.torch_threads = torch_threads
+        self._decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix='soil-decode')
+        self._batcher = DynamicBatcher(self._predict_batch, max_batch, max_wait_ms)
+        self._latency_ms = deque(maxlen=SOIL_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._torch_configured = False
+        self.last_error = None
+
+    def available(self):
+        try:
+            self._checkpoint()
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+    def _checkpoint(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            raise RuntimeError(f'Soil classifier not trained yet ({os.path.basename(self.path)})')
+        try:
+            import torch
+        except ImportError:
+            raise RuntimeError('Soil classification needs torch, which is not installed')
+        if not self._torch_configured:
+            # Process-wide setting; once is enough
+            torch.set_num_threads(self.torch_threads)
+            self._torch_configured = True
+        return load_model(self.path, load_checkpoint)
+
+    def _predict_batch(self, images):
+        import torch
+        network = self._checkpoint()['network']
+        with torch.inference_mode():
+            logits = network(torch.from_numpy(images))
+            return torch.softmax(logits, dim=1).numpy()
+
+    def classify(self, images, timeout=SOIL_TIMEOUT_S):
+        """Classify a list of image byte strings; returns one prediction dict per image
+
+        Raises ValueError for undecodable images and RuntimeError when the
+        classifier is unavailable or a prediction takes longer than `timeout`.
+        """
+        start = time.perf_counter()
+        checkpoint = self._checkpoint()
+        size, mean, std = checkpoint['image_size'], checkpoint['mean'], checkpoint['std']
+        try:
+            arrays = list(self._decode_pool.map(lambda data: decode_image(data, size, mean, std), images))
+        except ImportError:
+            raise RuntimeError('Soil classification needs Pillow, which is not installed')
+        except Exception as e:
+            raise ValueError(f'Could not decode image: {str(e)}')
+
+        futures = [self._batcher.submit(array) for array in arrays]
+        classes = checkpoint['classes']
+        predictions = []
+        for future in futures:
+            try:
+                proba = future.result(timeout=timeout)
+            except FutureTimeout:
+                raise RuntimeError(f'Soil classification timed out after {timeout:g}s')
+            best = int(np.argmax(proba))
+            predictions.append({
+                'soil_type': classes[best],
+                'confidence': round(float(proba[best]) * 100, 1),
+                'probabilities': {c: round(float(p), 4) for c, p in zip(classes, proba)}
+            })
+        with self._lock:
+            self._latency_ms.append((time.perf_counter() - start) * 1000)
+        return predictions
+
+    def stats(self):
+        with self._lock:
+            ms = list(self._latency_ms)
+        latency = {}
+        if ms:
+            latency = {f'p{p}': round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+        return {
+            'model': os.path.basename(self.path),
+            'requests': len(ms),
+            'latency_ms': latency,
+            'batching': self._batcher.stats(),
+            'last_error': self.last_error
+        }
@@ -0,0 +1,74 @@
+# src/train_price_forecast.py
+#
+# Fits short-horizon price forecasts for every (market, crop) series in the
+# price store and writes them into one artifact, models/price_forecast.npz.
+# The forecast table (/forecast?kind=price, /prices/forecast) is rebuilt from
+# it, and the price snapshot uses it for income estimates.
+#
+# All series are aligned into one (series x week) matrix and fitted together,
+# so the run time is dominated by reading the prices, not by the models.
+#
+#   python src/train_price_forecast.py [--prices data/processed/market_prices.db] [--horizon 8]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from price_engine import (PriceForecastModel, PRICE_FORECAST_PATH, DEFAULT_HORIZON, HISTORY_PERIODS,
+                          SEASON_PERIODS, MIN_OBSERVATIONS, METHODS)
+from price_store import get_store
+
+
+def train(args):
+    store = get_store(args.prices)
+    start = time.perf_counter()
+    store.refresh(force=True)
+    series = store.all_series()
+    read_s = time.perf_counter() - start
+    print(f"▶ Read {len(series):,} series from {os.path.basename(store.path)} in {read_s:.1f}s")
+
+    start = time.perf_counter()
+    model = PriceForecastModel(args.horizon, season=args.season)
+    model.fit(series, history=args.history, min_observations=args.min_observations)
+    fit_s = time.perf_counter() - start
+    model.save(args.output)
+
+    chosen = np.bincount(model.method, minlength=len(METHODS))
+    print(f"✓ Fitted {len(model):,} series ({len(series) - len(model):,} skipped, too sparse) "
+          f"in {fit_s:.2f}s ({len(model) / max(fit_s, 1e-9):,.0f} series/s)")
+    print("  methods: " + ', '.join(f"{name} {count:,}" for name, count in zip(METHODS, chosen)))
+    print(f"  horizon: {model.horizon} weeks from {model.dates[0]}")
+    print(f"✓ Saved {args.output}")
+
+    if os.path.abspath(args.output) == os.path.abspath(PRICE_FORECAST_PATH):
+        # Rebuild the table /forecast serves from
+        from forecast_store import write_table
+        write_table()
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit weekly price forecasts for every market/crop series')
+    parser.add_argument('--prices', default=None, help='price CSV or SQLite database (default: the shared store)')
+    parser.add_argument('--output', default=PRICE_FORECAST_PATH)
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='weeks ahead')
+    parser.add_argument('--history', type=int, default=HISTORY_PERIODS, help='weeks of history used')
+    parser.add_argument('--season', type=int, default=SEASON_PERIODS, help='season length in weeks')
+    parser.add_argument('--min-observations', type=int, default=MIN_OBSERVATIONS,
+                        help='weeks with prices needed to forecast a series')
+    args = parser.parse_args(argv)
+
+    try:
+        train(args)
+    except ValueError as e:
+        print(f"✗ {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
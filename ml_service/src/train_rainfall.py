@@ -0,0 +1,259 @@
+# src/train_rainfall.py
+#
+# Fits one seasonal (harmonic) rainfall model per location and writes them all
+# into a single indexed artifact, models/rainfall_harmonic.npz, which /forecast
+# and utils.forecast_rainfall serve from.
+#
+# The long-format CSV (location, date, rainfall mm) is streamed in chunks and
+# grouped by location; batches of locations are fitted in worker processes.
+# A CSV without a location column (ds, y) is fitted as a single series.
+# Daily or monthly readings are summed into monthly totals either way; this is
+# the only trainer for the artifact (forecast.train_rainfall runs it too).
+# Each finished batch is checkpointed under <output>.parts/, so an interrupted
+# run picks up where it stopped. With --sorted (input grouped by location),
+# batches are dispatched while the file is still being read.
+#
+#   python src/train_rainfall.py [--data data/processed/rainfall.csv] [--workers 8] [--sorted]
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rainfall_engine import HarmonicRainfallModel, DEFAULT_HARMONICS
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DATA_PATH = os.path.join(REPO_ROOT, "data", "processed", "rainfall.csv")
+OUTPUT_PATH = os.path.join(REPO_ROOT, "ml_service", "models", "rainfall_harmonic.npz")
+
+# Shared anchor for trend and harmonic phases, so every batch merges into one model
+ORIGIN_DAYS = (pd.Timestamp('2000-01-01') - pd.Timestamp('1970-01-01')) / pd.Timedelta(days=1)
+BATCH_SIZE = 64
+CHUNKSIZE = 200_000
+MIN_MONTHS = 24
+# Series name used when the CSV has no location column
+SINGLE_SERIES = 'rainfall'
+
+
+def data_key(path, args):
+    """Identifies the input and fit settings a set of checkpoints belongs to"""
+    stat = os.stat(path)
+    key = [os.path.abspath(path), stat.st_size, stat.st_mtime, args.harmonics, args.min_months,
+           args.location_col, args.date_col, args.value_col]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def prepare_parts(parts_dir, key, resume):
+    """Checkpoint directory for this run; returns the locations already fitted"""
+    meta_path = os.path.join(parts_dir, 'meta.json')
+    if resume and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get('key') == key:
+                done = set()
+                for path in part_files(parts_dir):
+                    done.update(str(n) for n in np.load(path)['names'])
+                return done
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    with open(meta_path, 'w') as f:
+        json.dump({'key': key}, f)
+    return set()
+
+
+def part_files(parts_dir):
+    # Half-written parts only exist under their .tmp.npz name
+    return sorted(p for p in glob.glob(os.path.join(parts_dir, 'part-*.npz')) if not p.endswith('.tmp.npz'))
+
+
+def iter_batches(path, args, skip):
+    """Yield lists of (location, dates, values) from the long-format CSV
+
+    Each location's rows are kept as compact datetime64/float32 arrays. With
+    args.sorted a location is complete once the next one starts, so full
+    batches are yielded while reading; otherwise everything is yielded at EOF.
+    """
+    buffers = {}
+    ready = []
+    finished = set()
+    current = None
+    single = args.location_col not in pd.read_csv(path, nrows=0).columns
+    columns = [args.date_col, args.value_col] if single else [args.location_col, args.date_col, args.value_col]
+
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=args.chunksize,
+                             dtype={args.location_col: str}):
+        chunk = chunk.dropna(subset=columns[:-1])
+        if chunk.empty:
+            continue
+        if single:
+            locations = np.full(len(chunk), SINGLE_SERIES, dtype=object)
+        else:
+            locations = chunk[args.location_col].to_numpy()
+        dates = pd.to_datetime(chunk[args.date_col]).to_numpy().astype('datetime64[D]')
+        values = pd.to_numeric(chunk[args.value_col], errors='coerce').to_numpy(dtype=np.float32)
+
+        # Runs of equal locations, in file order
+        starts = np.flatnonzero(np.r_[True, locations[1:] != locations[:-1]])
+        ends = np.r_[starts[1:], len(locations)]
+        for start, end in zip(starts, ends):
+            location = locations[start]
+            if location != current:
+                if args.sorted and current is not None:
+                    finished.add(current)
+                    if current in buffers:
+                        ready.append(current)
+                if location in finished:
+                    raise ValueError(f"Location '{location}' appears again after other locations; "
+                                     "the input is not grouped by location (drop --sorted)")
+                current = location
+            if location in skip:
+                continue
+            buffers.setdefault(location, []).append((dates[start:end], values[start:end]))
+
+        while len(ready) >= args.batch_size:
+            yield [_take(buffers, loc) for loc in ready[:args.batch_size]]
+            ready = ready[args.batch_size:]
+
+    remaining = ready + [loc for loc in buffers if loc not in ready]
+    for i in range(0, len(remaining), args.batch_size):
+        yield [_take(buffers, loc) for loc in remaining[i:i + args.batch_size]]
+
+
+def _take(buffers, location):
+    pieces = buffers.pop(location)
+    return location, np.concatenate([d for d, _ in pieces]), np.concatenate([v for _, v in pieces])
+
+
+def fit_batch(batch, parts_dir, harmonics, min_months):
+    """Fit a batch of locations in a worker and checkpoint it; returns (fitted, skipped, rows, seconds)"""
+    start = time.perf_counter()
+    names = [str(location) for location, _, _ in batch]
+    months = [dates.astype('datetime64[M]') for _, dates, _ in batch]
+    first = min(m.min() for m in months)
+    n_months = int(max(m.max() for m in months) - first) + 1
+
+    # Daily or monthly input alike is summed into a (month, location) grid in one pass
+    row = np.concatenate([(m - first).astype(int) for m in months])
+    col = np.repeat(np.arange(len(batch)), [len(m) for m in months])
+    values = np.concatenate([v for _, _, v in batch]).astype(float)
+    observed = ~np.isnan(values)
+    totals = np.zeros((n_months, len(batch)))
+    counts = np.zeros((n_months, len(batch)), dtype=int)
+    np.add.at(totals, (row[observed], col[observed]), values[observed])
+    np.add.at(counts, (row[observed], col[observed]), 1)
+    grid = np.where(counts > 0, totals, np.nan)
+
+    keep = (counts > 0).sum(axis=0) >= min_months
+    skipped = [n for n, k in zip(names, keep) if not k]
+    if keep.any():
+        dates = pd.date_range(pd.Timestamp(first), periods=n_months, freq='MS')
+        fitted = [n for n, k in zip(names, keep) if k]
+        model = HarmonicRainfallModel(harmonics).fit(dates, grid[:, keep], fitted, origin=ORIGIN_DAYS)
+        digest = hashlib.sha1('\0'.join(model.names).encode()).hexdigest()[:16]
+        model.save(os.path.join(parts_dir, f'part-{digest}.npz'))
+    return int(keep.sum()), skipped, len(row), time.perf_counter() - start
+
+
+def merge_parts(parts_dir):
+    return HarmonicRainfallModel.merge([HarmonicRainfallModel.load(p) for p in part_files(parts_dir)])
+
+
+def train(args):
+    if not os.path.exists(args.data) or os.path.getsize(args.data) == 0:
+        raise ValueError(f'No rainfall data at {args.data}')
+
+    parts_dir = args.output + '.parts'
+    done = prepare_parts(parts_dir, data_key(args.data, args), not args.no_resume)
+    if done:
+        print(f"↻ Resuming: {len(done)} locations already fitted")
+
+    wall_start = time.perf_counter()
+    fitted = rows = 0
+    skipped = []
+
+    # One BLAS thread per worker; parallelism comes from the processes
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = '1'
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        pending = set()
+
+        def collect(futures):
+            nonlocal fitted, rows
+            for future in futures:
+                n, missed, n_rows, _ = future.result()
+                fitted += n
+                rows += n_rows
+                skipped.extend(missed)
+            elapsed = time.perf_counter() - wall_start
+            print(f"  {fitted + len(done):,} locations fitted ({fitted / elapsed:,.1f} series/s)", flush=True)
+
+        for batch in iter_batches(args.data, args, done):
+            # Bounded in-flight batches keep memory flat while the file streams
+            if len(pending) >= args.workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(pool.submit(fit_batch, batch, parts_dir, args.harmonics, args.min_months))
+        collect(wait(pending)[0])
+
+    fit_seconds = time.perf_counter() - wall_start
+    model = merge_parts(parts_dir)
+    model.save(args.output)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    wall_seconds = time.perf_counter() - wall_start
+
+    print("\nRainfall training report")
+    print(f"  locations in artifact:    {len(model.names):,}")
+    print(f"  fitted this run:          {fitted:,} ({rows:,} rows)")
+    print(f"  resumed from checkpoint:  {len(done):,}")
+    print(f"  skipped (< {args.min_months} months):   {len(skipped):,}")
+    print(f"  fit wall-clock:           {fit_seconds:.1f}s on {args.workers} workers")
+    print(f"  throughput:               {fitted / fit_seconds:,.1f} series/s, {rows / fit_seconds:,.0f} rows/s")
+    print(f"  total (incl. merge):      {wall_seconds:.1f}s")
+    print(f"✓ Saved {args.output}")
+
+    if os.path.abspath(args.output) == os.path.abspath(OUTPUT_PATH):
+        # Rebuild the table /forecast serves from
+        from forecast_store import write_table
+        write_table()
+    return model
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fit per-location rainfall models into one artifact')
+    parser.add_argument('--data', default=DATA_PATH, help='long-format CSV: location, date, rainfall')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--location-col', default='location')
+    parser.add_argument('--date-col', default='ds')
+    parser.add_argument('--value-col', default='y')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='locations per worker task')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='CSV rows read at a time')
+    parser.add_argument('--harmonics', type=int, default=DEFAULT_HARMONICS)
+    parser.add_argument('--min-months', type=int, default=MIN_MONTHS)
+    parser.add_argument('--sorted', action='store_true', help='input is grouped by location')
+    parser.add_argument('--no-resume', action='store_true', help='discard checkpoints from an earlier run')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        train(args)
+    except ValueError as e:
+        print(f"✗ {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
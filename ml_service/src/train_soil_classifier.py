@@ -0,0 +1,142 @@
+# src/train_soil_classifier.py
+#
+# Trains the soil photo classifier served by /soil/classify and used by
+# /recommend when a soil_image is sent instead of a soil_type. Images are read
+# from one folder per soil type:
+#
+#   data/raw/soil_images/{clay,loamy,sandy,silty}/*.jpg
+#
+# and decoded with the same preprocessing as serving (soil_classifier.decode_image).
+# The checkpoint stores the weights with the class order and preprocessing.
+#
+#   python src/train_soil_classifier.py [--epochs 20] [--image-size 128]
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from soil_classifier import (build_network, decode_image, SOIL_CLASSES, SOIL_MODEL_PATH,
+                             IMAGE_SIZE, IMAGE_MEAN, IMAGE_STD)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+IMAGES_DIR = os.path.join(REPO_ROOT, "data", "raw", "soil_images")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_images(images_dir, size, workers):
+    """(images, labels, classes) for every image under images_dir/<class>/"""
+    classes = [c for c in SOIL_CLASSES if os.path.isdir(os.path.join(images_dir, c))]
+    if len(classes) < 2:
+        raise ValueError(f'Need at least two soil type folders under {images_dir}')
+
+    paths, labels = [], []
+    for i, soil_type in enumerate(classes):
+        for path in sorted(glob.glob(os.path.join(images_dir, soil_type, '*'))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(path)
+                labels.append(i)
+
+    def decode(path):
+        with open(path, 'rb') as f:
+            return decode_image(f.read(), size)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        images = np.stack(list(pool.map(decode, paths)))
+    return images, np.array(labels), classes
+
+
+def train(args):
+    import torch
+    from torch import nn
+
+    torch.manual_seed(42)
+    torch.set_num_threads(args.threads)
+
+    start = time.perf_counter()
+    images, labels, classes = load_images(args.images, args.image_size, args.threads)
+    print(f"Loaded {len(images)} images in {time.perf_counter() - start:.1f}s: "
+          + ', '.join(f'{c}={int((labels == i).sum())}' for i, c in enumerate(classes)))
+
+    rng = np.random.default_rng(42)
+    order = rng.permutation(len(images))
+    n_val = max(1, int(len(images) * args.val_split))
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    X_train, y_train = torch.from_numpy(images[train_idx]), torch.from_numpy(labels[train_idx])
+    X_val, y_val = torch.from_numpy(images[val_idx]), torch.from_numpy(labels[val_idx])
+
+    network = build_network(len(classes))
+    optimizer = torch.optim.Adam(network.parameters(), lr=args.lr)
+    loss_fn = nn.CrossEntropyLoss()
+
+    best_accuracy, best_state = -1.0, None
+    for epoch in range(1, args.epochs + 1):
+        network.train()
+        permutation = torch.randperm(len(X_train))
+        total_loss = 0.0
+        for i in range(0, len(permutation), args.batch_size):
+            idx = permutation[i:i + args.batch_size]
+            batch = X_train[idx]
+            # Soil photos have no canonical orientation: random flips as augmentation
+            if torch.rand(1).item() < 0.5:
+                batch = torch.flip(batch, dims=[3])
+            if torch.rand(1).item() < 0.5:
+                batch = torch.flip(batch, dims=[2])
+            optimizer.zero_grad()
+            loss = loss_fn(network(batch), y_train[idx])
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(idx)
+
+        network.eval()
+        with torch.inference_mode():
+            accuracy = (network(X_val).argmax(dim=1) == y_val).float().mean().item()
+        print(f"  epoch {epoch:>3}: loss {total_loss / len(X_train):.4f}, val accuracy {accuracy:.4f}")
+        if accuracy > best_accuracy:
+            best_accuracy = accuracy
+            best_state = {k: v.clone() for k, v in network.state_dict().items()}
+
+    checkpoint = {
+        'state_dict': best_state,
+        'classes': classes,
+        'image_size': args.image_size,
+        'mean': IMAGE_MEAN,
+        'std': IMAGE_STD,
+        'metrics': {'val_accuracy': round(best_accuracy, 4), 'train_images': len(train_idx),
+                    'val_images': len(val_idx)}
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    tmp = args.output + '.tmp'
+    torch.save(checkpoint, tmp)
+    os.replace(tmp, args.output)
+    print(f"✓ Saved {args.output} (val accuracy {best_accuracy:.4f})")
+    return checkpoint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the soil photo classifier')
+    parser.add_argument('--images', default=IMAGES_DIR, help='folder with one subfolder per soil type')
+    parser.add_argument('--output', default=SOIL_MODEL_PATH)
+    parser.add_argument('--image-size', type=int, default=IMAGE_SIZE)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--val-split', type=float, default=0.2)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    try:
+        train(args)
+    except (ValueError, ImportError) as e:
+        print(f"✗ {str(e)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,25 @@
+import os
+import sys
+import datetime
+
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rainfall_engine import get_model
+from price_store import get_store
+
+RAINFALL_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "models", "rainfall_harmonic.npz")
+
+# Months (1-12) covered by each Indian cropping season
+SEASON_MONTHS = {
+    'kharif': [6, 7, 8, 9, 10],
+    'rabi': [10, 11, 12, 1, 2, 3],
+    'zaid': [3, 4, 5, 6],
+}
+
 def get_latest_price(market, crop):
-    df = pd.read_csv("data/processed/market_prices.csv", parse_dates=['Date'])
-    tok = df[(df.Market.str.lower()==market.lower()) & (df.Crop.str.lower()==crop.lower())]
-    if tok.empty: 
-        return None
-    return float(tok.sort_values('Date').iloc[-1]['Price_per_qtl'])
+    # Indexed (market, crop) lookup in the ingested price database, else the CSV
+    return get_store().latest_price(market, crop)
 
 def expected_income(price_per_qtl, avg_yield_kg_per_acre, acres):
     # convert price per qtl -> per kg
@@ -14,8 +28,31 @@ def expected_income(price_per_qtl, avg_yield_kg_per_acre, acres):
 
 def forecast_rainfall(location=None, season=None):
     """
-    Placeholder rainfall forecast function.
-    In the future, replace this with a real ML model or weather API integration.
+    Monthly rainfall forecast (mm) from the fitted harmonic model.
+    Uses the location's own series (no location is needed when only one was fitted);
+    averages over the season's months when a season is given, else forecasts next month.
+    Falls back to 120.0 mm when no model has been trained yet, and returns None for a
+    location the model has no series for rather than another location's forecast.
     """
-    # Example: fixed dummy rainfall in mm
-    return 120.0
+    if not os.path.exists(RAINFALL_MODEL_PATH):
+        return 120.0
+
+    model = get_model(RAINFALL_MODEL_PATH)
+    if location is None:
+        if len(model.names) != 1:
+            return None
+        name = model.names[0]
+    else:
+        names = {n.strip().lower(): n for n in model.names}
+        name = names.get(str(location).strip().lower())
+        if name is None:
+            return None
+
+    today = pd.Timestamp(datetime.date.today()).replace(day=1)
+    months = pd.date_range(today, periods=12, freq='MS')
+    if season and season.lower() in SEASON_MONTHS:
+        months = months[months.month.isin(SEASON_MONTHS[season.lower()])]
+    else:
+        months = months[1:2]
+
+    return round(float(model.forecast(months, [name]).mean()), 1)
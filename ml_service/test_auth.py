@@ -78,14 +78,70 @@ def test_auth_flow():
                 print("✅ Authenticated crop recommendation successful!")
             else:
                 print(f"❌ Crop recommendation failed: {response.text}")
+            
+            # 5. Test Profile Update
+            print("\n5️⃣ Testing Profile Update...")
+            response = requests.put(f"{BASE_URL}/auth/profile", json={"name": "Updated Farmer"}, headers=headers)
+            print(f"Status: {response.status_code}")
+            print(f"Response: {json.dumps(response.json(), indent=2)}")
+            if response.status_code == 200 and response.json()['user']['name'] == "Updated Farmer":
+                print("✅ Profile update successful!")
+            else:
+                print("❌ Profile update failed")
+            
+            response = requests.put(f"{BASE_URL}/auth/profile", json={"username": None}, headers=headers)
+            print(f"Empty username update - Status: {response.status_code}")
+            if response.status_code == 400:
+                print("✅ Empty username properly rejected!")
+            else:
+                print("❌ Empty username was not rejected")
+            
+            # 6. Test Signout
+            print("\n6️⃣ Testing Signout...")
+            response = requests.post(f"{BASE_URL}/auth/signout", headers=headers)
+            print(f"Status: {response.status_code}")
+            response = requests.get(f"{BASE_URL}/auth/profile", headers=headers)
+            print(f"Profile with signed-out token - Status: {response.status_code}")
+            if response.status_code == 401:
+                print("✅ Signed-out token properly rejected!")
+            else:
+                print("❌ Signed-out token still accepted")
+            
+            # 7. Test Account Deletion (also leaves the database clean for the next run)
+            print("\n7️⃣ Testing Account Deletion...")
+            response = requests.post(f"{BASE_URL}/auth/signin", json=signin_data)
+            delete_headers = {"Authorization": f"Bearer {response.json().get('token')}"}
+            response = requests.delete(f"{BASE_URL}/auth/profile", headers=delete_headers)
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.json()}")
+            response = requests.post(f"{BASE_URL}/auth/signin", json=signin_data)
+            print(f"Signin after deletion - Status: {response.status_code}")
+            if response.status_code != 200:
+                print("✅ Account deleted!")
+            else:
+                print("❌ Deleted account can still sign in")
+            
+            # The token signed out in step 6 must stay revoked after its user is gone
+            response = requests.get(f"{BASE_URL}/auth/profile", headers=headers)
+            print(f"Signed-out token after deletion - Status: {response.status_code}")
+            if response.status_code == 401:
+                print("✅ Revoked token still rejected after deletion!")
+            else:
+                print("❌ Revoked token accepted again after deletion")
+            response = requests.get(f"{BASE_URL}/auth/profile", headers=delete_headers)
+            print(f"Deleting session's token after deletion - Status: {response.status_code}")
+            if response.status_code == 401:
+                print("✅ Deleted user's token rejected!")
+            else:
+                print("❌ Deleted user's token still accepted")
                 
         else:
             print("❌ Signin failed")
     except Exception as e:
         print(f"❌ Signin test failed: {e}")
     
-    # 5. Test Invalid Token
-    print("\n5️⃣ Testing Invalid Token...")
+    # 8. Test Invalid Token
+    print("\n8️⃣ Testing Invalid Token...")
     try:
         invalid_headers = {"Authorization": "Bearer invalid_token_123"}
         response = requests.get(f"{BASE_URL}/auth/profile", headers=invalid_headers)
@@ -0,0 +1,237 @@
+# train.py
+#
+# Single entry point for training. Pipelines are declared in
+# training_config.json (data file, feature columns, label, model family and
+# parameters, output bundle); every run writes the bundle plus a manifest
+# recording the data hash, feature columns, class list, metrics and the wall
+# time and peak memory of each stage. The serving registry reads the manifest
+# to check a bundle is compatible before swapping it in.
+#
+#   python train.py                      # run the config's default pipelines
+#   python train.py recommender xgboost  # run named pipelines
+#   python train.py --list
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: tracemalloc peaks only
+    resource = None
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from dataset import load_dataset
+from checksums import file_checksum
+from model_manager import MANIFEST_SUFFIX
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "training_config.json")
+
+
+def manifest_path(bundle_path):
+    return bundle_path + MANIFEST_SUFFIX
+
+
+def build_model(family, params):
+    """Untrained estimator for a model family"""
+    if family == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**params)
+    if family == 'xgboost':
+        import xgboost as xgb
+        return xgb.XGBClassifier(**params)
+    if family == 'lightgbm':
+        import lightgbm as lgb
+        return lgb.LGBMClassifier(**params)
+    raise ValueError(f'Unknown model family: {family}')
+
+
+class StageTimer:
+    """Wall time and peak memory per pipeline stage
+
+    Peak memory is the tracemalloc high-water mark (Python and NumPy
+    allocations) within the stage; process max RSS is recorded alongside
+    where the platform reports it.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stages[name] = {
+                'seconds': round(time.perf_counter() - start, 4),
+                'peak_mb': round(peak / (1024 * 1024), 2),
+                'max_rss_mb': max_rss_mb()
+            }
+            print(f"  {name:<10} {self.stages[name]['seconds']:>8.2f}s  peak {self.stages[name]['peak_mb']:>8.1f} MB")
+
+
+def max_rss_mb():
+    """Process peak resident memory in MB, or None where getrusage is unavailable"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def library_versions():
+    import sklearn
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'scikit-learn': sklearn.__version__}
+
+
+def write_manifest(bundle_path, pipeline, data_path, data_checksum, features, classes,
+                   metrics, family, params, stages=None, extra=None, bundle_file=None):
+    """Describe a bundle so serving can validate it; written next to the bundle
+
+    `bundle_file` is the file to hash when the bundle has not been moved into
+    place yet (see save_bundle).
+    """
+    manifest = {
+        'pipeline': pipeline,
+        'bundle': os.path.basename(bundle_path),
+        'bundle_sha256': file_checksum(bundle_file or bundle_path),
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'data': {'path': os.path.relpath(data_path, REPO_ROOT), 'sha256': data_checksum},
+        'feature_columns': list(features),
+        'classes': [str(c) for c in classes],
+        'family': family,
+        'params': params,
+        'metrics': metrics,
+        'stages': stages or {},
+        'versions': library_versions(),
+        **(extra or {})
+    }
+    dump_manifest(bundle_path, manifest)
+    return manifest
+
+
+def dump_manifest(bundle_path, manifest):
+    """Atomically (re)write a bundle's manifest file"""
+    path = manifest_path(bundle_path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def save_bundle(bundle, bundle_path, *manifest_args, **manifest_kwargs):
+    """Write a bundle and its manifest without ever exposing a mismatched pair
+
+    The bundle is dumped to a temp file and the manifest (hashing that file)
+    lands first; the bundle is then swapped in with os.replace. A reader in
+    between sees the old bundle with a manifest whose hash does not match it,
+    which the registry ignores, never a new bundle without its manifest.
+    """
+    os.makedirs(os.path.dirname(bundle_path) or '.', exist_ok=True)
+    tmp = bundle_path + '.tmp'
+    joblib.dump(bundle, tmp)
+    manifest = write_manifest(bundle_path, *manifest_args, bundle_file=tmp, **manifest_kwargs)
+    os.replace(tmp, bundle_path)
+    return manifest
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_pipeline(name, config=None):
+    """Train one configured pipeline; returns its manifest"""
+    config = config or load_config()
+    if name not in config['pipelines']:
+        raise ValueError(f"Unknown pipeline '{name}'. Available: {', '.join(config['pipelines'])}")
+    spec = config['pipelines'][name]
+    data_path = os.path.join(REPO_ROOT, spec['data'])
+    output = os.path.join(REPO_ROOT, spec['output'])
+    features, label = spec['features'], spec['label']
+
+    print(f"▶ {name}: {spec['family']} on {spec['data']}")
+    timer = StageTimer()
+
+    with timer.stage('load'):
+        ds = load_dataset(data_path)
+        missing = [c for c in features + [label] if c not in ds.columns]
+        if missing:
+            raise ValueError(f"{spec['data']} is missing columns {missing} required by pipeline '{name}'")
+
+    with timer.stage('prepare'):
+        # Categorical feature columns are fed to the model as their cached codes
+        X = pd.DataFrame({c: ds.codes(c) if c in ds.categories else ds.columns[c] for c in features})
+        y = ds.codes(label)
+        encoders = {f'le_{c}': ds.label_encoder(c) for c in features if c in ds.categories}
+        le_label = ds.label_encoder(label)
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=spec.get('test_size', 0.2), random_state=42)
+        scaler = StandardScaler().fit(X_train)
+
+    with timer.stage('fit'):
+        model = build_model(spec['family'], spec.get('params', {}))
+        model.fit(scaler.transform(X_train), y_train)
+
+    with timer.stage('evaluate'):
+        accuracy = accuracy_score(y_test, model.predict(scaler.transform(X_test)))
+        metrics = {'accuracy': round(float(accuracy), 4), 'test_rows': len(y_test), 'train_rows': len(y_train)}
+
+    with timer.stage('refit'):
+        # Serving bundles are fit on all rows once the holdout score is recorded
+        scaler = StandardScaler().fit(X)
+        model = build_model(spec['family'], spec.get('params', {}))
+        model.fit(scaler.transform(X), y)
+        bundle = {'model': model, 'scaler': scaler, 'le_crop': le_label, **encoders}
+
+    with timer.stage('save'):
+        manifest = save_bundle(bundle, output, name, data_path, ds.checksum, features, le_label.classes_,
+                               metrics, spec['family'], spec.get('params', {}), dict(timer.stages))
+    # The save stage only finishes after the manifest is written; record it too.
+    # The bundle hash is unaffected, so rewriting the manifest keeps the pair valid.
+    manifest['stages'] = dict(timer.stages)
+    dump_manifest(output, manifest)
+    print(f"✓ {name}: accuracy {metrics['accuracy']:.4f}, bundle {spec['output']}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train model bundles from training_config.json')
+    parser.add_argument('pipelines', nargs='*', help='pipelines to run (default: the config\'s "default" list)')
+    parser.add_argument('--config', default=CONFIG_PATH)
+    parser.add_argument('--list', action='store_true', help='list configured pipelines')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.list:
+        for name, spec in config['pipelines'].items():
+            print(f"{name:<18} {spec['family']:<14} {spec['data']} -> {spec['output']}")
+        return 0
+
+    failed = []
+    for name in args.pipelines or config['default']:
+        try:
+            run_pipeline(name, config)
+        except Exception as e:
+            print(f"✗ {name} failed: {str(e)}")
+            failed.append(name)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,84 +1,235 @@
 # train_model.py (extended)
-
-import pandas as pd
+#
+# Fits the RandomForest, XGBoost, LightGBM and Keras bundles concurrently, one
+# process per model family. Preprocessed arrays are written once as .npy files
+# and memory-mapped by every worker, and the CPU cores are partitioned between
+# the families so they don't oversubscribe each other.
+# `--sequential` fits them one at a time with every core, and `--compare` runs
+# both to measure the speedup.
+
+import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
-from sklearn.ensemble import RandomForestClassifier
-import xgboost as xgb
-import lightgbm as lgb
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
-from tensorflow.keras.utils import to_categorical
-import joblib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+import argparse
+import multiprocessing
+import tempfile
+import time
 import os
 
+from dataset import load_dataset
+from train import save_bundle
+
 # Paths
-RAW_DATA_PATH = os.path.join("..", "data", "raw", "crop_data.csv")
-PROCESSED_PATH = os.path.join("..", "data", "processed")
-
-# Load Dataset
-df = pd.read_csv(RAW_DATA_PATH)
-
-X = df[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']]
-y = df['label']
-
-# Encode target labels
-le_crop = LabelEncoder()
-y_encoded = le_crop.fit_transform(y)
-num_classes = len(le_crop.classes_)
-
-# Scale features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_encoded, test_size=0.2, random_state=42)
-
-# ---- Random Forest ----
-rf_model = RandomForestClassifier(n_estimators=200, random_state=42)
-rf_model.fit(X_train, y_train)
-y_pred_rf = rf_model.predict(X_test)
-print("RandomForest accuracy:", accuracy_score(y_test, y_pred_rf))
-
-# ---- XGBoost ----
-xgb_model = xgb.XGBClassifier(use_label_encoder=False, eval_metric='mlogloss')
-xgb_model.fit(X_train, y_train)
-y_pred_xgb = xgb_model.predict(X_test)
-print("XGBoost accuracy:", accuracy_score(y_test, y_pred_xgb))
-
-# ---- LightGBM ----
-lgb_model = lgb.LGBMClassifier()
-lgb_model.fit(X_train, y_train)
-y_pred_lgb = lgb_model.predict(X_test)
-print("LightGBM accuracy:", accuracy_score(y_test, y_pred_lgb))
-
-# ---- Neural Network (Keras) ----
-y_train_cat = to_categorical(y_train, num_classes=num_classes)
-y_test_cat = to_categorical(y_test, num_classes=num_classes)
-
-nn_model = Sequential([
-    Dense(64, activation='relu', input_shape=(X_train.shape[1],)),
-    Dense(64, activation='relu'),
-    Dense(num_classes, activation='softmax')
-])
-
-nn_model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-nn_model.fit(X_train, y_train_cat, epochs=50, batch_size=32, verbose=0)
-nn_acc = nn_model.evaluate(X_test, y_test_cat, verbose=0)[1]
-print("Neural Network accuracy:", nn_acc)
-
-# ---- Save all bundles ----
-os.makedirs(PROCESSED_PATH, exist_ok=True)
-
-bundles = {
-    'random_forest': {'model': rf_model, 'scaler': scaler, 'le_crop': le_crop},
-    'xgboost': {'model': xgb_model, 'scaler': scaler, 'le_crop': le_crop},
-    'lightgbm': {'model': lgb_model, 'scaler': scaler, 'le_crop': le_crop},
-    'neural_network': {'model': nn_model, 'scaler': scaler, 'le_crop': le_crop}
-}
-
-for name, bundle in bundles.items():
-    joblib.dump(bundle, os.path.join(PROCESSED_PATH, f'{name}_bundle.joblib'))
-
-print("All models saved in", PROCESSED_PATH)
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "crop_data.csv")
+PROCESSED_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Relative CPU share of each model family; the forest parallelises best over trees
+FAMILY_WEIGHTS = {'random_forest': 2, 'xgboost': 1, 'lightgbm': 1, 'neural_network': 1}
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def partition_threads(weights, total=None):
+    """Split the available cores between families in proportion to their weights (at least 1 each)"""
+    total = total or os.cpu_count() or 1
+    weight_sum = sum(weights.values())
+    threads = {name: max(1, int(total * w / weight_sum)) for name, w in weights.items()}
+    # Hand leftover cores to the heaviest family
+    spare = total - sum(threads.values())
+    if spare > 0:
+        threads[max(weights, key=weights.get)] += spare
+    return threads
+
+
+def prepare_arrays(work_dir):
+    """Load and preprocess the dataset once; returns array paths plus the fitted scaler/encoder"""
+    ds = load_dataset(RAW_DATA_PATH)
+
+    X = ds.frame(FEATURES)
+
+    # Target labels come category-coded from the columnar cache
+    le_crop = ds.label_encoder('label')
+    y_encoded = ds.codes('label')
+
+    # Scale features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y_encoded, test_size=0.2, random_state=42)
+
+    arrays = {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+    paths = {}
+    for name, array in arrays.items():
+        paths[name] = os.path.join(work_dir, f'{name}.npy')
+        np.save(paths[name], np.ascontiguousarray(array))
+    return paths, scaler, le_crop, ds.checksum
+
+
+@contextmanager
+def thread_env(n_threads):
+    """Set the native thread-pool caps in this process's environment, restoring them afterwards"""
+    saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(n_threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def load_arrays(paths):
+    """Memory-map the shared arrays; workers read the same pages instead of copying them"""
+    return {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+
+def fit_family(name, paths, n_threads, scaler, le_crop, data_checksum):
+    """Fit and save one model family in a worker process; returns (name, bundle path, accuracy, seconds)
+
+    The worker's OpenMP/BLAS caps come from the environment it was spawned
+    with (see train_all); setting them here would be too late, since NumPy
+    and scikit-learn were already loaded when this module was imported.
+    """
+    start = time.perf_counter()
+    data = load_arrays(paths)
+    X_train, X_test, y_train, y_test = data['X_train'], data['X_test'], data['y_train'], data['y_test']
+    num_classes = len(le_crop.classes_)
+
+    if name == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier
+        model = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=n_threads)
+        model.fit(X_train, y_train)
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    elif name == 'xgboost':
+        import xgboost as xgb
+        model = xgb.XGBClassifier(use_label_encoder=False, eval_metric='mlogloss', n_jobs=n_threads)
+        model.fit(X_train, y_train)
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    elif name == 'lightgbm':
+        import lightgbm as lgb
+        model = lgb.LGBMClassifier(n_jobs=n_threads)
+        model.fit(X_train, y_train)
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+
+    elif name == 'neural_network':
+        import tensorflow as tf
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense
+        from tensorflow.keras.utils import to_categorical
+        tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+        y_train_cat = to_categorical(y_train, num_classes=num_classes)
+        y_test_cat = to_categorical(y_test, num_classes=num_classes)
+
+        model = Sequential([
+            Dense(64, activation='relu', input_shape=(X_train.shape[1],)),
+            Dense(64, activation='relu'),
+            Dense(num_classes, activation='softmax')
+        ])
+
+        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        model.fit(np.asarray(X_train), y_train_cat, epochs=50, batch_size=32, verbose=0)
+        accuracy = model.evaluate(np.asarray(X_test), y_test_cat, verbose=0)[1]
+
+    else:
+        raise ValueError(f'Unknown model family: {name}')
+
+    # Write the bundle from the worker so it lands as soon as this family is done
+    seconds = time.perf_counter() - start
+    path = os.path.join(PROCESSED_PATH, f'{name}_bundle.joblib')
+    save_bundle({'model': model, 'scaler': scaler, 'le_crop': le_crop}, path,
+                'train_model', RAW_DATA_PATH, data_checksum, FEATURES, le_crop.classes_,
+                {'accuracy': round(float(accuracy), 4)}, name, {'n_jobs': n_threads},
+                {'fit': {'seconds': round(seconds, 4)}})
+    return name, path, float(accuracy), seconds
+
+
+def run_families(families, threads, concurrency, paths, scaler, le_crop, data_checksum):
+    """Fit families in fresh spawned workers, at most `concurrency` at a time; yields each result as it finishes"""
+    context = multiprocessing.get_context('spawn')
+    todo = list(families)
+    running = {}
+    try:
+        while todo or running:
+            while todo and len(running) < concurrency:
+                f = todo.pop(0)
+                # The worker reads its thread caps from the environment it is spawned with
+                with thread_env(threads[f]):
+                    pool = ProcessPoolExecutor(max_workers=1, mp_context=context)
+                    running[pool.submit(fit_family, f, paths, threads[f], scaler, le_crop, data_checksum)] = pool
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future).shutdown()
+                yield future.result()
+    finally:
+        for pool in running.values():
+            pool.shutdown(cancel_futures=True)
+
+
+def train_all(families=None, total_threads=None, sequential=False, compare=False):
+    """Train every family and write each bundle as soon as it finishes.
+
+    By default the families run concurrently on a partition of the cores. With
+    `sequential` they run one by one with every core each; `compare` runs both
+    and reports the measured speedup of the concurrent run over the sequential one.
+    """
+    families = families or list(FAMILY_WEIGHTS)
+    total = total_threads or os.cpu_count() or 1
+    os.makedirs(PROCESSED_PATH, exist_ok=True)
+
+    modes = ['sequential', 'parallel'] if compare else ['sequential' if sequential else 'parallel']
+    prep_start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='train_arrays_') as work_dir:
+        paths, scaler, le_crop, data_checksum = prepare_arrays(work_dir)
+        prep_seconds = time.perf_counter() - prep_start
+
+        runs = {}
+        for mode in modes:
+            if mode == 'sequential':
+                threads = {f: total for f in families}
+                concurrency = 1
+            else:
+                threads = partition_threads({f: FAMILY_WEIGHTS[f] for f in families}, total)
+                # Every family gets at least one thread, so with fewer cores than
+                # families only run as many workers at once as there are cores
+                concurrency = min(len(families), total)
+            print(f"\n{mode} run ({concurrency} worker(s) at a time)")
+            timings = {}
+            run_start = time.perf_counter()
+            for name, path, accuracy, seconds in run_families(families, threads, concurrency,
+                                                              paths, scaler, le_crop, data_checksum):
+                timings[name] = seconds
+                print(f"{name} accuracy: {accuracy:.4f} ({seconds:.1f}s on {threads[name]} threads) - saved {path}")
+            runs[mode] = {'wall_seconds': time.perf_counter() - run_start, 'models': timings}
+
+    print("\nTiming report")
+    print(f"  {'preprocessing':<32}{prep_seconds:8.2f}s")
+    for mode, run in runs.items():
+        for name, seconds in run['models'].items():
+            print(f"  {mode + ' ' + name:<32}{seconds:8.2f}s")
+        print(f"  {mode + ' wall-clock':<32}{run['wall_seconds']:8.2f}s")
+    report = {'prep_seconds': prep_seconds, 'runs': runs}
+    if compare:
+        report['speedup'] = runs['sequential']['wall_seconds'] / runs['parallel']['wall_seconds']
+        print(f"  {'speedup':<32}{report['speedup']:8.2f}x")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train every model family bundle')
+    parser.add_argument('--families', nargs='+', choices=list(FAMILY_WEIGHTS), help='Families to train (default: all)')
+    parser.add_argument('--threads', type=int, help='Total threads to use (default: all cores)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--sequential', action='store_true', help='Fit the families one by one, each with every thread')
+    mode.add_argument('--compare', action='store_true', help='Run sequentially, then concurrently, and report the measured speedup')
+    args = parser.parse_args()
+    train_all(args.families, args.threads, sequential=args.sequential, compare=args.compare)
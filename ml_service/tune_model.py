@@ -0,0 +1,283 @@
+# tune_model.py
+#
+# Cross-validated hyperparameter search for the crop recommender that weighs
+# accuracy against serving cost. Every candidate is scored in a process pool on
+# cached CV folds; once the pool is done, the candidates within reach of the
+# best accuracy are profiled one at a time for single-row latency, batch
+# latency and pickled size. The Pareto front over (accuracy, latency, size) is
+# reported and the chosen configuration is refit on all data and exported.
+#
+#   python tune_model.py [--families random_forest xgboost lightgbm]
+#                        [--folds 5] [--workers N] [--accuracy-tolerance 0.005]
+#                        [--output ../data/processed/recommender_bundle.joblib]
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+import train
+from dataset import load_dataset, CACHE_DIR
+from model_manager import FEATURE_COLUMNS
+
+RAW_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "crop_data.csv")
+PROCESSED_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+REPORT_PATH = os.path.join(PROCESSED_PATH, "tune_report.json")
+
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [25, 50, 100, 200],
+        'max_depth': [None, 8, 16],
+        'min_samples_leaf': [1, 2, 4],
+    },
+    'xgboost': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [3, 6],
+        'min_child_weight': [1, 4],
+    },
+    'lightgbm': {
+        'n_estimators': [50, 100, 200],
+        'num_leaves': [15, 31],
+        'min_child_samples': [10, 20],
+    },
+}
+
+BATCH_SIZE = 1024
+SINGLE_ROW_REPEATS = 50
+
+
+def build_model(family, params):
+    """Estimator for a family; search workers default to one thread each"""
+    defaults = {
+        'random_forest': {'random_state': 42},
+        'xgboost': {'eval_metric': 'mlogloss'},
+        'lightgbm': {'verbose': -1},
+    }.get(family, {})
+    return train.build_model(family, {'n_jobs': 1, **defaults, **params})
+
+
+def family_available(family):
+    try:
+        build_model(family, {})
+        return True
+    except ImportError:
+        print(f"⚠ Skipping {family}: library not installed")
+        return False
+
+
+def candidates(families):
+    for family in families:
+        space = SEARCH_SPACE[family]
+        for values in itertools.product(*space.values()):
+            yield family, dict(zip(space, values))
+
+
+def prepare_folds(ds, n_folds, seed=42):
+    """Raw features, labels and fold indices as .npy, cached by dataset hash and fold spec
+
+    Features are stored unscaled: each fold fits its scaler on its own
+    training rows, so the held-out rows never leak into the scaling.
+    """
+    fold_dir = os.path.join(CACHE_DIR, f'cv-{ds.checksum[:16]}-k{n_folds}-s{seed}-raw')
+    if not os.path.exists(os.path.join(fold_dir, 'done')):
+        os.makedirs(fold_dir, exist_ok=True)
+        X = ds.matrix(FEATURE_COLUMNS).astype(np.float32)
+        y = ds.codes('label')
+        np.save(os.path.join(fold_dir, 'X.npy'), X)
+        np.save(os.path.join(fold_dir, 'y.npy'), y)
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+        for i, (train_idx, test_idx) in enumerate(splitter.split(X, y)):
+            np.save(os.path.join(fold_dir, f'train_{i}.npy'), train_idx)
+            np.save(os.path.join(fold_dir, f'test_{i}.npy'), test_idx)
+        open(os.path.join(fold_dir, 'done'), 'w').close()
+    return fold_dir
+
+
+def profile_latency(model, X):
+    """Median single-row latency and per-row batch latency, in milliseconds"""
+    row = X[:1]
+    model.predict_proba(row)  # warm up
+    single = []
+    for _ in range(SINGLE_ROW_REPEATS):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        single.append(time.perf_counter() - start)
+
+    batch = np.resize(X, (BATCH_SIZE, X.shape[1]))
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    batch_seconds = time.perf_counter() - start
+
+    return float(np.median(single) * 1000), float(batch_seconds * 1000 / BATCH_SIZE)
+
+
+def evaluate(family, params, fold_dir, n_folds, model_path):
+    """Cross-validate one configuration in a worker process
+
+    The last fold's scaler and model are pickled to `model_path` for latency
+    profiling after the search, when the cores are no longer shared.
+    """
+    X = np.load(os.path.join(fold_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(fold_dir, 'y.npy'), mmap_mode='r')
+
+    start = time.perf_counter()
+    scores = []
+    for i in range(n_folds):
+        train_idx = np.load(os.path.join(fold_dir, f'train_{i}.npy'))
+        test_idx = np.load(os.path.join(fold_dir, f'test_{i}.npy'))
+        scaler = StandardScaler().fit(X[train_idx])
+        X_test = scaler.transform(X[test_idx])
+        model = build_model(family, params)
+        model.fit(scaler.transform(X[train_idx]), y[train_idx])
+        scores.append(accuracy_score(y[test_idx], model.predict(X_test)))
+    fit_seconds = time.perf_counter() - start
+
+    model_bytes = pickle.dumps(model)
+    with open(model_path, 'wb') as f:
+        pickle.dump((scaler, model, test_idx), f)
+    return {
+        'family': family,
+        'params': params,
+        'accuracy': float(np.mean(scores)),
+        'accuracy_std': float(np.std(scores)),
+        'single_row_ms': None,
+        'batch_ms_per_row': None,
+        'size_kb': len(model_bytes) / 1024,
+        'cv_seconds': fit_seconds,
+        'model_path': model_path,
+    }
+
+
+def accuracy_bar(results, tolerance, min_accuracy=None):
+    return min_accuracy if min_accuracy is not None else max(r['accuracy'] for r in results) - tolerance
+
+
+def profile_candidates(results, fold_dir):
+    """Profile each candidate's latency sequentially, with the machine otherwise idle"""
+    X = np.load(os.path.join(fold_dir, 'X.npy'), mmap_mode='r')
+    for r in results:
+        with open(r['model_path'], 'rb') as f:
+            scaler, model, test_idx = pickle.load(f)
+        r['single_row_ms'], r['batch_ms_per_row'] = profile_latency(model, scaler.transform(X[test_idx]))
+
+
+COST_KEYS = ('single_row_ms', 'batch_ms_per_row', 'size_kb')
+
+
+def dominates(a, b):
+    better_or_equal = a['accuracy'] >= b['accuracy'] and all(a[k] <= b[k] for k in COST_KEYS)
+    strictly_better = a['accuracy'] > b['accuracy'] or any(a[k] < b[k] for k in COST_KEYS)
+    return better_or_equal and strictly_better
+
+
+def pareto_front(results):
+    front = [r for r in results if not any(dominates(o, r) for o in results)]
+    return sorted(front, key=lambda r: r['single_row_ms'])
+
+
+def choose(front, tolerance, min_accuracy=None):
+    """Cheapest front member within `tolerance` of the best accuracy (or above min_accuracy)"""
+    bar = accuracy_bar(front, tolerance, min_accuracy)
+    eligible = [r for r in front if r['accuracy'] >= bar] or [max(front, key=lambda r: r['accuracy'])]
+    return min(eligible, key=lambda r: tuple(r[k] for k in COST_KEYS))
+
+
+def export_bundle(ds, choice, output):
+    """Refit the chosen configuration on the full dataset and write a serving bundle"""
+    X = ds.frame(FEATURE_COLUMNS)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    model = build_model(choice['family'], choice['params'])
+    model.fit(X_scaled, ds.codes('label'))
+    le_crop = ds.label_encoder('label')
+    # Written to a temp file and swapped in, so the serving watcher never reads a partial bundle
+    train.save_bundle({'model': model, 'scaler': scaler, 'le_crop': le_crop}, output,
+                      'tune_model', RAW_DATA_PATH, ds.checksum, FEATURE_COLUMNS, le_crop.classes_,
+                      {'cv_accuracy': round(choice['accuracy'], 4), 'single_row_ms': choice['single_row_ms']},
+                      choice['family'], choice['params'])
+
+
+def tune(families, n_folds, workers, tolerance, min_accuracy, output):
+    ds = load_dataset(RAW_DATA_PATH)
+    fold_dir = prepare_folds(ds, n_folds)
+    families = [f for f in families if family_available(f)]
+    todo = list(candidates(families))
+    print(f"Evaluating {len(todo)} configurations on {n_folds} folds with {workers} workers")
+
+    wall_start = time.perf_counter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='tune_models_') as model_dir:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(evaluate, family, params, fold_dir, n_folds,
+                                   os.path.join(model_dir, f'{i}.pkl'))
+                       for i, (family, params) in enumerate(todo)]
+            for future in as_completed(futures):
+                r = future.result()
+                results.append(r)
+                print(f"  {r['family']:<14} {json.dumps(r['params']):<60} acc={r['accuracy']:.4f} "
+                      f"size={r['size_kb']:.0f}KB")
+        wall_seconds = time.perf_counter() - wall_start
+
+        # Only candidates clearing the accuracy bar can be chosen, and anything
+        # dominating one of them clears it too, so the rest need no profiling
+        bar = accuracy_bar(results, tolerance, min_accuracy)
+        survivors = [r for r in results if r['accuracy'] >= bar] or [max(results, key=lambda r: r['accuracy'])]
+        print(f"\nProfiling latency of {len(survivors)} candidates at or above accuracy {bar:.4f}")
+        profile_candidates(survivors, fold_dir)
+    for r in results:
+        del r['model_path']
+
+    front = pareto_front(survivors)
+    choice = choose(front, tolerance, min_accuracy)
+
+    print("\nPareto front (accuracy / single-row latency / batch latency / size):")
+    for r in front:
+        marker = '*' if r is choice else ' '
+        print(f" {marker} {r['family']:<14} {json.dumps(r['params']):<60} acc={r['accuracy']:.4f} "
+              f"single={r['single_row_ms']:.2f}ms batch={r['batch_ms_per_row'] * 1000:.1f}us/row "
+              f"size={r['size_kb']:.0f}KB")
+    print(f"\nSearch took {wall_seconds:.1f}s "
+          f"({sum(r['cv_seconds'] for r in results):.1f}s of sequential CV work)")
+
+    if output:
+        export_bundle(ds, choice, output)
+        print(f"✓ Exported {choice['family']} {choice['params']} to {output}")
+
+    report = {
+        'dataset_checksum': ds.checksum,
+        'folds': n_folds,
+        'wall_seconds': wall_seconds,
+        'accuracy_bar': bar,
+        'results': results,
+        'pareto_front': front,
+        'choice': choice,
+        'exported_to': output,
+    }
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report written to {REPORT_PATH}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency-aware hyperparameter search for the crop recommender')
+    parser.add_argument('--families', nargs='+', default=list(SEARCH_SPACE), choices=list(SEARCH_SPACE))
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.005,
+                        help='accept the cheapest model within this much of the best CV accuracy')
+    parser.add_argument('--min-accuracy', type=float, default=None,
+                        help='absolute accuracy bar; overrides --accuracy-tolerance')
+    parser.add_argument('--output', default=os.path.join(PROCESSED_PATH, 'recommender_bundle.joblib'),
+                        help="serving bundle to write; pass '' to only report")
+    args = parser.parse_args()
+    tune(args.families, args.folds, args.workers, args.accuracy_tolerance, args.min_accuracy, args.output)
@@ -1,8 +1,5 @@
-import pandas as pd
+from price_store import get_store
 
 def get_market_price(market, crop):
-    df = pd.read_csv("data/market_prices.csv")  # Date,Market,Crop,Price
-    f = df[(df["Market"]==market) & (df["Crop"]==crop)]
-    if f.empty:
-        return None
-    return f.sort_values("Date").tail(1)["Price"].values[0]
+    # Same store as src/utils.get_latest_price: the ingested price database, else the CSV
+    return get_store().latest_price(market, crop)